@@ -0,0 +1,114 @@
+"""
+Benchmark the code_comments and code_licenses taggers on many small source files.
+
+Usage: python benchmarks/code_comments.py [--docs 20000] [--repeat 3]
+
+The previous approach, building and compiling the patterns for every document, is included as a reference.
+"""
+
+import argparse
+import random
+import re
+import time
+
+from postit.taggers.code.comments import CodeComments, CodeLicenses
+from postit.tagging import TagResult
+from postit.types import Doc, FloatTag, Tag
+
+LINES = [
+    "x = compute(y)",
+    "# increment the counter",
+    "// Copyright 2024 Example",
+    "print('# not a comment')",
+    "/* Licensed under the MIT License */",
+    "<!-- template -->",
+    "return x",
+]
+
+
+class LegacyComments(CodeComments):
+    def tag(self, source: Doc, **kwargs) -> TagResult:
+        escaped_single = [re.escape(symbol) for symbol in self.single_line_symbols]
+        escaped_multi = [
+            (re.escape(start), re.escape(end)) for start, end in self.multi_line_symbols
+        ]
+        string_pattern = r"(?:(?<!\\)\"(?:\\.|[^\"\\])*\"|(?<!\\)'(?:\\.|[^'\\])*')"
+        single_pattern = r"|".join(
+            [
+                symbol + r"[^\n]*(?:\n" + symbol + r"[^\n]*)*"
+                for symbol in escaped_single
+            ]
+        )
+        multi_pattern = r"|".join(
+            [start + r"(.*?)" + end for start, end in escaped_multi]
+        )
+        comment_pattern = rf"(?:{string_pattern})|({single_pattern})|({multi_pattern})"
+        comments = [
+            (match.start(match.lastindex), match.end(match.lastindex))
+            for match in re.finditer(
+                comment_pattern, source.content, re.MULTILINE | re.DOTALL
+            )
+            if match.lastindex
+        ]
+        tags: list[Tag] = [
+            FloatTag("comments", start, end, 1) for start, end in comments
+        ]
+        return TagResult(source, tags)
+
+
+class LegacyLicenses(CodeLicenses):
+    def tag(self, source: Doc, **kwargs) -> TagResult:
+        license_pattern = re.compile(
+            r"\b(copyright|license|licensed|all rights reserved)", re.IGNORECASE
+        )
+        comments = source.tags.get("code_comments/comments", [])
+        tags: list[Tag] = [
+            FloatTag("notice", start, end, 1)
+            for start, end, _ in comments
+            if license_pattern.search(source.content[start:end])
+        ]
+        return TagResult(source, tags)
+
+
+def measure(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    docs = [
+        Doc(i, "source", "\n".join(rng.choices(LINES, k=rng.randint(3, 30))))
+        for i in range(args.docs)
+    ]
+
+    def run(comments: CodeComments, licenses: CodeLicenses):
+        for doc in docs:
+            doc.tags = {}
+            doc.tags.update(comments.run_tagger(doc))
+            doc.tags.update(licenses.run_tagger(doc))
+
+    def legacy():
+        run(LegacyComments(), LegacyLicenses())
+
+    def cached():
+        run(CodeComments(), CodeLicenses())
+
+    legacy_time = measure(legacy, args.repeat)
+    cached_time = measure(cached, args.repeat)
+    print(f"{'approach':>10} {'time (s)':>10} {'docs/s':>10}")
+    for name, elapsed in [("legacy", legacy_time), ("cached", cached_time)]:
+        print(f"{name:>10} {elapsed:10.4f} {args.docs / elapsed:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
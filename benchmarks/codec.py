@@ -0,0 +1,93 @@
+"""
+Benchmark tagging and mixing end to end with each installed JSON backend.
+
+Usage: python benchmarks/codec.py [--files 4] [--docs 5000] [--repeat 3]
+
+Documents are written once to a temporary directory. Each backend tags them with `doc_length` and `paragraph_length`,
+then mixes them on the resulting tags. The best time of each stage is reported.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from postit.mixer import Condition, Mixer, MixerConfig
+from postit.processor import TaggerProcessor
+from postit.utils import codec
+from postit.utils.codec import JsonBackend
+
+WORDS = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "naïve"]
+
+
+def write_documents(path: str, num_files: int, num_docs: int, rng: random.Random):
+    os.makedirs(f"{path}/documents")
+    for i in range(num_files):
+        with open(f"{path}/documents/file{i}.jsonl", "w") as file:
+            for j in range(num_docs):
+                paragraphs = [
+                    " ".join(rng.choices(WORDS, k=rng.randint(5, 40)))
+                    for _ in range(rng.randint(1, 10))
+                ]
+                doc = {"id": j, "source": f"file{i}", "content": "\n".join(paragraphs)}
+                file.write(json.dumps(doc) + "\n")
+
+
+def run(path: str, backend: JsonBackend) -> tuple[float, float]:
+    codec.set_backend(backend)
+    start = time.perf_counter()
+    TaggerProcessor.tag(
+        glob_paths=[f"{path}/documents/*"],
+        tagger_names=["doc_length", "paragraph_length"],
+        experiment=backend.value,
+    )
+    tag_time = time.perf_counter() - start
+
+    config = MixerConfig(
+        name=f"mix-{backend.value}",
+        experiments=[backend.value],
+        input_paths=[f"{path}/documents/*"],
+        output_path=f"{path}/mix-{backend.value}/results.jsonl",
+        conditions={
+            "include": [
+                Condition(tag="paragraph_length/num_words", operator=">", value=10)
+            ]
+        },
+    )
+    start = time.perf_counter()
+    Mixer.mix(config)
+    return tag_time, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix="postit-codec-")
+    try:
+        write_documents(path, args.files, args.docs, random.Random(0))
+        results = {}
+        for backend in JsonBackend.available():
+            times = [run(path, backend) for _ in range(args.repeat)]
+            results[backend] = (min(t[0] for t in times), min(t[1] for t in times))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+        codec.set_backend()
+
+    baseline = results[JsonBackend.STDLIB]
+    print(f"{'backend':>8} {'tag (s)':>9} {'speedup':>8} {'mix (s)':>9} {'speedup':>8}")
+    for backend, (tag_time, mix_time) in results.items():
+        print(
+            f"{backend.value:>8} {tag_time:9.3f} {baseline[0] / tag_time:7.2f}x"
+            f" {mix_time:9.3f} {baseline[1] / mix_time:7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark the length taggers on batches of documents against tagging one document at a time.
+
+Usage: python benchmarks/length.py [--docs 2000] [--batch-sizes 1 16 64 256] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+
+from postit.registry import TaggerRegistry
+from postit.types import Doc
+
+WORDS = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "héllo"]
+
+
+def make_docs(num_docs: int, rng: random.Random) -> list[Doc]:
+    docs = []
+    for i in range(num_docs):
+        paragraphs = [
+            " ".join(rng.choices(WORDS, k=rng.randint(5, 60)))
+            for _ in range(rng.randint(1, 30))
+        ]
+        docs.append(Doc(i, "source", "\n".join(paragraphs)))
+    return docs
+
+
+def measure(fn, docs: list[Doc], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # Fresh documents, so cached paragraph spans are not reused between runs
+        copies = [Doc(doc.id, doc.source, doc.content) for doc in docs]
+        start = time.perf_counter()
+        fn(copies)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = make_docs(args.docs, random.Random(0))
+    print(f"{'tagger':>18} {'batch':>6} {'per doc (s)':>12} {'batched (s)':>12}")
+    for name in ["doc_length", "paragraph_length", "doc_lines"]:
+        tagger = TaggerRegistry.get(name)()
+        per_doc = measure(
+            lambda docs: [tagger.run_tagger(doc) for doc in docs], docs, args.repeat
+        )
+        for batch_size in args.batch_sizes:
+            batched = measure(
+                lambda docs: [
+                    tagger.run_batch(docs[i : i + batch_size])
+                    for i in range(0, len(docs), batch_size)
+                ],
+                docs,
+                args.repeat,
+            )
+            print(f"{name:>18} {batch_size:>6} {per_doc:12.4f} {batched:12.4f}")
+
+
+if __name__ == "__main__":
+    main()
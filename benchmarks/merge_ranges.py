@@ -0,0 +1,88 @@
+"""
+Benchmark Mixer.merge_ranges on documents with many paragraph-level spans.
+
+Usage: python benchmarks/merge_ranges.py [--sizes 1000 10000 100000] [--legacy-limit 5000]
+
+The previous nested-loop implementation is included as a reference and only run up to `--legacy-limit` spans.
+"""
+
+import argparse
+import random
+import time
+
+from postit.mixer import Mixer
+from unittest.mock import MagicMock
+
+
+def legacy_merge_ranges(include_ranges: list, exclude_ranges: list) -> list:
+    def subtract_range(inc_range: list, exc_range: list) -> list:
+        inc_start, inc_end, inc_value = inc_range
+        exc_start, exc_end, _ = exc_range
+        if exc_end < inc_start or exc_start > inc_end:
+            return [inc_range]
+        result = []
+        if exc_start > inc_start:
+            result.append([inc_start, exc_start - 1, inc_value])
+        if exc_end < inc_end:
+            result.append([exc_end + 1, inc_end, inc_value])
+        return result
+
+    final_result: list = []
+    if not include_ranges:
+        return final_result
+    if not exclude_ranges:
+        for include_set in include_ranges:
+            final_result.extend(include_set)
+        return final_result
+    for include_set in include_ranges:
+        for exclude_set in exclude_ranges:
+            final_ranges = include_set[:]
+            for exc_range in exclude_set:
+                final_ranges = [
+                    r for inc in final_ranges for r in subtract_range(inc, exc_range)
+                ]
+            final_result.extend(final_ranges)
+    return final_result
+
+
+def paragraph_spans(num_spans: int, rng: random.Random) -> list[list]:
+    spans, start = [], 0
+    for _ in range(num_spans):
+        length = rng.randint(20, 400)
+        spans.append([start, start + length - 1, rng.random()])
+        start += length + 1
+    return spans
+
+
+def measure(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--legacy-limit", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    mixer = Mixer(MagicMock(), [], {})
+    print(f"{'spans':>8} {'merge_ranges (s)':>18} {'legacy (s)':>12}")
+    for size in args.sizes:
+        # Two include conditions and one exclude condition over the same paragraphs
+        paragraphs = paragraph_spans(size, rng)
+        include = [paragraphs, [p for p in paragraphs if p[2] > 0.2]]
+        exclude = [[p for p in paragraphs if p[2] > 0.9]]
+
+        new = measure(mixer.merge_ranges, include, exclude)
+        legacy = (
+            f"{measure(legacy_merge_ranges, include, exclude):12.4f}"
+            if size <= args.legacy_limit
+            else f"{'skipped':>12}"
+        )
+        print(f"{size:>8} {new:18.4f} {legacy}")
+
+
+if __name__ == "__main__":
+    main()
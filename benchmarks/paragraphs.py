@@ -0,0 +1,101 @@
+"""
+Benchmark paragraph segmentation and normalization on long documents.
+
+Usage: python benchmarks/paragraphs.py [--docs 200] [--paragraphs 400] [--repeat 5]
+
+The previous approach, splitting the content then stripping and lowercasing each paragraph, is included as a reference.
+"""
+
+import argparse
+import mmh3
+import random
+import time
+
+from postit.registry import TaggerRegistry
+from postit.types import Doc, FloatTag
+from postit.utils.bloom import BloomFilter
+from postit.utils.text import normalize_paragraphs
+
+
+def legacy_hashes(content: str) -> list:
+    return [mmh3.hash64(p.strip().lower(), signed=False) for p in content.split("\n")]
+
+
+def hashes(content: str) -> list:
+    doc = Doc(0, "source", content)
+    return [mmh3.hash64(p, signed=False) for p in normalize_paragraphs(doc)]
+
+
+def legacy_dedupe(content: str, bloom: BloomFilter) -> list:
+    tags, start = [], 0
+    paragraphs = content.split("\n")
+    duplicates = bloom.test_and_add_batch([p.strip().lower() for p in paragraphs])
+    for paragraph, duplicate in zip(paragraphs, duplicates):
+        if duplicate:
+            tags.append(
+                FloatTag(
+                    name="duplicate", start=start, end=start + len(paragraph), value=1
+                )
+            )
+        start += len(paragraph) + 1
+    return tags
+
+
+def legacy_length(content: str) -> list:
+    tags, start = [], 0
+    for paragraph in content.split("\n"):
+        end = start + len(paragraph)
+        tags.append(
+            FloatTag(name="num_chars", start=start, end=end, value=len(paragraph))
+        )
+        tags.append(
+            FloatTag(
+                name="num_words", start=start, end=end, value=len(paragraph.split())
+            )
+        )
+        start = end + 1
+    return tags
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    contents = [
+        "\n".join(
+            " ".join(f"Word{rng.randint(0, 500)}" for _ in range(rng.randint(0, 12)))
+            for _ in range(args.paragraphs)
+        )
+        for _ in range(args.docs)
+    ]
+    length_tagger = TaggerRegistry.get("paragraph_length")()
+    dedupe_tagger = TaggerRegistry.get("paragraph_dedupe")()
+
+    # Each case receives a new bloom filter on every run
+    cases = {
+        "hash (legacy)": lambda bloom: [legacy_hashes(c) for c in contents],
+        "hash": lambda bloom: [hashes(c) for c in contents],
+        "dedupe (legacy)": lambda bloom: [legacy_dedupe(c, bloom) for c in contents],
+        "dedupe": lambda bloom: [
+            dedupe_tagger.tag(Doc(0, "s", c), bloom=bloom) for c in contents
+        ],
+        "length (legacy)": lambda bloom: [legacy_length(c) for c in contents],
+        "length": lambda bloom: [length_tagger.tag(Doc(0, "s", c)) for c in contents],
+    }
+    for name, case in cases.items():
+        times = []
+        for _ in range(args.repeat):
+            bloom = BloomFilter.new(args.docs * args.paragraphs, 0.01)
+            start = time.perf_counter()
+            case(bloom)
+            times.append(time.perf_counter() - start)
+            bloom.close()
+        print(f"{name:>16} {min(times):8.4f} s")
+
+
+if __name__ == "__main__":
+    main()
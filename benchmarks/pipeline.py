@@ -0,0 +1,94 @@
+"""
+Benchmark pipelined tagging against processing each file serially, on storage with simulated latency.
+
+Usage: python benchmarks/pipeline.py [--files 32] [--docs 500] [--latency 0.05] [--processes 2] [--repeat 3]
+
+Every read and write of the file client sleeps for `latency` seconds, like a request to object storage.
+The serial run reads, tags and writes each file on the same worker. The pipelined run reads and writes
+on separate I/O workers while other files are tagged. The best time of each mode is reported.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from postit.files import FileClient
+from postit.processor import TaggerProcessor, TotalStrategy
+from typing import IO
+
+WORDS = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog"]
+
+
+def write_documents(path: str, num_files: int, num_docs: int, rng: random.Random):
+    os.makedirs(f"{path}/documents")
+    for i in range(num_files):
+        with open(f"{path}/documents/file{i}.jsonl", "w") as file:
+            for j in range(num_docs):
+                content = " ".join(rng.choices(WORDS, k=rng.randint(20, 400)))
+                doc = {"id": j, "source": f"file{i}", "content": content}
+                file.write(json.dumps(doc) + "\n")
+
+
+class SlowFileClient(FileClient):
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def open_file(self, path: str, mode: str) -> IO:
+        time.sleep(self.latency)
+        return super().open_file(path, mode)
+
+
+class SerialTaggerProcessor(TaggerProcessor):
+    @property
+    def pipelined(self) -> bool:
+        return False
+
+
+def run(path: str, processor_cls: type[TaggerProcessor], args) -> float:
+    file_client = SlowFileClient(args.latency)
+    processor = processor_cls(
+        tagger_names=["doc_length", "paragraph_length"],
+        experiment=processor_cls.__name__,
+        file_client=file_client,
+        num_processes=args.processes,
+        total_strategy=TotalStrategy.NONE,
+    )
+    paths = sorted(file_client.glob(f"{path}/documents/*"))
+    start = time.perf_counter()
+    processor.run(paths)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        write_documents(path, args.files, args.docs, random.Random(0))
+        times = {}
+        for processor_cls in [SerialTaggerProcessor, TaggerProcessor]:
+            times[processor_cls] = min(
+                run(path, processor_cls, args) for _ in range(args.repeat)
+            )
+
+        serial = times[SerialTaggerProcessor]
+        pipelined = times[TaggerProcessor]
+        print(f"{args.files} files x {args.docs} docs, {args.latency}s latency")
+        print(f"serial     {serial:.3f}s")
+        print(f"pipelined  {pipelined:.3f}s  ({serial / pipelined:.2f}x)")
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,22 @@ import typer
 from postit.deduper import Deduper
 from postit.documents import DocumentGenerator
 from postit.examples.news import download_data, news_example
+from postit.formats import TagFormat
 from postit.mixer import Mixer, MixerConfig
-from postit.processor import TaggerProcessor
+from postit.processor import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_IO_WORKERS,
+    DEFAULT_PREFETCH,
+    ProcessorBackend,
+    TaggerProcessor,
+    TotalStrategy,
+)
+from postit.utils.minhash import (
+    DEFAULT_NUM_BANDS,
+    DEFAULT_NUM_PERM,
+    DEFAULT_SHINGLE_SIZE,
+)
+from postit.utils.shards import DEFAULT_SHARD_SIZE
 from typing import Annotated
 
 app = typer.Typer(no_args_is_help=True, rich_markup_mode="rich")
@@ -38,6 +52,16 @@ def generate(
         int,
         typer.Option(help="Number of processes to use for parallel processing."),
     ] = 1,
+    backend: Annotated[
+        ProcessorBackend,
+        typer.Option(help="Parallel execution backend."),
+    ] = ProcessorBackend.THREAD,
+    max_shard_size: Annotated[
+        int,
+        typer.Option(
+            help="Maximum size in bytes of the raw files written to each output shard."
+        ),
+    ] = DEFAULT_SHARD_SIZE,
 ):
     """
     Generate documents from raw data files.
@@ -47,6 +71,8 @@ def generate(
         output_path=output,
         keep_raw=keep_raw,
         num_processes=processes,
+        backend=backend,
+        max_shard_size=max_shard_size,
     )
 
 
@@ -67,10 +93,53 @@ def tag(
         list[str],
         typer.Option(help="Names of taggers to run.", show_default=False),
     ],
+    imports: Annotated[
+        list[str],
+        typer.Option(
+            help="Names of experiments to import tags from, for dependencies that are not run.",
+            show_default=False,
+        ),
+    ] = [],
+    stream: Annotated[
+        bool,
+        typer.Option(help="Tag documents one at a time to bound memory usage."),
+    ] = False,
+    totals: Annotated[
+        TotalStrategy,
+        typer.Option(
+            help="How to estimate progress totals: count lines, use file sizes, or skip."
+        ),
+    ] = TotalStrategy.COUNT,
+    tag_format: Annotated[
+        TagFormat,
+        typer.Option(help="Storage format of the tags."),
+    ] = TagFormat.JSONL,
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            help="Number of documents passed at once to taggers that support batches."
+        ),
+    ] = DEFAULT_BATCH_SIZE,
+    io_workers: Annotated[
+        int,
+        typer.Option(
+            help="Number of threads reading and writing files while others are processed."
+        ),
+    ] = DEFAULT_IO_WORKERS,
+    prefetch: Annotated[
+        int,
+        typer.Option(
+            help="Number of files read ahead of processing, and of outputs waiting to be written."
+        ),
+    ] = DEFAULT_PREFETCH,
     processes: Annotated[
         int,
         typer.Option(help="Number of processes to use for parallel processing."),
     ] = 1,
+    backend: Annotated[
+        ProcessorBackend,
+        typer.Option(help="Parallel execution backend."),
+    ] = ProcessorBackend.THREAD,
 ):
     """
     Tag documents with specified taggers.
@@ -79,7 +148,15 @@ def tag(
         glob_paths=paths,
         tagger_names=tagger,
         experiment=experiment,
+        imported_experiments=imports,
         num_processes=processes,
+        backend=backend,
+        stream=stream,
+        total_strategy=totals,
+        tag_format=tag_format,
+        batch_size=batch_size,
+        io_workers=io_workers,
+        prefetch=prefetch,
     )
 
 
@@ -100,34 +177,115 @@ def dedupe(
         bool,
         typer.Option(help="Toggle to deduplicate at the paragraph level."),
     ] = False,
+    exact: Annotated[
+        bool,
+        typer.Option(
+            help="Toggle to deduplicate documents exactly, using a content-hash index."
+        ),
+    ] = False,
+    index_dir: Annotated[
+        str,
+        typer.Option(
+            help="Directory to spill the hash index to. Defaults to a temporary directory."
+        ),
+    ] = "",
+    near: Annotated[
+        bool,
+        typer.Option(
+            help="Toggle to deduplicate near-duplicate documents, using MinHash and LSH."
+        ),
+    ] = False,
+    near_threshold: Annotated[
+        float,
+        typer.Option(
+            help="Estimated Jaccard similarity from which documents are near-duplicates."
+        ),
+    ] = 0.8,
+    num_perm: Annotated[
+        int,
+        typer.Option(help="Number of MinHash permutations."),
+    ] = DEFAULT_NUM_PERM,
+    num_bands: Annotated[
+        int,
+        typer.Option(
+            help="Number of LSH bands. Must divide the number of permutations."
+        ),
+    ] = DEFAULT_NUM_BANDS,
+    shingle_size: Annotated[
+        int,
+        typer.Option(help="Number of words in a shingle."),
+    ] = DEFAULT_SHINGLE_SIZE,
+    deterministic: Annotated[
+        bool,
+        typer.Option(
+            help="Hash documents in parallel, then resolve bloom filter duplicates in file, document id and offset order."
+        ),
+    ] = False,
     experiment: Annotated[
         str,
         typer.Option(help="Name of the experiment."),
     ] = "dedupe",
     bloom_size: Annotated[
         int,
-        typer.Option(help="Size of the bloom filter."),
+        typer.Option(help="Number of items the bloom filter holds."),
     ] = 1000000,
     bloom_file: Annotated[
         str,
-        typer.Option(help="Path to a bloom filter .pkl file to import."),
+        typer.Option(help="Path to a bloom filter .bloom file to import."),
     ] = "",
+    scalable_bloom: Annotated[
+        bool,
+        typer.Option(
+            help="Grow the bloom filter with the corpus. The bloom size is then the initial capacity."
+        ),
+    ] = False,
+    stream: Annotated[
+        bool,
+        typer.Option(help="Deduplicate documents one at a time to bound memory usage."),
+    ] = False,
+    totals: Annotated[
+        TotalStrategy,
+        typer.Option(
+            help="How to estimate progress totals: count lines, use file sizes, or skip."
+        ),
+    ] = TotalStrategy.COUNT,
+    tag_format: Annotated[
+        TagFormat,
+        typer.Option(help="Storage format of the tags."),
+    ] = TagFormat.JSONL,
     processes: Annotated[
         int,
         typer.Option(help="Number of processes to use for parallel processing."),
     ] = 1,
+    backend: Annotated[
+        ProcessorBackend,
+        typer.Option(help="Parallel execution backend."),
+    ] = ProcessorBackend.THREAD,
 ):
     """
-    Deduplicate documents at the document or paragraph level.
+    Deduplicate documents at the document or paragraph level, exactly, or by near-duplicate detection.
     """
     Deduper.dedupe(
         glob_paths=paths,
         experiment=experiment,
         dedupe_docs=docs,
         dedupe_paragraphs=paragraphs,
+        dedupe_exact=exact,
+        index_dir=index_dir,
+        dedupe_near=near,
+        near_threshold=near_threshold,
+        num_perm=num_perm,
+        num_bands=num_bands,
+        shingle_size=shingle_size,
+        deterministic=deterministic,
         bloom_size=bloom_size,
         bloom_file=bloom_file,
+        scalable_bloom=scalable_bloom,
         num_processes=processes,
+        backend=backend,
+        stream=stream,
+        total_strategy=totals,
+        tag_format=tag_format,
     )
 
 
@@ -140,16 +298,53 @@ def mix(
             show_default=False,
         ),
     ],
+    totals: Annotated[
+        TotalStrategy,
+        typer.Option(
+            help="How to estimate progress totals: count lines, use file sizes, or skip."
+        ),
+    ] = TotalStrategy.COUNT,
     processes: Annotated[
         int,
         typer.Option(help="Number of processes to use for parallel processing."),
     ] = 1,
+    backend: Annotated[
+        ProcessorBackend,
+        typer.Option(help="Parallel execution backend."),
+    ] = ProcessorBackend.THREAD,
+    stream: Annotated[
+        bool,
+        typer.Option(
+            help="Write each input file directly to sharded output files. Overrides the configuration."
+        ),
+    ] = False,
+    io_workers: Annotated[
+        int,
+        typer.Option(
+            help="Number of threads reading and writing files while others are processed."
+        ),
+    ] = DEFAULT_IO_WORKERS,
+    prefetch: Annotated[
+        int,
+        typer.Option(
+            help="Number of files read ahead of processing, and of outputs waiting to be written."
+        ),
+    ] = DEFAULT_PREFETCH,
 ):
     """
     Mix documents based on specified conditions.
     """
     mixer_config = MixerConfig.load(config)
-    Mixer.mix(mixer_config, processes)
+    if stream:
+        mixer_config.stream = True
+    Mixer.mix(
+        mixer_config,
+        processes,
+        backend,
+        totals,
+        io_workers=io_workers,
+        prefetch=prefetch,
+    )
 
 
 @app.command()
@@ -1,12 +1,40 @@
+import numpy as np
+
+from itertools import chain
+from operator import itemgetter
 from postit.files import FileClient
-from postit.processor import TaggerProcessor
-from postit.utils.bloom import BloomFilter
+from postit.formats import TagFormat
+from postit.processor import (
+    BaseProcessor,
+    ProcessorBackend,
+    TaggerProcessor,
+    TotalStrategy,
+)
+from postit.types import Doc
+from postit.utils.bloom import BloomFilter, ScalableBloomFilter, load_bloom_filter
+from postit.utils.hash_index import DIGEST, HashIndex, hash_normalized, make_entries
 from postit.utils.logging import get_logger
+from postit.utils.minhash import (
+    DEFAULT_NUM_BANDS,
+    DEFAULT_NUM_PERM,
+    DEFAULT_SHINGLE_SIZE,
+    EMPTY,
+    LSHIndex,
+    MinHasher,
+)
 from postit.utils.paths import get_ext
-from typing import Any
+from postit.utils.text import normalize, normalize_paragraphs
+from typing import Any, Optional, Union
 
 logger = get_logger(__name__)
 
+# Target false positive rate of bloom filters
+BLOOM_ERROR = 0.01
+
+# Hash index references pack the index of a file and the row of a document in the file
+ROW_BITS = 32
+ROW_MASK = (1 << ROW_BITS) - 1
+
 
 class Deduper(TaggerProcessor):
     """
@@ -22,9 +50,22 @@ class Deduper(TaggerProcessor):
         experiment: str = "dedupe",
         dedupe_docs: bool = False,
         dedupe_paragraphs: bool = False,
+        dedupe_exact: bool = False,
+        index_dir: str = "",
+        dedupe_near: bool = False,
+        near_threshold: float = 0.8,
+        num_perm: int = DEFAULT_NUM_PERM,
+        num_bands: int = DEFAULT_NUM_BANDS,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        deterministic: bool = False,
         bloom_size: int = 1000000,
         bloom_file: str = "",
+        scalable_bloom: bool = False,
         num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        stream: bool = False,
+        total_strategy: TotalStrategy | str = TotalStrategy.COUNT,
+        tag_format: TagFormat | str = TagFormat.JSONL,
         **kwargs: Any,
     ):
         """
@@ -35,9 +76,22 @@ class Deduper(TaggerProcessor):
             experiment (str): Name of the experiment. Defaults to "dedupe".
             dedupe_docs (bool, optional): Toggle to deduplicate at the document level. Defaults to False.
             dedupe_paragraphs (bool, optional): Whether to deduplicate at the paragraph level. Defaults to False.
-            bloom_size (int, optional): Size of the bloom filter. Defaults to 1000000.
+            dedupe_exact (bool, optional): Deduplicate documents exactly using a content-hash index. Defaults to False.
+            index_dir (str, optional): Directory to spill the hash index to. Defaults to a temporary directory.
+            dedupe_near (bool, optional): Deduplicate near-duplicate documents using MinHash and LSH. Defaults to False.
+            near_threshold (float, optional): Estimated Jaccard similarity from which documents are near-duplicates. Defaults to 0.8.
+            num_perm (int, optional): Number of MinHash permutations. Defaults to 128.
+            num_bands (int, optional): Number of LSH bands. Must divide num_perm. Defaults to 16.
+            shingle_size (int, optional): Number of words in a shingle. Defaults to 5.
+            deterministic (bool, optional): Resolve bloom filter duplicates in (file, doc id, offset) order after hashing in parallel, so results do not depend on scheduling. Defaults to False.
+            bloom_size (int, optional): Number of items the bloom filter holds, or initially holds if scalable. Defaults to 1000000.
             bloom_file (str, optional): Path to a bloom filter file to import.
+            scalable_bloom (bool, optional): Grow the bloom filter with the number of items. Defaults to False.
             num_processes (int, optional): Number of processes to use for parallel processing. Defaults to 1.
+            backend (ProcessorBackend | str, optional): Execution backend, "thread" or "process". Defaults to "thread".
+            stream (bool, optional): Read, deduplicate and write one document at a time. Defaults to False.
+            total_strategy (TotalStrategy | str, optional): How to estimate progress totals. Defaults to "count".
+            tag_format (TagFormat | str, optional): Storage format of the tags, "jsonl" or "columnar". Defaults to "jsonl".
         """
         Deduper.label = f"Deduping ({experiment})"
         tagger_names = []
@@ -46,42 +100,452 @@ class Deduper(TaggerProcessor):
         if dedupe_paragraphs:
             tagger_names.append("paragraph_dedupe")
 
-        bloom = None
-        if bloom_file:
-            if get_ext(bloom_file) != ".pkl":
-                raise ValueError("Bloom filter file must be a pickle file. (.pkl)")
-            file_client = FileClient.get_for_target(bloom_file)
-            if file_client.is_file(bloom_file):
-                bloom = BloomFilter.load(bloom_file)
-                logger.info(f"Succesfully loaded bloom filter: {bloom_file}.")
-            else:
-                logger.warning(
-                    f"Cannot load bloom filter: {bloom_file}. Creating a new bloom filter."
+        # Files are sorted, so that duplicates are resolved in the same order on every run
+        inputs = []
+        for glob_path in glob_paths:
+            file_client = FileClient.get_for_target(glob_path)
+            inputs.append((file_client, sorted(file_client.glob(glob_path))))
+
+        bloom: Optional[Union[BloomFilter, ScalableBloomFilter]] = None
+        if dedupe_docs or dedupe_paragraphs:
+            bloom = get_bloom(bloom_file, bloom_size, scalable_bloom)
+
+        try:
+            # Exact, near and deterministic duplicates are resolved over every input before tagging
+            matches: dict[str, dict[str, Any]] = {}
+            resolve_docs = deterministic and dedupe_docs
+            resolve_paragraphs = deterministic and dedupe_paragraphs
+            if dedupe_exact or dedupe_near or resolve_docs or resolve_paragraphs:
+                # The LSH index is created first, to validate the bands before hashing
+                lsh = LSHIndex(num_perm, num_bands) if dedupe_near else None
+                minhasher = MinHasher(num_perm, shingle_size) if dedupe_near else None
+                files = hash_inputs(
+                    inputs,
+                    digests=dedupe_exact or resolve_docs,
+                    paragraphs=resolve_paragraphs,
+                    minhasher=minhasher,
+                    bloom=bloom if deterministic else None,
+                    num_processes=num_processes,
+                    backend=backend,
+                    total_strategy=total_strategy,
+                )
+                if dedupe_exact:
+                    tagger_names.append("exact_dedupe")
+                    matches["exact_matches"] = find_exact_duplicates(files, index_dir)
+                if lsh is not None:
+                    tagger_names.append("near_dedupe")
+                    matches["near_matches"] = find_near_duplicates(
+                        files, lsh, near_threshold
+                    )
+                if resolve_docs:
+                    matches["doc_duplicates"] = find_doc_duplicates(files, index_dir)
+                if resolve_paragraphs:
+                    matches["paragraph_duplicates"] = find_paragraph_duplicates(
+                        files, index_dir
+                    )
+
+            for file_client, document_paths in inputs:
+                processor = Deduper(
+                    tagger_names=tagger_names,
+                    experiment=experiment,
+                    file_client=file_client,
+                    num_processes=num_processes,
+                    backend=backend,
+                    stream=stream,
+                    total_strategy=total_strategy,
+                    tag_format=tag_format,
+                    matches=matches,
+                    bloom=bloom,
+                    **kwargs,
                 )
+                processor.run(document_paths)
 
-        if not bloom:
-            bloom = BloomFilter.new(bloom_size, 0.01)
+            if bloom is not None:
+                report_bloom(bloom)
+                if bloom_file:
+                    bloom.save(bloom_file)
+        finally:
+            if bloom is not None:
+                bloom.close()
 
-        for glob_path in glob_paths:
-            file_client = FileClient.get_for_target(glob_path)
-            document_paths = file_client.glob(glob_path)
-            processor = Deduper(
-                tagger_names=tagger_names,
-                experiment=experiment,
-                file_client=file_client,
-                num_processes=num_processes,
-                bloom=bloom,
-                **kwargs,
+    def __init__(
+        self, *args: Any, matches: dict[str, dict[str, Any]] = {}, **kwargs: Any
+    ):
+        super().__init__(*args, **kwargs)
+        self.matches = matches
+
+    def get_kwargs(self, path: str) -> dict:
+        # Matches are keyed by path, each file only receives its own
+        if not self.matches:
+            return self.kwargs
+        file_matches = {
+            name: paths.get(path, {}) for name, paths in self.matches.items()
+        }
+        return {**self.kwargs, **file_matches}
+
+
+class HashedFile:
+    """
+    The hashes of the documents of a file, ordered by document id.
+
+    Attributes:
+        path (str): The path of the file.
+        doc_ids (list): The id of each document.
+        digests (Optional[np.ndarray]): The content digest of each document.
+        signatures (Optional[np.ndarray]): The MinHash signature of each document, one row per document.
+        seen (Optional[np.ndarray]): Whether each document was already in the bloom filter.
+        paragraph_digests (Optional[np.ndarray]): The digest of each paragraph, ordered by document and offset.
+        paragraph_rows (Optional[np.ndarray]): The document of each paragraph, as an index into `doc_ids`.
+        paragraph_offsets (Optional[np.ndarray]): The start of each paragraph in its document.
+        paragraph_seen (Optional[np.ndarray]): Whether each paragraph was already in the bloom filter.
+    """
+
+    __slots__ = (
+        "path",
+        "doc_ids",
+        "digests",
+        "signatures",
+        "seen",
+        "paragraph_digests",
+        "paragraph_rows",
+        "paragraph_offsets",
+        "paragraph_seen",
+    )
+
+    def __init__(self, path: str, doc_ids: list):
+        self.path = path
+        self.doc_ids = doc_ids
+        self.digests: Optional[np.ndarray] = None
+        self.signatures: Optional[np.ndarray] = None
+        self.seen: Optional[np.ndarray] = None
+        self.paragraph_digests: Optional[np.ndarray] = None
+        self.paragraph_rows: Optional[np.ndarray] = None
+        self.paragraph_offsets: Optional[np.ndarray] = None
+        self.paragraph_seen: Optional[np.ndarray] = None
+
+    def get_ref(self, row: int) -> str:
+        """
+        Returns the `<path>:<id>` reference of a document.
+        """
+        return f"{self.path}:{self.doc_ids[row]}"
+
+
+class Hasher(BaseProcessor):
+    """
+    Computes the content digests and MinHash signatures of every document, one file per worker.
+    Used by exact, near and deterministic deduplication, which resolve duplicates across all files before tagging.
+    """
+
+    label = "Hashing"
+    units = "docs"
+
+    def __init__(
+        self,
+        file_client: FileClient,
+        digests: bool = True,
+        paragraphs: bool = False,
+        minhasher: Optional[MinHasher] = None,
+        bloom: Optional[Union[BloomFilter, ScalableBloomFilter]] = None,
+        num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        total_strategy: TotalStrategy | str = TotalStrategy.COUNT,
+    ):
+        super().__init__(num_processes, backend, total_strategy)
+        self.file_client = file_client
+        self.digests = digests
+        self.paragraphs = paragraphs
+        self.minhasher = minhasher
+        self.bloom = bloom
+
+    def process(self, path: str) -> HashedFile:
+        docs = []
+        with self.file_client.open(path, "rb") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                docs.append(self.hash_doc(Doc.from_raw(line)))
+                self.advance()
+
+        # Documents are resolved by id, regardless of their position in the file
+        docs.sort(key=itemgetter(0))
+        ids, digests, seen, signatures, paragraphs = (
+            [list(column) for column in zip(*docs)] if docs else [[]] * 5
+        )
+
+        hashed = HashedFile(path, ids)
+        if self.digests:
+            hashed.digests = np.array(digests, dtype=DIGEST).reshape(-1)
+            if self.bloom is not None:
+                hashed.seen = np.array(seen, dtype=bool)
+        if self.minhasher is not None:
+            hashed.signatures = np.array(signatures, dtype=np.uint32).reshape(
+                -1, self.minhasher.num_perm
+            )
+        if self.paragraphs:
+            counts = [len(doc_digests) for doc_digests, _, _ in paragraphs]
+            hashed.paragraph_rows = np.repeat(np.arange(len(docs)), counts)
+            para_digests, offsets, para_seen = (
+                (list(chain.from_iterable(column)) for column in zip(*paragraphs))
+                if paragraphs
+                else ([], [], [])
             )
-            processor.run(
-                document_paths, file_client=file_client, num_taggers=len(tagger_names)
+            hashed.paragraph_digests = np.array(para_digests, dtype=DIGEST).reshape(-1)
+            hashed.paragraph_offsets = np.array(offsets, dtype=np.int64)
+            if self.bloom is not None:
+                hashed.paragraph_seen = np.array(para_seen, dtype=bool)
+        return hashed
+
+    def hash_doc(self, doc: Doc) -> tuple:
+        """
+        Returns the id, digest, bloom membership, signature and paragraph hashes of a document.
+        """
+        digest, seen, signature, paragraphs = None, False, None, None
+        if self.digests:
+            clean_doc = normalize(doc.content)
+            digest = hash_normalized(clean_doc)
+            if self.bloom is not None:
+                seen = clean_doc in self.bloom
+        if self.minhasher is not None:
+            signature = self.minhasher.signature(doc.content)
+        if self.paragraphs:
+            clean_paragraphs = normalize_paragraphs(doc)
+            paragraphs = (
+                [hash_normalized(paragraph) for paragraph in clean_paragraphs],
+                [start for start, _ in doc.get_paragraphs()],
+                self.bloom.contains_batch(clean_paragraphs)
+                if self.bloom is not None
+                else [],
             )
+        return doc.id, digest, seen, signature, paragraphs
+
+    def get_total(self, paths: list[str], **kwargs: Any) -> int:
+        return self.count_lines(paths)
+
+
+def hash_inputs(
+    inputs: list[tuple[FileClient, list[str]]],
+    digests: bool = True,
+    paragraphs: bool = False,
+    minhasher: Optional[MinHasher] = None,
+    bloom: Optional[Union[BloomFilter, ScalableBloomFilter]] = None,
+    num_processes: int = 1,
+    backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+    total_strategy: TotalStrategy | str = TotalStrategy.COUNT,
+) -> list[HashedFile]:
+    """
+    Hashes the documents of every input file in parallel.
+
+    Args:
+        inputs (list[tuple[FileClient, list[str]]]): The file client and paths of each input.
+        digests (bool, optional): Compute document digests. Defaults to True.
+        paragraphs (bool, optional): Compute paragraph digests. Defaults to False.
+        minhasher (Optional[MinHasher], optional): Computes MinHash signatures if provided. Defaults to None.
+        bloom (Optional[BloomFilter | ScalableBloomFilter], optional): Records which documents and paragraphs it already holds. Defaults to None.
+        num_processes (int, optional): Number of processes to use for hashing. Defaults to 1.
+        backend (ProcessorBackend | str, optional): Execution backend, "thread" or "process". Defaults to "thread".
+        total_strategy (TotalStrategy | str, optional): How to estimate progress totals. Defaults to "count".
+
+    Returns:
+        list[HashedFile]: The hashed files, in input order.
+    """
+    files: list[HashedFile] = []
+    for file_client, paths in inputs:
+        hasher = Hasher(
+            file_client,
+            digests=digests,
+            paragraphs=paragraphs,
+            minhasher=minhasher,
+            bloom=bloom,
+            num_processes=num_processes,
+            backend=backend,
+            total_strategy=total_strategy,
+        )
+        files.extend(hasher.run(paths))
+    return files
+
+
+def find_exact_duplicates(
+    files: list[HashedFile], index_dir: str = ""
+) -> dict[str, dict]:
+    """
+    Finds exact duplicates with a hash index. The earliest occurrence of a document, in input order, is kept.
+
+    Args:
+        files (list[HashedFile]): The hashed files, with digests.
+        index_dir (str, optional): Directory to spill the hash index to. Defaults to a temporary directory.
+
+    Returns:
+        dict[str, dict]: For each path, the ids of duplicate documents mapped to the `<path>:<id>` of their first occurrence.
+    """
+    matches: dict[str, dict] = {}
+    with HashIndex(spill_dir=index_dir or None) as index:
+        for file_index, file in enumerate(files):
+            assert file.digests is not None
+            refs = (file_index << ROW_BITS) + np.arange(len(file.digests))
+            index.add(make_entries(file.digests, refs))
+
+        for refs, firsts in index.duplicates():
+            for ref, first in zip(refs.tolist(), firsts.tolist()):
+                file = files[ref >> ROW_BITS]
+                match = files[first >> ROW_BITS].get_ref(first & ROW_MASK)
+                matches.setdefault(file.path, {})[file.doc_ids[ref & ROW_MASK]] = match
+
+    logger.info(
+        f"Found {sum(len(docs) for docs in matches.values())} exact duplicates."
+    )
+    return matches
+
+
+def find_near_duplicates(
+    files: list[HashedFile], lsh: LSHIndex, threshold: float
+) -> dict[str, dict]:
+    """
+    Finds near-duplicates with an LSH index, in input order.
+    Each document is compared to the documents kept so far, and kept if none is similar enough.
 
-        if bloom_file:
-            bloom.save(bloom_file)
+    Args:
+        files (list[HashedFile]): The hashed files, with signatures.
+        lsh (LSHIndex): The index of kept documents.
+        threshold (float): Estimated Jaccard similarity from which documents are near-duplicates.
+
+    Returns:
+        dict[str, dict]: For each path, the ids of near-duplicates mapped to their estimated similarity and the `<path>:<id>` of the kept document.
+    """
+    matches: dict[str, dict] = {}
+    for file_index, file in enumerate(files):
+        assert file.signatures is not None
+        band_keys = lsh.band_keys(file.signatures)
+        for row, (signature, keys) in enumerate(zip(file.signatures, band_keys)):
+            if (signature == EMPTY).all():
+                continue
+
+            key, score = lsh.query(signature, keys)
+            if score >= threshold:
+                match = files[key[0]].get_ref(key[1])
+                matches.setdefault(file.path, {})[file.doc_ids[row]] = (score, match)
+            else:
+                lsh.add((file_index, row), signature, keys)
+
+    logger.info(f"Found {sum(len(docs) for docs in matches.values())} near-duplicates.")
+    return matches
+
+
+def resolve_duplicates(
+    digests: list[np.ndarray],
+    seen: list[Optional[np.ndarray]],
+    index_dir: str = "",
+) -> list[np.ndarray]:
+    """
+    Marks the items that repeat an earlier item, or that were already seen.
+    Items are ordered by their position in the list of files, then in their file.
+
+    Args:
+        digests (list[np.ndarray]): The digests of the items of each file.
+        seen (list[Optional[np.ndarray]]): Whether each item of each file was already seen.
+        index_dir (str, optional): Directory to spill the hash index to. Defaults to a temporary directory.
+
+    Returns:
+        list[np.ndarray]: Whether each item of each file is a duplicate.
+    """
+    bounds = np.cumsum([0, *(len(file_digests) for file_digests in digests)])
+    duplicate = np.zeros(bounds[-1], dtype=bool)
+    with HashIndex(spill_dir=index_dir or None) as index:
+        for start, file_digests in zip(bounds.tolist(), digests):
+            refs = np.arange(start, start + len(file_digests))
+            index.add(make_entries(file_digests, refs))
+        for refs, _ in index.duplicates():
+            duplicate[refs] = True
 
-    def get_total(self, paths: list[str], **kwargs) -> int:
-        file_client: FileClient = kwargs.get("file_client", None)
-        num_taggers = kwargs.get("num_taggers", 1)
-        total = sum([len(file_client.read(path).splitlines()) for path in paths])
-        return total * num_taggers
+    for start, end, file_seen in zip(bounds[:-1], bounds[1:], seen):
+        if file_seen is not None:
+            duplicate[start:end] |= file_seen
+    return np.split(duplicate, bounds[1:-1])
+
+
+def find_doc_duplicates(files: list[HashedFile], index_dir: str = "") -> dict[str, set]:
+    """
+    Finds duplicate documents in (file, doc id) order, for the doc_dedupe tagger.
+
+    Returns:
+        dict[str, set]: For each path, the ids of duplicate documents.
+    """
+    digests = []
+    for file in files:
+        assert file.digests is not None
+        digests.append(file.digests)
+    duplicates = resolve_duplicates(digests, [file.seen for file in files], index_dir)
+
+    matches: dict[str, set] = {}
+    for file, duplicate in zip(files, duplicates):
+        rows = np.flatnonzero(duplicate).tolist()
+        if rows:
+            matches[file.path] = {file.doc_ids[row] for row in rows}
+    return matches
+
+
+def find_paragraph_duplicates(
+    files: list[HashedFile], index_dir: str = ""
+) -> dict[str, dict]:
+    """
+    Finds duplicate paragraphs in (file, doc id, offset) order, for the paragraph_dedupe tagger.
+
+    Returns:
+        dict[str, dict]: For each path, the ids of documents with duplicate paragraphs mapped to the offsets of these paragraphs.
+    """
+    digests = []
+    for file in files:
+        assert file.paragraph_digests is not None
+        digests.append(file.paragraph_digests)
+    seen = [file.paragraph_seen for file in files]
+    duplicates = resolve_duplicates(digests, seen, index_dir)
+
+    matches: dict[str, dict] = {}
+    for file, duplicate in zip(files, duplicates):
+        assert file.paragraph_rows is not None and file.paragraph_offsets is not None
+        for row, offset in zip(
+            file.paragraph_rows[duplicate].tolist(),
+            file.paragraph_offsets[duplicate].tolist(),
+        ):
+            doc_offsets = matches.setdefault(file.path, {})
+            doc_offsets.setdefault(file.doc_ids[row], set()).add(offset)
+    return matches
+
+
+def get_bloom(
+    bloom_file: str, bloom_size: int, scalable_bloom: bool
+) -> Union[BloomFilter, ScalableBloomFilter]:
+    """
+    Loads the bloom filter file if it exists, or creates a new bloom filter.
+    """
+    if bloom_file:
+        if get_ext(bloom_file) != ".bloom":
+            raise ValueError("Bloom filter file must be a .bloom file.")
+        file_client = FileClient.get_for_target(bloom_file)
+        if file_client.is_file(bloom_file):
+            bloom = load_bloom_filter(bloom_file)
+            logger.info(f"Succesfully loaded bloom filter: {bloom_file}.")
+            return bloom
+
+        logger.warning(
+            f"Cannot load bloom filter: {bloom_file}. Creating a new bloom filter."
+        )
+
+    if scalable_bloom:
+        return ScalableBloomFilter(bloom_size, BLOOM_ERROR)
+    return BloomFilter.new(bloom_size, BLOOM_ERROR)
+
+
+def report_bloom(bloom: Union[BloomFilter, ScalableBloomFilter]) -> None:
+    """
+    Logs the fill ratio and estimated false positive rate of a bloom filter.
+    Warns when a fixed-size filter is over capacity.
+    """
+    fpr = bloom.estimated_fpr()
+    logger.info(
+        f"Bloom filter fill ratio: {bloom.fill_ratio():.2%}, estimated false positive rate: {fpr:.4%}."
+    )
+    if isinstance(bloom, BloomFilter) and fpr > BLOOM_ERROR:
+        logger.warning(
+            "Bloom filter is over capacity, documents may be wrongly tagged as duplicates. "
+            "Use a larger bloom size or a scalable bloom filter."
+        )
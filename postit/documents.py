@@ -1,17 +1,23 @@
-import json
-
 from postit.files import FileClient
-from postit.processor import BaseProcessor
+from postit.processor import BaseProcessor, ProcessorBackend
+from postit.utils import codec
 from postit.utils.paths import get_top_folder
+from postit.utils.shards import DEFAULT_SHARD_SIZE
+from typing import Optional
 
-# TODO: split each folder into multiple files after a certain size
 # TODO: improve error handling
 
+# Number of files fetched at once, concurrently on remote storage
+READ_BATCH_SIZE = 256
+
 
 class DocumentGenerator(BaseProcessor):
     """
     Generates documents from files in the specified folder paths.
-    One folder is processed per thread at a time.
+
+    The files of each folder are split into shards of consecutive files, named `<folder>-00000.jsonl`, `<folder>-00001.jsonl`, etc.
+    A shard holds up to `max_shard_size` bytes of files, and a single larger file gets its own shard.
+    Shards are generated in parallel, so large folders are spread across workers, and documents are written as they are read.
 
     Use DocumentGenerator.generate() as the entry point.
     """
@@ -24,66 +30,127 @@ class DocumentGenerator(BaseProcessor):
         output_path: str = "./documents",
         keep_raw: bool = True,
         num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        max_shard_size: int = DEFAULT_SHARD_SIZE,
     ):
+        """
+        Generate documents from raw files.
+
+        Args:
+            folder_paths (list[str]): List of glob patterns for the folders of raw files. Each folder is written to its own shards.
+            output_path (str, optional): Directory of the documents. Defaults to "./documents".
+            keep_raw (bool, optional): Keep the raw files after generating documents. Defaults to True.
+            num_processes (int, optional): Number of processes to use for parallel processing. Defaults to 1.
+            backend (ProcessorBackend | str, optional): Execution backend, "thread" or "process". Defaults to "thread".
+            max_shard_size (int, optional): Maximum size of the raw files of a shard, in bytes. Defaults to 256 MiB.
+        """
         processor = DocumentGenerator(
             output_path=output_path,
             keep_raw=keep_raw,
             num_processes=num_processes,
+            backend=backend,
+            max_shard_size=max_shard_size,
         )
 
-        subfolders = []
+        # Folders matched by several patterns are generated once
+        subfolders: dict[str, None] = {}
         for path in folder_paths:
             file_client = FileClient.get_for_target(path)
-            subfolders.extend(file_client.glob(path))
-        processor.run(subfolders)
+            subfolders.update(dict.fromkeys(file_client.glob(path)))
+
+        for subfolder in subfolders:
+            processor.add_folder(subfolder)
+        processor.run(list(processor.shards))
+
+        # Raw files are removed once every shard is written
+        if not keep_raw:
+            for subfolder in subfolders:
+                FileClient.get_for_target(subfolder).remove(get_top_folder(subfolder))
 
     def __init__(
         self,
         output_path: str = "./documents",
         keep_raw: bool = True,
         num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        max_shard_size: int = DEFAULT_SHARD_SIZE,
     ):
-        super().__init__(num_processes)
+        if max_shard_size <= 0:
+            raise ValueError("The maximum shard size must be positive.")
+
+        super().__init__(num_processes, backend)
         self.output_path = output_path
         self.keep_raw = keep_raw
+        self.max_shard_size = max_shard_size
+        # The folder and the files, with their document ids, of each shard by output path
+        self.shards: dict[str, tuple[str, list[tuple[int, str]]]] = {}
 
-    def process(self, path: str):
+    def add_folder(self, path: str) -> list[str]:
         """
-        Processes a folder by reading the files and writing the content to a .jsonl file.
+        Lists the files of a folder and splits them into shards.
+        Document ids are positions in the folder listing, which also lists directories.
+        Raises ValueError if another folder with the same name was already added.
+
+        Returns:
+            list[str]: The output paths of the shards of the folder.
         """
-        folder_content = ""
         file_client = FileClient.get_for_target(path)
         folder = file_client.glob(f"{path}/**/*")
-
-        for id, file in enumerate(folder):
-            if file_client.is_file(file):
-                content = file_client.read(file)
-                # Format document data in jsonl format
-                file_data = {"id": id, "source": file, "content": content}
-                folder_content += json.dumps(file_data) + "\n"
-                self.progress.update(self.task, advance=1)
-
-        # Get the top folder path to use as file name
-        top_folder_path = get_top_folder(path)
-
-        # Clean up the top folder
-        if not self.keep_raw:
-            file_client.remove(top_folder_path)
-
-        # Write the folder content to a .jsonl file
-        FileClient.get_for_target(self.output_path).write(
-            f"{self.output_path}/{top_folder_path.split('/')[-1]}.jsonl", folder_content
+        try:
+            infos: list[Optional[dict]] = list(file_client.info(folder))
+        except FileNotFoundError:
+            # Broken symlinks and files removed since the listing are skipped
+            infos = []
+            for file in folder:
+                try:
+                    infos.append(file_client.info([file])[0])
+                except FileNotFoundError:
+                    infos.append(None)
+
+        # Get the top folder path to use as shard name
+        name = get_top_folder(path).split("/")[-1]
+
+        shards: list[list[tuple[int, str]]] = []
+        size = 0
+        for id, (file, info) in enumerate(zip(folder, infos)):
+            if info is None or info["type"] != "file":
+                continue
+            if not shards or (size and size + info["size"] > self.max_shard_size):
+                shards.append([])
+                size = 0
+            shards[-1].append((id, file))
+            size += info["size"]
+
+        # Every shard is checked before any is added, so a rejected folder adds no shards
+        paths = [f"{self.output_path}/{name}-{i:05d}.jsonl" for i in range(len(shards))]
+        for shard_path in paths:
+            if shard_path in self.shards:
+                raise ValueError(
+                    f"Folders {self.shards[shard_path][0]} and {path} would be written to the same shards {self.output_path}/{name}-*.jsonl."
+                )
+        self.shards.update(
+            (shard_path, (path, files)) for shard_path, files in zip(paths, shards)
         )
+        return paths
+
+    def process(self, path: str):
+        """
+        Writes a shard, reading its files in batches and writing each document as it is read.
+        """
+        folder, files = self.shards[path]
+        file_client = FileClient.get_for_target(folder)
+        output_client = FileClient.get_for_target(self.output_path)
+
+        with output_client.open(path, "w") as out_file:
+            for start in range(0, len(files), READ_BATCH_SIZE):
+                batch = files[start : start + READ_BATCH_SIZE]
+                contents = file_client.cat([file for _, file in batch])
+                for id, file in batch:
+                    content = contents[file].decode(errors="ignore")
+                    # Format document data in jsonl format
+                    file_data = {"id": id, "source": file, "content": content}
+                    out_file.write(codec.dumps(file_data) + "\n")
+                    self.advance()
 
     def get_total(self, paths: list[str], **kwargs) -> int:
-        total = 0
-        for path in paths:
-            file_client = FileClient.get_for_target(path)
-            total += sum(
-                [
-                    file_client.get_file_count(f"{g}/**/*")
-                    for g in file_client.glob(path)
-                ]
-            )
-
-        return total
+        return sum(len(self.shards[path][1]) for path in paths)
@@ -105,14 +105,14 @@ def news_example(data_dir="example"):
     print("Deduplicating documents. Equivalent CLI command:")
     print(
         Markdown(
-            f'```md\npostit dedupe "{data_dir}/documents/*" --docs --bloom-file {data_dir}/bloom.pkl\n```'
+            f'```md\npostit dedupe "{data_dir}/documents/*" --docs --bloom-file {data_dir}/bloom.bloom\n```'
         )
     )
     Deduper.dedupe(
         glob_paths=[f"{data_dir}/documents/*"],
         experiment="dedupe",
         dedupe_docs=True,
-        bloom_file=f"{data_dir}/bloom.pkl",
+        bloom_file=f"{data_dir}/bloom.bloom",
     )
     print("Continue? (return)")
     input()
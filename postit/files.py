@@ -1,10 +1,25 @@
+import asyncio
 import gcsfs
 import glob
+import gzip
+import io
 import os
 import shutil
 
 from enum import Enum
-from typing import IO
+from fsspec.asyn import sync
+from stat import S_ISDIR
+from typing import IO, Any, Awaitable, Callable, Optional
+
+try:
+    import zstandard
+
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+DEFAULT_ZSTD_LEVEL = 3
+DEFAULT_MAX_CONCURRENCY = 32
 
 
 class FileClientTarget(Enum):
@@ -13,12 +28,111 @@ class FileClientTarget(Enum):
     S3 = "s3://"
 
 
+class Compression(Enum):
+    """
+    Compression of a file, detected from the extension of its path.
+
+    NONE: Plain files.
+    GZIP: `.gz` files.
+    ZSTD: `.zst` files, compressed with one thread per core. Install with `pip install zstandard`.
+    """
+
+    NONE = ""
+    GZIP = ".gz"
+    ZSTD = ".zst"
+
+    @staticmethod
+    def from_path(path: str) -> "Compression":
+        for compression in [Compression.GZIP, Compression.ZSTD]:
+            if path.endswith(compression.value):
+                return compression
+        return Compression.NONE
+
+    def wrap(self, file: IO, mode: str) -> IO:
+        """
+        Wraps a binary file object to stream (de)compressed content in the given mode.
+        Closing the returned stream closes the file object.
+        """
+        if self == Compression.NONE:
+            return file
+
+        writing = any(char in mode for char in "wax")
+        stream: Any
+        if self == Compression.GZIP:
+            stream = GzipStream(file, "wb" if writing else "rb")
+        elif writing:
+            self.check_installed()
+            compressor = zstandard.ZstdCompressor(level=DEFAULT_ZSTD_LEVEL, threads=-1)
+            stream = compressor.stream_writer(file, closefd=True)
+        else:
+            self.check_installed()
+            decompressor = zstandard.ZstdDecompressor()
+            stream = io.BufferedReader(
+                decompressor.stream_reader(file, read_across_frames=True, closefd=True)
+            )
+
+        if "b" in mode:
+            return stream
+        return io.TextIOWrapper(stream, encoding="utf-8")
+
+    def compress(self, content: bytes) -> bytes:
+        """
+        Compresses the content of a whole file.
+        """
+        if self == Compression.GZIP:
+            return gzip.compress(content)
+        if self == Compression.ZSTD:
+            self.check_installed()
+            compressor = zstandard.ZstdCompressor(level=DEFAULT_ZSTD_LEVEL, threads=-1)
+            return compressor.compress(content)
+        return content
+
+    def decompress(self, content: bytes) -> bytes:
+        """
+        Decompresses the content of a whole file.
+        """
+        if self == Compression.NONE:
+            return content
+        with self.wrap(io.BytesIO(content), "rb") as stream:
+            return stream.read()
+
+    def check_installed(self) -> None:
+        """
+        Raises an ImportError if the library used by the compression is not installed.
+        """
+        if self == Compression.ZSTD and not HAS_ZSTANDARD:
+            raise ImportError(
+                "Reading and writing .zst files requires zstandard. Install with `pip install zstandard`."
+            )
+
+
+class GzipStream(gzip.GzipFile):
+    """
+    A gzip stream over a file object, which is closed with the stream.
+    """
+
+    def __init__(self, file: IO, mode: str):
+        super().__init__(fileobj=file, mode=mode)
+        self.file = file
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self.file.close()
+
+
 class FileClient:
     """
     A base class for file clients. Supports local file operations.
     Derived classes add support for cloud storage services.
+
+    Files with a `.gz` or `.zst` extension are (de)compressed transparently while streaming.
     """
 
+    # Whether paths are on the local filesystem, which allows memory-mapping
+    is_local = True
+
     @staticmethod
     def get_for_target(path: str) -> "FileClient":
         """
@@ -38,19 +152,77 @@ class FileClient:
             return FileClient()
 
     def open(self, path: str, mode: str) -> IO:
+        """
+        Opens a file, decompressing or compressing its content based on the extension of the path.
+        """
+        compression = Compression.from_path(path)
+        if compression == Compression.NONE:
+            return self.open_file(path, mode)
+
+        file_mode = mode.replace("t", "").replace("b", "") + "b"
+        return compression.wrap(self.open_file(path, file_mode), mode)
+
+    def open_file(self, path: str, mode: str) -> IO:
+        """
+        Opens the stored file, without decompressing its content.
+        """
+        if any(char in mode for char in "wax"):
+            dir_path = os.path.dirname(path)
+            if dir_path:
+                os.makedirs(dir_path, exist_ok=True)
         return open(path, mode)
 
     def read(self, path: str) -> str:
-        with open(path, "rb") as file:
+        with self.open(path, "rb") as file:
             return file.read().decode(errors="ignore")
 
     def write(self, path: str, content: str) -> None:
-        dir_path = os.path.dirname(path)
-        os.makedirs(dir_path, exist_ok=True)
+        with self.open(path, "w") as file:
+            file.write(content)
+
+    def read_bytes(self, path: str) -> bytes:
+        with self.open(path, "rb") as file:
+            return file.read()
 
-        with open(path, "w") as file:
+    def write_bytes(self, path: str, content: bytes) -> None:
+        with self.open(path, "wb") as file:
             file.write(content)
 
+    def cat(self, paths: list[str], missing_ok: bool = False) -> dict[str, bytes]:
+        """
+        Reads the content of many files, decompressing compressed files.
+        Missing files raise FileNotFoundError, or are left out of the result with `missing_ok`.
+
+        Returns:
+            dict[str, bytes]: The content of each file, by path.
+        """
+        contents = {}
+        for path in paths:
+            try:
+                contents[path] = self.read_bytes(path)
+            except FileNotFoundError:
+                if not missing_ok:
+                    raise
+        return contents
+
+    def pipe(self, contents: dict[str, bytes]) -> None:
+        """
+        Writes many files, compressing files with a compression extension.
+        """
+        for path, content in contents.items():
+            self.write_bytes(path, content)
+
+    def info(self, paths: list[str]) -> list[dict]:
+        """
+        Returns the metadata of many paths, in order: their `name`, `size` and `type` ("file" or "directory").
+        """
+        infos = []
+        for path in paths:
+            stat = os.stat(path)
+            file_type = "directory" if S_ISDIR(stat.st_mode) else "file"
+            infos.append({"name": path, "size": stat.st_size, "type": file_type})
+        return infos
+
     def remove(self, path: str) -> None:
         if os.path.isdir(path):
             shutil.rmtree(path)
@@ -67,6 +239,22 @@ class FileClient:
         paths = self.glob(path)
         return sum([1 for p in paths if self.is_file(p)])
 
+    def get_size(self, path: str) -> int:
+        return os.path.getsize(path)
+
+    def count_lines(self, path: str, chunk_size: int = 1 << 20) -> int:
+        """
+        Counts the lines in a file by streaming it in chunks, without decoding or splitting the content.
+        A final line without a trailing newline is counted.
+        """
+        count = 0
+        last = b"\n"
+        with self.open(path, "rb") as file:
+            while chunk := file.read(chunk_size):
+                count += chunk.count(b"\n")
+                last = chunk[-1:]
+        return count + (last != b"\n")
+
     @staticmethod
     def is_glob(path: str) -> bool:
         return any(char in path for char in ["*", "?", "[", "]"])
@@ -75,20 +263,81 @@ class FileClient:
 class GSFileClient(FileClient):
     """
     A file client implementation for Google Cloud Storage (GCS).
+
+    Batched operations (`cat`, `pipe` and `info`) run concurrently on the event loop of gcsfs.
+    All clients of a process share one filesystem, so connections are reused across calls.
+    The event loop of gcsfs is not fork-safe, so forked worker processes create their own filesystem on first use.
+
+    Attributes:
+        max_concurrency (int): The maximum number of requests in flight during a batched operation.
     """
 
-    gcs = gcsfs.GCSFileSystem()
+    _gcs: Optional[gcsfs.GCSFileSystem] = None
+    _gcs_pid: Optional[int] = None
+    is_local = False
 
-    def open(self, path: str, mode: str) -> IO:
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        if max_concurrency <= 0:
+            raise ValueError("The maximum concurrency must be positive.")
+        self.max_concurrency = max_concurrency
+
+    @property
+    def gcs(self) -> gcsfs.GCSFileSystem:
+        if GSFileClient._gcs is None or GSFileClient._gcs_pid != os.getpid():
+            GSFileClient._gcs = gcsfs.GCSFileSystem(skip_instance_cache=True)
+            GSFileClient._gcs_pid = os.getpid()
+        return GSFileClient._gcs
+
+    def open_file(self, path: str, mode: str) -> IO:
         return self.gcs.open(path, mode)
 
-    def read(self, path: str) -> str:
-        with self.gcs.open(path, "rb") as file:
-            return file.read().decode(errors="ignore")
+    def cat(self, paths: list[str], missing_ok: bool = False) -> dict[str, bytes]:
+        results = self.gather(self.gcs._cat_file, [(path,) for path in paths])
+        contents = {}
+        for path, result in zip(paths, results):
+            if missing_ok and isinstance(result, FileNotFoundError):
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            contents[path] = Compression.from_path(path).decompress(result)
+        return contents
 
-    def write(self, path: str, content: str) -> None:
-        with self.gcs.open(path, "w") as file:
-            file.write(content)
+    def pipe(self, contents: dict[str, bytes]) -> None:
+        calls = [
+            (path, Compression.from_path(path).compress(content))
+            for path, content in contents.items()
+        ]
+        for result in self.gather(self.gcs._pipe_file, calls):
+            if isinstance(result, BaseException):
+                raise result
+
+    def info(self, paths: list[str]) -> list[dict]:
+        infos = self.gather(self.gcs._info, [(path,) for path in paths])
+        for info in infos:
+            if isinstance(info, BaseException):
+                raise info
+        return infos
+
+    def gather(self, fn: Callable[..., Awaitable], calls: list[tuple]) -> list:
+        """
+        Runs an async gcsfs method once per argument tuple, with at most `max_concurrency` calls in flight.
+        Returns the results in order, with the exceptions raised by failed calls.
+        """
+
+        async def run_all() -> list:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def run(args: tuple):
+                async with semaphore:
+                    return await fn(*args)
+
+            return await asyncio.gather(
+                *(run(args) for args in calls), return_exceptions=True
+            )
+
+        if not calls:
+            return []
+        return sync(self.gcs.loop, run_all)
 
     def remove(self, path: str) -> None:
         self.gcs.rm(path, recursive=True)
@@ -101,8 +350,12 @@ class GSFileClient(FileClient):
         return self.gcs.isfile(path)
 
     def get_file_count(self, path: str) -> int:
-        paths = self.glob(path)
-        return sum([1 for p in paths if self.is_file(p)])
+        # Listings include the type of each path, so files are counted without a request per path
+        infos = self.gcs.glob(path, detail=True).values()
+        return sum([1 for info in infos if info["type"] == "file"])
+
+    def get_size(self, path: str) -> int:
+        return self.gcs.size(path)
 
 
 class S3FileClient(FileClient):
@@ -112,4 +365,4 @@ class S3FileClient(FileClient):
     TODO: Implement S3 file operations.
     """
 
-    pass
+    is_local = False
@@ -0,0 +1,632 @@
+import json
+import numpy as np
+import struct
+
+from enum import Enum
+from postit.files import FileClient
+from postit.types import File
+from postit.utils import codec
+from postit.utils.paths import get_tags_path, split_compression, strip_ext
+from typing import IO, Iterable, Iterator, Mapping, Optional, Union
+
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+
+
+class TagFormat(Enum):
+    """
+    Storage formats for tag files.
+
+    JSONL: One JSON object per line. The first line holds the file tags, each following line the tags of a document.
+    COLUMNAR: A compact binary layout of typed arrays. See TagTable.
+    """
+
+    JSONL = "jsonl"
+    COLUMNAR = "columnar"
+
+    def get_path(self, path: str, experiment: str) -> str:
+        """
+        Returns the path of the tags file of an experiment for a documents file.
+        JSONL tags keep the name of the documents file, columnar tags use the `.ptag` extension.
+        Both keep the compression extension of the documents file.
+        """
+        tags_path = get_tags_path(path, experiment)
+        if self == TagFormat.COLUMNAR:
+            return strip_ext(tags_path) + ".ptag" + split_compression(tags_path)[1]
+        return tags_path
+
+
+class TagTable:
+    """
+    Columnar storage for the tags of a file.
+
+    Every tag span of every document is a row in a set of flat arrays.
+    Documents are contiguous ranges of rows, delimited by `offsets`.
+    Tag names and string values are stored once in dictionaries and referenced by index.
+    NOTE: Document ids must be integers. Document sources are not stored.
+
+    Attributes:
+        source (str): The source of the file.
+        file_tags (dict): The file-level tags.
+        doc_ids (np.ndarray): The id of each document. (int64)
+        offsets (np.ndarray): Row offsets of each document, with a final entry for the end. (int64)
+        names (list[str]): The dictionary of tag names.
+        name_idx (np.ndarray): The index into `names` of each row. (uint32)
+        starts (np.ndarray): The start of each row. (int64)
+        ends (np.ndarray): The end of each row. (int64)
+        kinds (np.ndarray): The type of the value of each row. See INT, FLOAT and STR. (uint8)
+        values (np.ndarray): The value of each row. String values hold an index into `strings`. (float64)
+            Integers above 2**53 are rounded, their exact value is in `ints`.
+        strings (list[str]): The dictionary of string values.
+        ints (np.ndarray): The exact value of integer rows, 0 for other rows. (int64)
+    """
+
+    MAGIC = b"PTAG"
+    VERSION = 2
+    # Version 1 tables have no `ints` column, their integers are read from `values`
+    SUPPORTED_VERSIONS = (1, 2)
+    HEADER = struct.Struct("<4sHHQ")
+
+    # Column order and in-memory types. Columns are stored with the narrowest lossless type.
+    COLUMNS: list[tuple[str, np.dtype]] = [
+        ("doc_ids", np.dtype("<i8")),
+        ("offsets", np.dtype("<i8")),
+        ("starts", np.dtype("<i8")),
+        ("ends", np.dtype("<i8")),
+        ("values", np.dtype("<f8")),
+        ("name_idx", np.dtype("<u4")),
+        ("kinds", np.dtype("u1")),
+        ("ints", np.dtype("<i8")),
+    ]
+
+    INT = 0
+    FLOAT = 1
+    STR = 2
+
+    __slots__ = (
+        "source",
+        "file_tags",
+        "doc_ids",
+        "offsets",
+        "names",
+        "name_idx",
+        "starts",
+        "ends",
+        "kinds",
+        "values",
+        "strings",
+        "ints",
+    )
+
+    def __init__(
+        self,
+        source: str,
+        file_tags: dict,
+        doc_ids: np.ndarray,
+        offsets: np.ndarray,
+        names: list[str],
+        name_idx: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        kinds: np.ndarray,
+        values: np.ndarray,
+        strings: list[str],
+        ints: Optional[np.ndarray] = None,
+    ):
+        self.source = source
+        self.file_tags = file_tags
+        self.doc_ids = doc_ids
+        self.offsets = offsets
+        self.names = names
+        self.name_idx = name_idx
+        self.starts = starts
+        self.ends = ends
+        self.kinds = kinds
+        self.values = values
+        self.strings = strings
+        self.ints = (
+            ints
+            if ints is not None
+            else np.where(kinds == TagTable.INT, values, 0).astype(np.int64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @staticmethod
+    def from_docs(
+        source: str, file_tags: dict, docs: Iterable[tuple[int, dict]]
+    ) -> "TagTable":
+        """
+        Creates a TagTable from the tags of each document.
+        Integer values must fit in 64 bits.
+
+        Args:
+            source (str): The source of the file.
+            file_tags (dict): The file-level tags.
+            docs (Iterable[tuple[int, dict]]): The id and tags of each document. Consumed lazily.
+
+        Returns:
+            TagTable: The created TagTable object.
+        """
+        names: dict[str, int] = {}
+        strings: dict[str, int] = {}
+        doc_ids, offsets = [], [0]
+        name_idx, starts, ends, kinds, values, ints = [], [], [], [], [], []
+
+        for doc_id, tags in docs:
+            doc_ids.append(doc_id)
+            for name, spans in tags.items():
+                index = names.setdefault(name, len(names))
+                for start, end, value in spans:
+                    name_idx.append(index)
+                    starts.append(start)
+                    ends.append(end)
+                    if isinstance(value, str):
+                        kinds.append(TagTable.STR)
+                        values.append(strings.setdefault(value, len(strings)))
+                        ints.append(0)
+                    elif isinstance(value, (int, np.integer)):
+                        if not INT64_MIN <= value <= INT64_MAX:
+                            raise ValueError(
+                                f"Tag {name} has an integer value that does not fit in 64 bits: {value}"
+                            )
+                        kinds.append(TagTable.INT)
+                        values.append(int(value))
+                        ints.append(int(value))
+                    else:
+                        kinds.append(TagTable.FLOAT)
+                        values.append(value)
+                        ints.append(0)
+            offsets.append(len(starts))
+
+        return TagTable(
+            source=source,
+            file_tags=file_tags,
+            doc_ids=np.array(doc_ids, dtype=np.int64),
+            offsets=np.array(offsets, dtype=np.int64),
+            names=list(names),
+            name_idx=np.array(name_idx, dtype=np.uint32),
+            starts=np.array(starts, dtype=np.int64),
+            ends=np.array(ends, dtype=np.int64),
+            kinds=np.array(kinds, dtype=np.uint8),
+            values=np.array(values, dtype=np.float64),
+            strings=list(strings),
+            ints=np.array(ints, dtype=np.int64),
+        )
+
+    @staticmethod
+    def from_file(file: File) -> "TagTable":
+        """
+        Creates a TagTable from the tags of a tagged File.
+        """
+        return TagTable.from_docs(
+            file.source, file.tags, ((doc.id, doc.tags) for doc in file.content)
+        )
+
+    @staticmethod
+    def from_jsonl(raw: str) -> "TagTable":
+        """
+        Creates a TagTable from the content of a JSONL tags file.
+        """
+        lines = [line for line in raw.split("\n") if line.strip()]
+        if not lines:
+            return TagTable.from_docs("", {}, [])
+
+        header = codec.loads(lines[0])
+        docs = (codec.decode_tags(line) for line in lines[1:])
+        return TagTable.from_docs(header["source"], header["tags"], docs)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the table.
+
+        Layout: magic, version, metadata length, JSON metadata, then the raw columns.
+        Each column is stored with the narrowest type that holds its values and padded to 8 bytes.
+        """
+        columns = [
+            np.ascontiguousarray(getattr(self, name), dtype=dtype)
+            for name, dtype in self.COLUMNS
+        ]
+        columns = [column.astype(compact_dtype(column)) for column in columns]
+        meta = json.dumps(
+            {
+                "source": self.source,
+                "file_tags": self.file_tags,
+                "names": self.names,
+                "strings": self.strings,
+                "num_docs": len(self.doc_ids),
+                "num_rows": len(self.starts),
+                "dtypes": [column.dtype.str for column in columns],
+            }
+        ).encode()
+
+        chunks = [self.HEADER.pack(self.MAGIC, self.VERSION, 0, len(meta))]
+        for chunk in [meta, *[column.tobytes() for column in columns]]:
+            chunks.append(chunk)
+            chunks.append(b"\0" * (-len(chunk) % 8))
+
+        return b"".join(chunks)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "TagTable":
+        """
+        Deserializes a table.
+        """
+        magic, version, _, meta_len = TagTable.HEADER.unpack_from(data)
+        if magic != TagTable.MAGIC:
+            raise ValueError("Not a columnar tags file.")
+        if version not in TagTable.SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported columnar tags version: {version}")
+
+        offset = TagTable.HEADER.size
+        meta = json.loads(data[offset : offset + meta_len])
+        offset += meta_len + (-meta_len % 8)
+
+        counts = {"doc_ids": meta["num_docs"], "offsets": meta["num_docs"] + 1}
+        columns = {}
+        for (name, dtype), stored in zip(TagTable.COLUMNS, meta["dtypes"]):
+            count = counts.get(name, meta["num_rows"])
+            column = np.frombuffer(data, dtype=stored, count=count, offset=offset)
+            columns[name] = column.astype(dtype, copy=False)
+            offset += column.nbytes + (-column.nbytes % 8)
+
+        return TagTable(
+            source=meta["source"],
+            file_tags=meta["file_tags"],
+            names=meta["names"],
+            strings=meta["strings"],
+            **columns,
+        )
+
+    def get_value(self, row: int) -> Union[int, float, str]:
+        """
+        Returns the value of a row with its original type.
+        """
+        value = self.values[row]
+        kind = self.kinds[row]
+        if kind == TagTable.STR:
+            return self.strings[int(value)]
+        if kind == TagTable.INT:
+            return int(self.ints[row])
+        return float(value)
+
+    def get_doc_tags(self, index: int) -> dict[str, list]:
+        """
+        Returns the tags of a document in the same format as a JSONL tags file.
+        """
+        rows = slice(self.offsets[index], self.offsets[index + 1])
+        tags: dict[str, list] = {}
+        for name, start, end, kind, value, exact in zip(
+            self.name_idx[rows].tolist(),
+            self.starts[rows].tolist(),
+            self.ends[rows].tolist(),
+            self.kinds[rows].tolist(),
+            self.values[rows].tolist(),
+            self.ints[rows].tolist(),
+        ):
+            if kind == TagTable.STR:
+                value = self.strings[int(value)]
+            elif kind == TagTable.INT:
+                value = exact
+            tags.setdefault(self.names[name], []).append([start, end, value])
+        return tags
+
+    def iter_docs(self) -> Iterator[tuple[int, dict]]:
+        """
+        Yields the id and tags of each document.
+        """
+        for index, doc_id in enumerate(self.doc_ids.tolist()):
+            yield doc_id, self.get_doc_tags(index)
+
+
+def compact_dtype(array: np.ndarray) -> np.dtype:
+    """
+    Returns the narrowest little-endian type that stores the values of an array without loss.
+    Floats are only narrowed to integers when every value is integral.
+    """
+    if array.size == 0:
+        return np.dtype("u1")
+    if array.dtype.kind == "f":
+        if not np.all(np.mod(array, 1) == 0) or np.abs(array).max() > 2**53:
+            return np.dtype("<f8")
+
+    low, high = array.min(), array.max()
+    candidates = ["u1", "<u2", "<u4"] if low >= 0 else ["i1", "<i2", "<i4"]
+    for candidate in candidates:
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            return np.dtype(candidate)
+    return np.dtype("<i8")
+
+
+def write_tags(
+    file_client: FileClient,
+    path: str,
+    file: File,
+    tag_format: TagFormat = TagFormat.JSONL,
+) -> None:
+    """
+    Writes the tags of a tagged File in the given format.
+    """
+    file_client.write_bytes(path, encode_tags(file, tag_format))
+
+
+def encode_tags(file: File, tag_format: TagFormat = TagFormat.JSONL) -> bytes:
+    """
+    Returns the content of the tags file of a tagged File in the given format.
+    """
+    if tag_format == TagFormat.COLUMNAR:
+        return TagTable.from_file(file).to_bytes()
+    return file.get_tags().encode()
+
+
+def read_tags(
+    file_client: FileClient,
+    path: str,
+    experiment: str,
+    tag_format: Optional[TagFormat] = None,
+) -> TagTable:
+    """
+    Reads the tags of an experiment for a documents file.
+    Columnar tags are preferred, JSONL tags are used otherwise, unless a format is given.
+    """
+    return read_tags_batch(file_client, path, [experiment], tag_format)[0]
+
+
+def read_tags_batch(
+    file_client: FileClient,
+    path: str,
+    experiments: list[str],
+    tag_format: Optional[TagFormat] = None,
+) -> list[TagTable]:
+    """
+    Reads the tags of several experiments for a documents file, in the order of the experiments.
+    Tags files are fetched together, so remote storage serves them concurrently.
+    Columnar tags are preferred, JSONL tags are used otherwise, unless a format is given.
+    NOTE: TaggerProcessor removes the tags of the other format when it writes an experiment.
+    """
+    tables = {}
+    if tag_format != TagFormat.JSONL:
+        tables = read_columnar_tags(file_client, path, experiments)
+    if tag_format == TagFormat.COLUMNAR:
+        missing = [experiment for experiment in experiments if experiment not in tables]
+        if missing:
+            raise FileNotFoundError(
+                f"No columnar tags for {path} in experiments: {', '.join(missing)}"
+            )
+    jsonl_paths = {
+        experiment: TagFormat.JSONL.get_path(path, experiment)
+        for experiment in experiments
+        if experiment not in tables
+    }
+    contents = file_client.cat(list(jsonl_paths.values()))
+    for experiment, jsonl_path in jsonl_paths.items():
+        content = contents[jsonl_path].decode(errors="ignore")
+        tables[experiment] = TagTable.from_jsonl(content)
+    return [tables[experiment] for experiment in experiments]
+
+
+def read_columnar_tags(
+    file_client: FileClient, path: str, experiments: list[str]
+) -> dict[str, TagTable]:
+    """
+    Reads the columnar tags of several experiments for a documents file.
+    Experiments without columnar tags are left out.
+    """
+    paths = {
+        experiment: TagFormat.COLUMNAR.get_path(path, experiment)
+        for experiment in experiments
+    }
+    contents = file_client.cat(list(paths.values()), missing_ok=True)
+    return {
+        experiment: TagTable.from_bytes(contents[columnar_path])
+        for experiment, columnar_path in paths.items()
+        if columnar_path in contents
+    }
+
+
+class TagReader:
+    """
+    Reads the tags of an experiment for a documents file, one document at a time.
+
+    Documents are expected in the order of the documents file and are read in lockstep with it:
+    every document is either requested with `get` or passed with `skip`, so only the current line is held in memory.
+    JSONL lines are only parsed when requested. Columnar tags are loaded as a compact TagTable,
+    and the tags of a document are only decoded when requested.
+    If a requested document is not on the expected line, the rest of the file is indexed by id instead.
+
+    Columnar tags that were already read can be passed as `table`.
+    Otherwise, columnar tags are looked for unless `columnar` is False, and JSONL tags are used if there are none.
+
+    Attributes:
+        source (str): The source of the tagged file.
+        file_tags (dict): The file-level tags.
+    """
+
+    def __init__(
+        self,
+        file_client: FileClient,
+        path: str,
+        experiment: str,
+        table: Optional[TagTable] = None,
+        columnar: bool = True,
+    ):
+        self.table = table
+        self.file_client = file_client
+        self.tags_path = TagFormat.JSONL.get_path(path, experiment)
+        self.file: Optional[IO] = None
+        self.position = 0
+        self.index: Optional[dict[int, Union[int, bytes]]] = None
+        if self.table is None and columnar:
+            self.table = read_columnar_tags(file_client, path, [experiment]).get(
+                experiment
+            )
+
+        if self.table is not None:
+            self.source = self.table.source
+            self.file_tags = self.table.file_tags
+        else:
+            self.file = file_client.open(self.tags_path, "rb")
+            header = self.read_line()
+            data: dict = codec.loads(header) if header else {"source": "", "tags": {}}
+            self.source = data["source"]
+            self.file_tags = data["tags"]
+
+    def __enter__(self) -> "TagReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def read_line(self) -> Optional[bytes]:
+        """
+        Returns the next non-empty line of a JSONL tags file, or None at the end of the file.
+        """
+        assert self.file is not None
+        for line in self.file:
+            if line.strip():
+                return line
+        return None
+
+    def find_taggers(self, taggers: set[str]) -> set[str]:
+        """
+        Returns which of the given taggers have file or document tags in the experiment.
+        Columnar tags list their tag names. JSONL tags are read from a separate handle until every tagger is found.
+        """
+        names = set(self.file_tags)
+        if self.table is not None:
+            names.update(self.table.names)
+        found = {name.split("/")[0] for name in names} & taggers
+        if self.table is not None or found == taggers:
+            return found
+
+        with self.file_client.open(self.tags_path, "rb") as file:
+            # The first line holds the file tags
+            lines = (line for line in file if line.strip())
+            next(lines, None)
+            for line in lines:
+                found.update(name.split("/")[0] for name in codec.decode_tags(line)[1])
+                if taggers <= found:
+                    break
+        return found & taggers
+
+    def get(self, doc_id: int) -> dict[str, list]:
+        """
+        Returns the tags of the next document, or an empty dict if the document has no tags.
+        """
+        if self.index is not None:
+            return self.get_indexed(doc_id)
+
+        if self.table is not None:
+            doc_ids = self.table.doc_ids
+            if self.position < len(doc_ids) and doc_ids[self.position] == doc_id:
+                self.position += 1
+                return self.table.get_doc_tags(self.position - 1)
+            self.index = {value: i for i, value in enumerate(doc_ids.tolist())}
+            return self.get_indexed(doc_id)
+
+        line = self.read_line()
+        if line is None:
+            return {}
+        line_id, tags = codec.decode_tags(line)
+        if line_id == doc_id:
+            return tags
+
+        self.index = {line_id: line}
+        while (line := self.read_line()) is not None:
+            self.index[codec.decode_tags(line)[0]] = line
+        return self.get_indexed(doc_id)
+
+    def get_indexed(self, doc_id: int) -> dict[str, list]:
+        assert self.index is not None
+        if doc_id not in self.index:
+            return {}
+        entry = self.index.pop(doc_id)
+        if isinstance(entry, bytes):
+            return codec.decode_tags(entry)[1]
+        assert self.table is not None
+        return self.table.get_doc_tags(entry)
+
+    def skip(self) -> None:
+        """
+        Passes the next document without parsing its tags.
+        """
+        if self.index is not None:
+            return
+        if self.table is not None:
+            self.position += 1
+        else:
+            self.read_line()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.index = None
+
+
+class DocImports(Mapping[str, list]):
+    """
+    The tags of a document imported from other experiments, keyed by tag name.
+    Tags are only read when first requested. Later experiments override earlier ones.
+    NOTE: Created by the processor for each document. Call `release` once the document is tagged.
+
+    Readers are read in lockstep with the documents, so the imports of a batch are linked with `previous`.
+    Requesting the tags of a document first reads the tags of earlier documents that are still pending,
+    so documents can be accessed in any order without the readers falling back to indexing the file.
+
+    Attributes:
+        doc_id (int): The id of the document.
+        file_tags (dict): The file-level tags of the imported experiments, keyed by source.
+    """
+
+    def __init__(
+        self,
+        doc_id: int,
+        readers: list[TagReader],
+        previous: Optional["DocImports"] = None,
+    ):
+        self.doc_id = doc_id
+        self.readers = readers
+        self.previous = previous
+        self.file_tags = {reader.source: reader.file_tags for reader in readers}
+        self._tags: Optional[dict[str, list]] = None
+
+    @property
+    def tags(self) -> dict[str, list]:
+        if self._tags is None:
+            pending = []
+            imports: Optional[DocImports] = self
+            while imports is not None and imports._tags is None:
+                pending.append(imports)
+                imports = imports.previous
+            for imports in reversed(pending):
+                imports.read()
+        assert self._tags is not None
+        return self._tags
+
+    def read(self) -> None:
+        self._tags = {}
+        for reader in self.readers:
+            self._tags.update(reader.get(self.doc_id))
+        self.previous = None
+
+    def __getitem__(self, tag_name: str) -> list:
+        return self.tags[tag_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tags)
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def release(self) -> None:
+        """
+        Advances the readers past this document if its tags were never requested.
+        Documents must be released in order.
+        """
+        if self._tags is None:
+            for reader in self.readers:
+                reader.skip()
+            self._tags = {}
+        self.previous = None
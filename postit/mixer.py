@@ -1,19 +1,60 @@
 import json
+import numpy as np
 import operator
 import os
 import yaml
 
+from itertools import chain
 from postit.files import FileClient
-from postit.processor import BaseProcessor
-from postit.utils.paths import get_documents_path
-from typing import Union
+from postit.formats import TagTable, read_tags_batch
+from postit.processor import (
+    DEFAULT_IO_WORKERS,
+    DEFAULT_PREFETCH,
+    BaseProcessor,
+    ProcessorBackend,
+    TotalStrategy,
+)
+from postit.utils import codec
+from postit.utils.intervals import difference
+from postit.utils.paths import get_documents_path, split_compression, strip_ext
+from postit.utils.shards import DEFAULT_SHARD_SIZE, OrderedWriter, ShardWriter
+from typing import Any, Callable, Iterable, Iterator, Union
 
 # TODO: improve error handling
 
 
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "in": lambda x, y: x in y,
+    "not in": lambda x, y: x not in y,
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+# Vectorized counterparts of OPERATORS for numeric values
+ARRAY_OPERATORS: dict[str, Callable[[np.ndarray, Any], np.ndarray]] = {
+    "in": np.isin,
+    "not in": lambda x, y: np.isin(x, y, invert=True),
+    "==": np.equal,
+    "!=": np.not_equal,
+    ">": np.greater,
+    "<": np.less,
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+}
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+
 class Condition:
     """
     A condition to filter documents based on tags.
+    The operator is compiled once on creation.
 
     Attributes:
         tag (str): The tag to filter on.
@@ -29,9 +70,13 @@ class Condition:
     value: Union[float, str, list]
 
     def __init__(self, tag: str, operator: str, value: Union[float, str, list]):
+        if operator not in OPERATORS:
+            raise ValueError(f"Invalid operator: {operator}")
+
         self.tag = tag
         self.operator = operator
         self.value = value
+        self.compare = OPERATORS[operator]
 
     @staticmethod
     def from_dict(data: dict) -> "Condition":
@@ -39,6 +84,9 @@ class Condition:
             tag=data["tag"], operator=data["operator"], value=data["value"]
         )
 
+    def to_dict(self) -> dict:
+        return {"tag": self.tag, "operator": self.operator, "value": self.value}
+
     def eval(self, doc: dict) -> list:
         """
         Evaluate the given condition on the document and return a list of valid tags.
@@ -49,25 +97,123 @@ class Condition:
         Returns:
             list: A list of valid tags that satisfy the condition.
         """
-        operators = {
-            "in": lambda x, y: x in y,
-            "not in": lambda x, y: x not in y,
-            "==": operator.eq,
-            "!=": operator.ne,
-            ">": operator.gt,
-            "<": operator.lt,
-            ">=": operator.ge,
-            "<=": operator.le,
-        }
-        if self.operator not in operators:
-            raise ValueError(f"Invalid operator: {self.operator}")
-
         return [
-            tag
-            for tag in doc.get(self.tag, [])
-            if operators[self.operator](tag[2], self.value)
+            tag for tag in doc.get(self.tag, []) if self.compare(tag[2], self.value)
         ]
 
+    def eval_batch(self, docs: list[dict], tables: list[TagTable]) -> list[list]:
+        """
+        Evaluate the condition on a batch of documents at once.
+        Equivalent to calling eval() on each document, but values are compared over the arrays of the tag tables.
+
+        Args:
+            docs (list[dict]): The documents, with the tags of the tables merged in by Mixer.merge_tags().
+            tables (list[TagTable]): The tags of the documents, one table per experiment.
+
+        Returns:
+            list[list]: The valid tags of each document.
+        """
+        num_docs = len(docs)
+        ids = np.array([doc["id"] for doc in docs], dtype=np.int64)
+        results: list[list] = [[] for _ in range(num_docs)]
+
+        # Later tables override the tags of earlier ones, as in Mixer.merge_tags()
+        source = np.full(num_docs, -1)
+        table_rows: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        for t, table in enumerate(tables):
+            if self.tag not in table.names:
+                continue
+
+            count = min(num_docs, len(table))
+            row_docs = np.repeat(np.arange(len(table)), np.diff(table.offsets))
+            rows = np.flatnonzero(
+                (table.name_idx == table.names.index(self.tag)) & (row_docs < count)
+            )
+
+            has_tag = np.zeros(num_docs, dtype=bool)
+            has_tag[row_docs[rows]] = True
+            has_tag[:count] &= table.doc_ids[:count] == ids[:count]
+            source[has_tag] = t
+            table_rows[t] = (rows, row_docs[rows])
+
+        for t, (rows, row_docs) in table_rows.items():
+            selected = source[row_docs] == t
+            rows, row_docs = rows[selected], row_docs[selected]
+            if not len(rows):
+                continue
+
+            # The rows of a tag are contiguous within a document, in the order of the merged tags
+            doc_starts = np.flatnonzero(np.diff(row_docs, prepend=-1))
+            counts = np.diff(np.append(doc_starts, len(rows)))
+            positions = np.arange(len(rows)) - np.repeat(doc_starts, counts)
+
+            matches = self.match(tables[t], rows)
+            doc_matches = np.add.reduceat(matches, doc_starts).tolist()
+            match_positions = positions[matches].tolist()
+            match_ends = np.cumsum(doc_matches).tolist()
+            for doc, count, num_matches, end in zip(
+                row_docs[doc_starts].tolist(),
+                counts.tolist(),
+                doc_matches,
+                match_ends,
+            ):
+                spans = docs[doc][self.tag]
+                if num_matches == count:
+                    results[doc] = spans[:]
+                elif num_matches:
+                    results[doc] = [
+                        spans[k] for k in match_positions[end - num_matches : end]
+                    ]
+
+        # Tags that are part of the documents themselves
+        for doc in np.flatnonzero(source == -1).tolist():
+            if self.tag in docs[doc]:
+                results[doc] = self.eval(docs[doc])
+
+        return results
+
+    def match(self, table: TagTable, rows: np.ndarray) -> np.ndarray:
+        """
+        Returns a mask of the rows of a table whose values satisfy the condition.
+        Numeric comparisons and string equality are vectorized, anything else is compared row by row.
+        """
+        values = table.values[rows]
+        is_str = table.kinds[rows] == TagTable.STR
+        # Integers that float values round are compared exactly, row by row
+        exact = not np.any(
+            (table.kinds[rows] == TagTable.INT) & (np.abs(values) > 2**53)
+        )
+
+        if exact and is_number(self.value) and not np.any(is_str):
+            return ARRAY_OPERATORS[self.operator](values, self.value)
+
+        if isinstance(self.value, str) and self.operator in ["==", "!="]:
+            index = (
+                table.strings.index(self.value) if self.value in table.strings else -1
+            )
+            mask = is_str & (values == index)
+            return mask if self.operator == "==" else ~mask
+
+        if (
+            exact
+            and isinstance(self.value, list)
+            and self.operator in ["in", "not in"]
+            and all(is_number(x) or isinstance(x, str) for x in self.value)
+        ):
+            numbers = [x for x in self.value if is_number(x)]
+            strings = [
+                table.strings.index(x)
+                for x in self.value
+                if isinstance(x, str) and x in table.strings
+            ]
+            mask = np.where(is_str, np.isin(values, strings), np.isin(values, numbers))
+            return mask if self.operator == "in" else ~mask
+
+        return np.array(
+            [self.compare(table.get_value(row), self.value) for row in rows.tolist()],
+            dtype=bool,
+        )
+
 
 class MixerConfig:
     """
@@ -77,8 +223,12 @@ class MixerConfig:
         name (str): The name of the mixer.
         tags (list[str]): The tags associated with the mixer.
         input_paths (list[str]): The input paths for the mixer. Supports glob patterns.
-        output_path (str): The output path for the mixer.
+        output_path (str): The output path of all inputs. A directory of shards when streaming.
+            Defaults to a directory named after the mixer, adjacent to the `documents` directory of each input.
         conditions (dict[str, list[Condition]]): The conditions for the mixer.
+        stream (bool): Whether each input file is written directly to its own output shards.
+            Input files sharing an output directory must have distinct paths relative to their `documents` directory.
+        max_shard_size (int): The maximum size of an output shard in bytes when streaming.
     """
 
     name: str
@@ -86,6 +236,8 @@ class MixerConfig:
     input_paths: list[str]
     output_path: str
     conditions: dict[str, list[Condition]]
+    stream: bool
+    max_shard_size: int
 
     def __init__(
         self,
@@ -97,12 +249,16 @@ class MixerConfig:
             "include": [],
             "exclude": [],
         },
+        stream: bool = False,
+        max_shard_size: int = DEFAULT_SHARD_SIZE,
     ):
         self.name = name
         self.experiments = experiments
         self.input_paths = input_paths
         self.output_path = output_path
         self.conditions = conditions
+        self.stream = stream
+        self.max_shard_size = max_shard_size
 
     @staticmethod
     def load(path: str) -> "MixerConfig":
@@ -140,9 +296,11 @@ class MixerConfig:
             "input_paths": self.input_paths,
             "output_path": self.output_path,
             "conditions": {
-                key: [cond.__dict__ for cond in value]
+                key: [cond.to_dict() for cond in value]
                 for key, value in self.conditions.items()
             },
+            "stream": self.stream,
+            "max_shard_size": self.max_shard_size,
         }
         ext = os.path.splitext(path)[1]
         if ext == ".json":
@@ -165,26 +323,72 @@ class Mixer(BaseProcessor):
     label = "Mixing"
 
     @staticmethod
-    def mix(config: MixerConfig, num_processes: int = 1) -> None:
+    def mix(
+        config: MixerConfig,
+        num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        total_strategy: TotalStrategy | str = TotalStrategy.COUNT,
+        io_workers: int = DEFAULT_IO_WORKERS,
+        prefetch: int = DEFAULT_PREFETCH,
+    ) -> None:
         Mixer.label = f"Mixing ({config.name})"
+
+        # Expand every input up front so all files share a single pool
+        output_paths: dict[str, str] = {}
+        file_client = FileClient.get_for_target(config.input_paths[0])
         for input_path in config.input_paths:
+            if type(FileClient.get_for_target(input_path)) is not type(file_client):
+                raise ValueError("All input paths of a mix must use the same storage.")
+
             paths = [input_path]
-            file_client = FileClient.get_for_target(input_path)
             if file_client.is_glob(input_path):
                 paths = file_client.glob(input_path)
-            processor = Mixer(
-                file_client, config.experiments, config.conditions, num_processes
-            )
-            out_file = "".join(processor.run(paths, file_client=file_client))
 
-            if not config.output_path:
+            output_path = config.output_path
+            if not output_path:
                 # Default output path is an adjacent directory with the mixer name
                 mixer_directory = get_documents_path(input_path).replace(
                     "documents", config.name
                 )
-                config.output_path = f"{mixer_directory}/results.jsonl"
+                # Results are compressed like the inputs
+                output_path = (
+                    mixer_directory
+                    if config.stream
+                    else f"{mixer_directory}/results.jsonl{split_compression(input_path)[1]}"
+                )
 
-            file_client.write(config.output_path, out_file)
+            for path in paths:
+                output_paths.setdefault(path, output_path)
+
+        processor = Mixer(
+            file_client,
+            config.experiments,
+            config.conditions,
+            num_processes,
+            backend,
+            total_strategy,
+            stream=config.stream,
+            output_paths=output_paths,
+            max_shard_size=config.max_shard_size,
+            io_workers=io_workers,
+            prefetch=prefetch,
+        )
+        paths = list(output_paths)
+        if config.stream:
+            # Concurrent workers would overwrite each other's shards
+            prefixes: dict[str, str] = {}
+            for path in paths:
+                prefix = processor.get_shard_prefix(path)
+                if prefix in prefixes:
+                    raise ValueError(
+                        f"Inputs {prefixes[prefix]} and {path} would be written to the same shards {prefix}-*. Use separate output paths."
+                    )
+                prefixes[prefix] = path
+
+        try:
+            processor.run(paths)
+        finally:
+            processor.close()
 
     def __init__(
         self,
@@ -192,59 +396,169 @@ class Mixer(BaseProcessor):
         experiments: list[str],
         conditions: dict[str, list[Condition]],
         num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        total_strategy: TotalStrategy | str = TotalStrategy.COUNT,
+        stream: bool = False,
+        output_paths: dict[str, str] = {},
+        max_shard_size: int = DEFAULT_SHARD_SIZE,
+        io_workers: int = DEFAULT_IO_WORKERS,
+        prefetch: int = DEFAULT_PREFETCH,
     ):
-        super().__init__(num_processes)
+        super().__init__(num_processes, backend, total_strategy, io_workers, prefetch)
         self.file_client = file_client
         self.experiments = experiments
         self.conditions = conditions
+        # When streaming, each file is written to shards in its output directory
+        # Otherwise, files with the same output are appended to it in input order
+        self.stream = stream
+        self.output_paths = output_paths
+        self.max_shard_size = max_shard_size
+        self.writers: dict[str, OrderedWriter] = {}
+        if not stream:
+            inputs: dict[str, list[str]] = {}
+            for path, output_path in output_paths.items():
+                inputs.setdefault(output_path, []).append(path)
+            self.writers = {
+                output_path: OrderedWriter(file_client, output_path, paths)
+                for output_path, paths in inputs.items()
+            }
+
+    def __getstate__(self) -> dict:
+        # Outputs are only written by the I/O workers of the main process
+        state = super().__getstate__()
+        state["writers"] = {}
+        return state
+
+    def process(self, path: str) -> Union[str, list[str]]:
+        """
+        Mix a documents file.
+
+        Returns:
+            Union[str, list[str]]: The output path of the file, or the paths of the written shards when streaming.
+        """
+        return self.store(path, self.transform(path, self.load(path)))
 
-    def process(self, path: str) -> str:
-        in_file = self.file_client.read(path).strip().split("\n")
-        tags = []
-        out_file = ""
+    @property
+    def pipelined(self) -> bool:
+        return True
 
-        for exp in self.experiments:
-            # Assume tags are in an adjacent directory
-            # TODO: make this more flexible
-            tag_path = path.replace("documents", f"tags/{exp}")
-            tags.append(self.file_client.read(tag_path).strip().splitlines())
+    def load(self, path: str) -> tuple[str, list[TagTable]]:
+        """
+        Reads a documents file and the tags of every experiment.
+        """
+        # Assume tags are in an adjacent directory
+        # TODO: make this more flexible
+        tags = read_tags_batch(self.file_client, path, self.experiments)
+        return self.file_client.read(path), tags
+
+    def transform(
+        self, path: str, loaded: tuple[str, list[TagTable]]
+    ) -> Union[str, list[str]]:
+        """
+        Returns the documents of a file that are kept after filtering, as JSONL.
+        When streaming, the lines are kept apart so they can be split into shards.
+        """
+        lines = self.mix_docs(*loaded)
+        return list(lines) if self.stream else "".join(lines)
+
+    def store(self, path: str, output: Union[str, list[str]]) -> Union[str, list[str]]:
+        """
+        Writes the mixed documents of a file, to its shards when streaming, or after the earlier files of its output.
+        Runs on the I/O workers, so writing overlaps with mixing other files.
+        """
+        if self.stream:
+            return self.write_shards(path, output)
+
+        output_path = self.output_paths[path]
+        assert isinstance(output, str)
+        self.writers[output_path].write(path, output)
+        return output_path
+
+    def close(self) -> None:
+        """
+        Closes the outputs that are still open, after a run that failed.
+        """
+        for writer in self.writers.values():
+            writer.close()
+
+    def write_shards(self, path: str, lines: Iterable[str]) -> list[str]:
+        """
+        Writes the mixed documents of a file to shards, starting a new shard when the current one is full.
+
+        Returns:
+            list[str]: The paths of the written shards.
+        """
+        with ShardWriter(
+            self.file_client,
+            self.get_shard_prefix(path),
+            self.max_shard_size,
+            ext=".jsonl" + split_compression(path)[1],
+        ) as writer:
+            for line in lines:
+                writer.write(line)
+        return writer.paths
+
+    def mix_docs(self, content: str, tags: list[TagTable]) -> Iterator[str]:
+        """
+        Yields the JSONL line of each document of a file that is kept after filtering.
+        """
+        in_file = content.strip().split("\n")
 
         # TODO: implement filtering by file tags
         file_tags = {}
-        for tag in tags:
-            file_tags.update(json.loads(tag[0])["tags"])
+        for table in tags:
+            file_tags.update(table.file_tags)
 
-        for i in range(len(in_file)):
-            doc: dict = json.loads(in_file[i])
+        docs = [codec.loads(line) for line in in_file if line.strip()]
+        for i, doc in enumerate(docs):
             # Merge tags into document content
-            doc_tags = self.merge_tags(
-                doc["id"],
-                [tag[i + 1] for tag in tags],  # Skip first line (file tags)
-            )
+            doc_tags = self.merge_tags(doc["id"], [(table, i) for table in tags])
             if doc_tags:
                 doc.update(doc_tags)
 
+        # Evaluate every condition on the whole file at once
+        results = {
+            key: [condition.eval_batch(docs, tags) for condition in conditions]
+            for key, conditions in self.conditions.items()
+        }
+
+        for i, doc in enumerate(docs):
             # Apply filtering to document content
-            filtered_doc = self.apply_conditions(doc, self.conditions)
+            if self.conditions:
+                doc = self.filter_content(
+                    doc,
+                    [result[i] for result in results.get("include", [])],
+                    [result[i] for result in results.get("exclude", [])],
+                )
 
             # Remove empty documents
-            if filtered_doc["content"]:
-                out_file += json.dumps(filtered_doc) + "\n"
+            if doc["content"]:
+                yield codec.dumps(doc) + "\n"
 
-            self.progress.update(self.task, advance=1)
+            self.advance()
 
-        return out_file
+    def get_shard_prefix(self, path: str) -> str:
+        """
+        Returns the prefix of the output shards of a documents file.
+        Shards keep the path of the file relative to the `documents` directory, without its extensions.
+        """
+        try:
+            relative_path = os.path.relpath(path, get_documents_path(path))
+        except ValueError:
+            relative_path = os.path.basename(path)
+
+        output_path = self.output_paths[path].rstrip("/")
+        return f"{output_path}/{strip_ext(relative_path)}"
 
     def get_total(self, paths: list[str], **kwargs) -> int:
-        file_client: FileClient = kwargs.get("file_client", None)
-        return sum([len(file_client.read(path).splitlines()) for path in paths])
+        return self.count_lines(paths)
 
-    def merge_tags(self, doc_id: str, raw_tags: list[str]) -> dict:
+    def merge_tags(self, doc_id: int, doc_tags: list[tuple[TagTable, int]]) -> dict:
         tags = {}
-        for tag in raw_tags:
-            tag_json = json.loads(tag)
-            if doc_id == tag_json["id"]:  # Check document ids match
-                tags.update(tag_json["tags"])
+        for table, index in doc_tags:
+            # Check document ids match
+            if index < len(table) and doc_id == table.doc_ids[index]:
+                tags.update(table.get_doc_tags(index))
 
         return tags
 
@@ -260,6 +574,14 @@ class Mixer(BaseProcessor):
         include_results = [condition.eval(doc) for condition in include_conditions]
         exclude_results = [condition.eval(doc) for condition in exclude_conditions]
 
+        return self.filter_content(doc, include_results, exclude_results)
+
+    def filter_content(
+        self, doc: dict, include_results: list[list], exclude_results: list[list]
+    ) -> dict:
+        """
+        Keep the content of a document covered by the include results and not by the exclude results.
+        """
         # Merge include and exclude results
         merge = self.merge_ranges(include_results, exclude_results)
 
@@ -275,47 +597,13 @@ class Mixer(BaseProcessor):
         include_ranges: list[list[list[int]]],
         exclude_ranges: list[list[list[int]]],
     ) -> list[list[int]]:
-        def subtract_range(
-            inc_range: list[int], exc_range: list[int]
-        ) -> list[list[int]]:
-            inc_start, inc_end, inc_value = inc_range
-            exc_start, exc_end, _ = exc_range
-
-            result: list[list[int]] = []
-            if exc_end < inc_start or exc_start > inc_end:
-                # Ranges do not overlap
-                result.append(inc_range)
-            else:
-                # Ranges overlap
-                if exc_start > inc_start:
-                    result.append([inc_start, exc_start - 1, inc_value])
-                if exc_end < inc_end:
-                    result.append([exc_end + 1, inc_end, inc_value])
-
-            return result
-
-        def process_ranges(
-            include_set: list[list[int]], exclude_set: list[list[int]]
-        ) -> list[list[int]]:
-            final_ranges = include_set[:]
-            for exc_range in exclude_set:
-                temp_ranges = []
-                for inc_range in final_ranges:
-                    temp_ranges.extend(subtract_range(inc_range, exc_range))
-                final_ranges = temp_ranges
-            return final_ranges
-
-        final_result: list[list[int]] = []
+        """
+        Returns the sorted, disjoint ranges covered by any include range and no exclude range.
+        Nothing is included without include ranges.
+        """
         if not include_ranges:
-            return final_result
-
-        if not exclude_ranges:
-            for include_set in include_ranges:
-                final_result.extend(include_set)
-            return final_result
+            return []
 
-        for include_set in include_ranges:
-            for exclude_set in exclude_ranges:
-                final_result.extend(process_ranges(include_set, exclude_set))
-
-        return final_result
+        return difference(
+            chain.from_iterable(include_ranges), chain.from_iterable(exclude_ranges)
+        )
@@ -1,10 +1,31 @@
 import concurrent.futures
+import contextlib
+import itertools
+import multiprocessing
+import threading
+import time
 
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from enum import Enum
 from postit.files import FileClient
+from postit.formats import (
+    DocImports,
+    TagFormat,
+    TagReader,
+    TagTable,
+    encode_tags,
+    read_columnar_tags,
+    read_tags_batch,
+)
 from postit.registry import TaggerRegistry
-from postit.tagging import DocTagger, FileTagger
-from postit.types import File
+from postit.tagging import DocTagger, FileTagger, schedule_taggers
+from postit.types import Doc, File
+from postit.utils.background import ReadAhead, WriteBehind
 from postit.utils.logging import get_logger
 from rich.progress import (
     BarColumn,
@@ -16,21 +37,131 @@ from rich.progress import (
     TimeElapsedColumn,
 )
 from rich.table import Column
-from typing import Any
+from typing import Any, Iterable, Iterator, Optional
 
 # TODO: improve error handling
 
+# Number of documents passed at once to doc taggers that implement tag_batch
+DEFAULT_BATCH_SIZE = 64
+# Threads reading and writing files in pipelined processors
+DEFAULT_IO_WORKERS = 4
+# Files read ahead of the compute workers, and outputs waiting to be written, in pipelined processors
+DEFAULT_PREFETCH = 2
+
+
+class ProcessorBackend(Enum):
+    """
+    Execution backends for running a processor in parallel.
+    Threads share memory but are limited by the GIL, processes scale CPU-bound work across cores.
+    """
+
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class TotalStrategy(Enum):
+    """
+    Strategies to estimate the total amount of work before processing starts.
+
+    COUNT: Stream every input file once to count its lines. Exact, but reads all inputs an extra time.
+    SIZE: Use file sizes from storage metadata. Progress is reported in bytes, per completed file.
+    NONE: Skip the estimate. Progress is shown without a total.
+    """
+
+    COUNT = "count"
+    SIZE = "size"
+    NONE = "none"
+
+
+class ProgressReporter:
+    """
+    Forwards progress updates from a worker process to the main process through a queue.
+    Updates are buffered and flushed at most once per interval to limit queue traffic.
+    """
+
+    def __init__(self, queue, interval: float = 0.1):
+        self.queue = queue
+        self.interval = interval
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def advance(self, steps: int = 1):
+        self.pending += steps
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.queue.put(self.pending)
+            self.pending = 0
+        self.last_flush = time.monotonic()
+
+
+# Processor instance owned by the current worker process (process backend only)
+_worker: Optional["BaseProcessor"] = None
+
+
+def _init_worker(processor: "BaseProcessor", queue):
+    global _worker
+    _worker = processor
+    _worker.reporter = ProgressReporter(queue)
+
+
+def _run_worker(path: str) -> Any:
+    if _worker is None:
+        raise RuntimeError("Worker process was not initialized.")
+    try:
+        return _worker.process(path)
+    finally:
+        if _worker.reporter:
+            _worker.reporter.flush()
+
+
+def _run_transform(path: str, loaded: Any) -> Any:
+    if _worker is None:
+        raise RuntimeError("Worker process was not initialized.")
+    try:
+        return _worker.transform(path, loaded)
+    finally:
+        if _worker.reporter:
+            _worker.reporter.flush()
+
 
 class BaseProcessor:
     """
     Abstract base class for processing files in parallel.
+
+    Subclasses either implement `process`, or split it into `load`, `transform` and `store` stages and enable `pipelined`.
+    Pipelined files are read and written by a pool of `io_workers` threads while others are transformed by the compute workers,
+    with up to `prefetch` files read ahead and up to `prefetch` outputs waiting to be written.
     """
 
     label: str = "Processing"
     units: str = "files"
 
-    def __init__(self, num_processes: int = 1, logger=None):
+    def __init__(
+        self,
+        num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        total_strategy: TotalStrategy | str = TotalStrategy.COUNT,
+        io_workers: int = DEFAULT_IO_WORKERS,
+        prefetch: int = DEFAULT_PREFETCH,
+        logger=None,
+    ):
+        if io_workers <= 0:
+            raise ValueError("The number of I/O workers must be positive.")
+        if prefetch < 0:
+            raise ValueError("The prefetch size cannot be negative.")
+
         self.num_processes = num_processes
+        self.backend = ProcessorBackend(backend)
+        self.total_strategy = TotalStrategy(total_strategy)
+        self.io_workers = io_workers
+        self.prefetch = prefetch
+        self.reporter: Optional[ProgressReporter] = None
+        self.sizes: dict[str, int] = {}
+        if self.total_strategy == TotalStrategy.SIZE:
+            self.units = "bytes"
         self.progress = Progress(
             TextColumn(
                 "[progress.description]{task.description}",
@@ -48,35 +179,202 @@ class BaseProcessor:
         )
         self.logger = logger or get_logger(__name__)
 
+    def __getstate__(self) -> dict:
+        # The progress bar lives in the main process, workers report through a queue
+        state = self.__dict__.copy()
+        state["progress"] = None
+        state["reporter"] = None
+        return state
+
     def process(self, *args, **kwargs):
         """
         Abstract method to process a single file. Implemented by subclasses.
         """
         raise NotImplementedError
 
+    @property
+    def pipelined(self) -> bool:
+        """
+        Whether files are processed in `load`, `transform` and `store` stages that run on separate pools.
+        """
+        return False
+
+    def load(self, path: str) -> Any:
+        """
+        Reads the inputs of a file. Runs on the I/O workers of pipelined processors.
+        """
+        raise NotImplementedError
+
+    def transform(self, path: str, loaded: Any) -> Any:
+        """
+        Computes the output of a file from its inputs. Runs on the compute workers of pipelined processors.
+        """
+        raise NotImplementedError
+
+    def store(self, path: str, output: Any) -> Any:
+        """
+        Writes the output of a file, and returns the result of the file. Runs on the I/O workers of pipelined processors.
+        """
+        raise NotImplementedError
+
+    def advance(self, steps: int = 1):
+        """
+        Advances the progress bar. Safe to call from worker threads and processes.
+        """
+        if self.total_strategy == TotalStrategy.SIZE:
+            # Progress is advanced by file size once each file completes
+            return
+        if self.reporter:
+            self.reporter.advance(steps)
+        else:
+            self.progress.update(self.task, advance=steps)
+
     def run(self, paths: list[str], **kwargs: Any):
         """
-        Runs the processing on multiple paths in parallel using ThreadPoolExecutor.
+        Runs the processing on multiple paths in parallel using the selected backend.
+        Results are returned in the order of the paths.
         """
         with self.progress:
             self.task = self.progress.add_task(f"[yellow]{self.label}", total=None)
-            total = self.get_total(paths, **kwargs)
+            if self.total_strategy == TotalStrategy.SIZE:
+                self.sizes = self.get_sizes(paths)
+                total = sum(self.sizes.values())
+            elif self.total_strategy == TotalStrategy.NONE:
+                total = None
+            else:
+                total = self.get_total(paths, **kwargs)
             self.progress.update(self.task, total=total)
+            amount = f"{len(paths)} paths" if total is None else f"{total} {self.units}"
             self.logger.info(
-                f"Processing {total} {self.units} using {self.num_processes} processes."
+                f"Processing {amount} using {self.num_processes} {self.backend.value} workers."
             )
-            with ThreadPoolExecutor(max_workers=self.num_processes) as executor:
-                futures = {executor.submit(self.process, path): path for path in paths}
+            if self.pipelined:
+                results = self._run_pipeline(paths)
+            elif self.backend == ProcessorBackend.PROCESS:
+                results = self._run_processes(paths)
+            else:
+                with ThreadPoolExecutor(max_workers=self.num_processes) as executor:
+                    results = self._collect(executor, self.process, paths)
+
+            self.progress.update(
+                self.task,
+                description=f"[green]:heavy_check_mark: {self.label}",
+            )
+            return results
+
+    def _run_processes(self, paths: list[str]) -> list:
+        """
+        Runs the processing in a process pool.
+        Each worker receives its own copy of the processor and reports progress through a queue.
+        """
+        with self._process_pool() as executor:
+            return self._collect(executor, _run_worker, paths)
+
+    @contextlib.contextmanager
+    def _process_pool(self) -> Iterator[ProcessPoolExecutor]:
+        """
+        Creates a process pool whose workers hold a copy of the processor, and forwards their progress.
+        """
+        # Fork (where available) so workers inherit taggers registered at runtime
+        start_methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            "fork" if "fork" in start_methods else None
+        )
+        queue = context.Queue()
+
+        def listen():
+            while (steps := queue.get()) is not None:
+                self.progress.update(self.task, advance=steps)
 
-                results = []
-                for future in concurrent.futures.as_completed(futures):
-                    results.append(future.result())
+        listener = threading.Thread(target=listen, daemon=True)
+        listener.start()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.num_processes,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self, queue),
+            ) as executor:
+                yield executor
+        finally:
+            queue.put(None)
+            listener.join()
 
-                self.progress.update(
-                    self.task,
-                    description=f"[green]:heavy_check_mark: {self.label}",
+    def _run_pipeline(self, paths: list[str]) -> list:
+        """
+        Runs the stages of each file on separate pools, so reading and writing overlap with compute.
+        Stages are scheduled from the calling thread as soon as their inputs are ready.
+        Reading ahead pauses while `prefetch` files wait for the compute workers, or `prefetch` outputs wait for the I/O workers.
+        """
+        results: list = [None] * len(paths)
+        pending = iter(enumerate(paths))
+        loads: dict[Future, int] = {}
+        transforms: dict[Future, int] = {}
+        stores: dict[Future, int] = {}
+
+        with contextlib.ExitStack() as stack:
+            io_pool = stack.enter_context(ThreadPoolExecutor(self.io_workers))
+            if self.backend == ProcessorBackend.PROCESS:
+                compute_pool: Executor = stack.enter_context(self._process_pool())
+                transform = _run_transform
+            else:
+                compute_pool = stack.enter_context(
+                    ThreadPoolExecutor(self.num_processes)
                 )
-                return results
+                transform = self.transform
+
+            while True:
+                while (
+                    len(loads) + len(transforms) < self.num_processes + self.prefetch
+                    and len(stores) < self.io_workers + self.prefetch
+                    and (item := next(pending, None))
+                ):
+                    index, path = item
+                    loads[io_pool.submit(self.load, path)] = index
+                if not (loads or transforms or stores):
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    [*loads, *transforms, *stores],
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    if future in loads:
+                        index = loads.pop(future)
+                        output = compute_pool.submit(
+                            transform, paths[index], future.result()
+                        )
+                        transforms[output] = index
+                    elif future in transforms:
+                        index = transforms.pop(future)
+                        result = io_pool.submit(
+                            self.store, paths[index], future.result()
+                        )
+                        stores[result] = index
+                    else:
+                        index = stores.pop(future)
+                        results[index] = future.result()
+                        if self.sizes:
+                            self.progress.update(
+                                self.task, advance=self.sizes[paths[index]]
+                            )
+
+        return results
+
+    def _collect(self, executor: Executor, fn, paths: list[str]) -> list:
+        """
+        Submits every path to the executor and returns the results in the order of the paths.
+        """
+        futures = {executor.submit(fn, path): i for i, path in enumerate(paths)}
+
+        results: list = [None] * len(paths)
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if self.sizes:
+                self.progress.update(self.task, advance=self.sizes[paths[index]])
+
+        return results
 
     def get_total(self, paths: list[str], **kwargs: Any) -> int:
         """
@@ -85,6 +383,28 @@ class BaseProcessor:
         """
         return len(paths)
 
+    def get_sizes(self, paths: list[str]) -> dict[str, int]:
+        """
+        Returns the size in bytes of each path, read from storage metadata in one batch.
+        """
+        if not paths:
+            return {}
+        infos = FileClient.get_for_target(paths[0]).info(paths)
+        return {path: info["size"] for path, info in zip(paths, infos)}
+
+    def count_lines(self, paths: list[str]) -> int:
+        """
+        Returns the total number of lines in the given files.
+        Files are streamed rather than read into memory.
+        """
+        with ThreadPoolExecutor(max_workers=self.num_processes) as executor:
+            return sum(
+                executor.map(
+                    lambda path: FileClient.get_for_target(path).count_lines(path),
+                    paths,
+                )
+            )
+
 
 class TaggerProcessor(BaseProcessor):
     """
@@ -104,6 +424,13 @@ class TaggerProcessor(BaseProcessor):
         experiment: str,
         imported_experiments: list[str] = [],
         num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        stream: bool = False,
+        total_strategy: TotalStrategy | str = TotalStrategy.COUNT,
+        tag_format: TagFormat | str = TagFormat.JSONL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        io_workers: int = DEFAULT_IO_WORKERS,
+        prefetch: int = DEFAULT_PREFETCH,
         **kwargs: Any,
     ):
         """
@@ -115,6 +442,13 @@ class TaggerProcessor(BaseProcessor):
             experiment (str): Name of the experiment.
             imported_experiments (list[str], optional): List of imported experiment names. Defaults to [].
             num_processes (int, optional): Number of processes to use for parallel processing. Defaults to 1.
+            backend (ProcessorBackend | str, optional): Execution backend, "thread" or "process". Defaults to "thread".
+            stream (bool, optional): Read, tag and write one document at a time. Defaults to False.
+            total_strategy (TotalStrategy | str, optional): How to estimate progress totals. Defaults to "count".
+            tag_format (TagFormat | str, optional): Storage format of the tags, "jsonl" or "columnar". Defaults to "jsonl".
+            batch_size (int, optional): Number of documents passed at once to taggers that implement tag_batch. Defaults to 64.
+            io_workers (int, optional): Number of threads reading and writing files while others are tagged. Defaults to 4.
+            prefetch (int, optional): Number of files read ahead of the taggers, and of tags files waiting to be written. Defaults to 2.
         """
         TaggerProcessor.label = f"Tagging ({experiment})"
         for glob_path in glob_paths:
@@ -126,9 +460,16 @@ class TaggerProcessor(BaseProcessor):
                 file_client=file_client,
                 imported_experiments=imported_experiments,
                 num_processes=num_processes,
+                backend=backend,
+                stream=stream,
+                total_strategy=total_strategy,
+                tag_format=tag_format,
+                batch_size=batch_size,
+                io_workers=io_workers,
+                prefetch=prefetch,
                 **kwargs,
             )
-            processor.run(document_paths, num_taggers=len(tagger_names))
+            processor.run(document_paths)
 
     def __init__(
         self,
@@ -137,17 +478,62 @@ class TaggerProcessor(BaseProcessor):
         file_client: FileClient,
         imported_experiments: list[str] = [],
         num_processes: int = 1,
+        backend: ProcessorBackend | str = ProcessorBackend.THREAD,
+        stream: bool = False,
+        total_strategy: TotalStrategy | str = TotalStrategy.COUNT,
+        tag_format: TagFormat | str = TagFormat.JSONL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        io_workers: int = DEFAULT_IO_WORKERS,
+        prefetch: int = DEFAULT_PREFETCH,
         **kwargs: Any,
     ):
-        super().__init__(num_processes)
+        super().__init__(num_processes, backend, total_strategy, io_workers, prefetch)
+        self.tagger_names = tagger_names
         self.experiment = experiment
         self.file_client = file_client
         self.imported_experiments = imported_experiments
+        self.stream = stream
+        self.tag_format = TagFormat(tag_format)
+        if batch_size <= 0:
+            raise ValueError("The batch size must be positive.")
+        self.batch_size = batch_size
         self.kwargs = kwargs
+        self.load_taggers()
+
+        if self.needs_imports and not self.imported_experiments:
+            raise ImportError(
+                f"Missing dependencies: {sorted(self.imported_dependencies)}. Run them in the same pass or import their experiments."
+            )
+
+        if self.stream and self.file_taggers:
+            # File taggers need every document of a file in memory
+            self.logger.warning(
+                "File taggers cannot be streamed. Reading whole files instead."
+            )
+            self.stream = False
+
+    def __getstate__(self) -> dict:
+        # Taggers are instantiated again by each worker process
+        state = super().__getstate__()
+        del state["doc_taggers"]
+        del state["file_taggers"]
+        del state["stages"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.load_taggers()
 
+    def load_taggers(self) -> None:
+        """
+        Instantiates the taggers from the registry, ordered by their dependencies.
+        Doc taggers that depend on other doc taggers of the same run read their tags from the document.
+        """
         self.doc_taggers: list[DocTagger] = []
         self.file_taggers: list[FileTagger] = []
-        taggers = [TaggerRegistry.get(tagger)() for tagger in tagger_names]
+        taggers = schedule_taggers(
+            [TaggerRegistry.get(tagger)() for tagger in self.tagger_names]
+        )
 
         for tagger in taggers:
             if isinstance(tagger, DocTagger):
@@ -157,44 +543,209 @@ class TaggerProcessor(BaseProcessor):
             else:
                 raise ValueError(f"Unknown tagger type: {tagger}")
 
-    def process(self, path: str):
-        file = File.from_raw(path, self.file_client.read(path))
-        imported_tags = []
-        for imported_experiment in self.imported_experiments:
-            imported_tags.append(
-                self.file_client.read(
-                    path.replace("documents", f"tags/{imported_experiment}")
-                )
-                .strip()
-                .splitlines()
+        # Doc taggers run after file taggers, and their results are not visible to them
+        self.scheduled = {tagger.name for tagger in self.doc_taggers}
+        self.imported_dependencies = {
+            dep
+            for doc_tagger in self.doc_taggers
+            for dep in doc_tagger.dependencies
+            if dep not in self.scheduled
+        }
+        self.needs_imports = bool(self.imported_dependencies)
+
+        # Consecutive doc taggers run together, either on whole batches or one document at a time.
+        # Batches do not receive imports, so taggers with imported dependencies run on each document.
+        self.stages: list[tuple[bool, list[DocTagger]]] = [
+            (batched, list(doc_taggers))
+            for batched, doc_taggers in itertools.groupby(
+                self.doc_taggers,
+                key=lambda doc_tagger: (
+                    doc_tagger.batched
+                    and self.scheduled.issuperset(doc_tagger.dependencies)
+                ),
             )
+        ]
+        for file_tagger in self.file_taggers:
+            if self.scheduled.intersection(file_tagger.dependencies):
+                raise ValueError(
+                    f"File tagger {file_tagger.name} cannot depend on doc taggers of the same run."
+                )
+
+    def process(self, path: str):
+        if self.stream:
+            return self.process_stream(path)
+        return self.store(path, self.transform(path, self.load(path)))
+
+    @property
+    def pipelined(self) -> bool:
+        # Streamed files are read, tagged and written one document at a time instead
+        return not self.stream
+
+    def load(self, path: str) -> tuple[str, list[TagTable]]:
+        """
+        Reads a documents file and the tags of the imported experiments, if any doc tagger depends on them.
+        """
+        content = self.file_client.read(path)
+        if not self.needs_imports:
+            return content, []
+        return content, read_tags_batch(
+            self.file_client, path, self.imported_experiments
+        )
+
+    def transform(self, path: str, loaded: tuple[str, list[TagTable]]) -> bytes:
+        """
+        Tags a documents file and returns the content of its tags file.
+        """
+        content, tables = loaded
+        file = File.from_raw(path, content)
 
         for file_tagger in self.file_taggers:
             tagger_result = file_tagger.run_tagger(file)
             file.tags.update(tagger_result)
-            self.progress.update(self.task, advance=1)
+            self.advance()
 
-        for doc_tagger in self.doc_taggers:
-            if doc_tagger.dependencies:
-                doc_tagger.import_tags(imported_tags)
+        readers = [
+            TagReader(self.file_client, path, imported_experiment, table=table)
+            for imported_experiment, table in zip(self.imported_experiments, tables)
+        ]
+        self.check_imports(path, readers)
+        for _ in self.tag_docs(file.content, readers, **self.get_kwargs(path)):
+            pass
 
-            for doc_index, doc in enumerate(file.content):
-                tagger_result = doc_tagger.run_tagger(doc, **self.kwargs)
-                doc.tags.update(tagger_result)
-                file.content[doc_index] = doc
-                self.progress.update(self.task, advance=1)
+        return encode_tags(file, self.tag_format)
 
-        output_path = path.replace("documents", f"tags/{self.experiment}")
+    def store(self, path: str, output: bytes) -> None:
+        """
+        Writes the tags of a documents file.
+        """
+        output_path = self.tag_format.get_path(path, self.experiment)
+        self.remove_stale_tags(path)
+        self.file_client.write_bytes(output_path, output)
 
-        self.file_client.write(output_path, file.get_tags())
+    def remove_stale_tags(self, path: str) -> None:
+        """
+        Removes the tags of the experiment in the other format, which readers could otherwise prefer.
+        """
+        for tag_format in TagFormat:
+            stale_path = tag_format.get_path(path, self.experiment)
+            if tag_format != self.tag_format and self.file_client.is_file(stale_path):
+                self.file_client.remove(stale_path)
 
-    def get_total(self, paths: list[str], **kwargs) -> int:
-        total = sum(
-            [
-                len(FileClient.get_for_target(path).read(path).splitlines())
-                for path in paths
-            ]
-        )
-        num_taggers = kwargs.get("num_taggers", 1)
+    def process_stream(self, path: str):
+        """
+        Tags a file one document at a time.
+        JSONL tags are written as soon as a document is tagged, so only one document is held in memory.
+        Columnar tags are accumulated in compact arrays and written once the file is complete.
+        """
+        output_path = self.tag_format.get_path(path, self.experiment)
+        self.remove_stale_tags(path)
+
+        with contextlib.ExitStack() as stack:
+            # Reading the next documents and writing the tagged ones overlap with tagging
+            in_file = stack.enter_context(ReadAhead(self.file_client.open(path, "rb")))
+            readers = self.open_imports(path, stack)
+            docs = self.tag_stream(in_file, readers, **self.get_kwargs(path))
+            if self.tag_format == TagFormat.COLUMNAR:
+                table = TagTable.from_docs(path, {}, ((d.id, d.tags) for d in docs))
+                self.file_client.write_bytes(output_path, table.to_bytes())
+                return
 
-        return total * num_taggers
+            with WriteBehind(self.file_client.open(output_path, "w")) as out_file:
+                out_file.write(File(path, []).get_file_tags())
+                for doc in docs:
+                    out_file.write("\n" + doc.get_tags())
+
+    def tag_stream(
+        self, in_file: Iterable[bytes], readers: list[TagReader] = [], **kwargs: Any
+    ) -> Iterator[Doc]:
+        """
+        Reads and tags documents from the lines of a binary file, yielding each document once tagged.
+        Keyword arguments are passed to the doc taggers.
+        """
+        docs = (Doc.from_raw(line) for line in in_file if line.strip())
+        return self.tag_docs(docs, readers, **kwargs)
+
+    def tag_docs(
+        self, docs: Iterable[Doc], readers: list[TagReader] = [], **kwargs: Any
+    ) -> Iterator[Doc]:
+        """
+        Runs every doc tagger on each document, in dependency order, yielding each document once tagged.
+        Documents are tagged in batches of `batch_size`, passed whole to taggers that implement tag_batch.
+        Imported tags are read along with the documents and passed to the other doc taggers as `imports`.
+        """
+        docs = iter(docs)
+        while batch := list(itertools.islice(docs, self.batch_size)):
+            imports: list[DocImports] = []
+            if readers:
+                for doc in batch:
+                    previous = imports[-1] if imports else None
+                    imports.append(DocImports(doc.id, readers, previous))
+            for batched, doc_taggers in self.stages:
+                if batched:
+                    for doc_tagger in doc_taggers:
+                        results = doc_tagger.run_batch(batch, **kwargs)
+                        for doc, tagger_result in zip(batch, results):
+                            doc.tags.update(tagger_result)
+                        self.advance(len(batch))
+                    continue
+
+                for index, doc in enumerate(batch):
+                    doc_kwargs = (
+                        {**kwargs, "imports": imports[index]} if imports else kwargs
+                    )
+                    for doc_tagger in doc_taggers:
+                        doc.tags.update(doc_tagger.run_tagger(doc, **doc_kwargs))
+                        self.advance()
+
+            for doc_imports in imports:
+                doc_imports.release()
+            yield from batch
+
+    def get_kwargs(self, path: str) -> dict:
+        """
+        Returns the keyword arguments passed to the doc taggers of a file.
+        Subclasses can override this to provide file-specific arguments.
+        """
+        return self.kwargs
+
+    def open_imports(self, path: str, stack: contextlib.ExitStack) -> list[TagReader]:
+        """
+        Opens the tags of the imported experiments for a documents file, if any doc tagger depends on them.
+        Readers are local to the file being processed, and closed with the given stack.
+        """
+        if not self.needs_imports:
+            return []
+
+        # Columnar tags are read in one batch, JSONL tags are streamed
+        tables = read_columnar_tags(self.file_client, path, self.imported_experiments)
+        readers = [
+            stack.enter_context(
+                TagReader(
+                    self.file_client,
+                    path,
+                    imported_experiment,
+                    table=tables.get(imported_experiment),
+                    columnar=False,
+                )
+            )
+            for imported_experiment in self.imported_experiments
+        ]
+        self.check_imports(path, readers)
+        return readers
+
+    def check_imports(self, path: str, readers: list[TagReader]) -> None:
+        """
+        Raises ImportError if a dependency of the doc taggers has no tags in the imported experiments of a file.
+        """
+        missing = set(self.imported_dependencies)
+        for reader in readers:
+            missing -= reader.find_taggers(missing)
+        if missing:
+            raise ImportError(
+                f"Missing dependencies: {sorted(missing)}. No tags in the imported experiments {self.imported_experiments} of {path}."
+            )
+
+    def get_total(self, paths: list[str], **kwargs) -> int:
+        # Doc taggers advance once per document, file taggers once per file
+        total = self.count_lines(paths) * len(self.doc_taggers)
+        return total + len(paths) * len(self.file_taggers)
@@ -4,6 +4,36 @@ from postit.registry import tagger
 from postit.tagging import DocTagger, TagResult
 from postit.types import Doc, FloatTag, Tag
 
+LICENSE_PATTERN = re.compile(
+    r"\b(copyright|license|licensed|all rights reserved)", re.IGNORECASE
+)
+
+
+def compile_comment_pattern(
+    single_line_symbols: list[str], multi_line_symbols: list[tuple[str, str]]
+) -> re.Pattern:
+    """
+    Compiles the pattern matching comments with the given symbols.
+    """
+    escaped_single = [re.escape(symbol) for symbol in single_line_symbols]
+    escaped_multi = [
+        (re.escape(start), re.escape(end)) for start, end in multi_line_symbols
+    ]
+
+    # Identify strings to avoid matching comment chars within them
+    string_pattern = r"(?:(?<!\\)\"(?:\\.|[^\"\\])*\"|(?<!\\)'(?:\\.|[^'\\])*')"
+
+    # Comment patterns
+    single_pattern = r"|".join(
+        [symbol + r"[^\n]*(?:\n" + symbol + r"[^\n]*)*" for symbol in escaped_single]
+    )
+    multi_pattern = r"|".join([start + r"(.*?)" + end for start, end in escaped_multi])
+
+    return re.compile(
+        rf"(?:{string_pattern})|({single_pattern})|({multi_pattern})",
+        re.MULTILINE | re.DOTALL,
+    )
+
 
 @tagger
 class CodeComments(DocTagger):
@@ -28,33 +58,24 @@ class CodeComments(DocTagger):
     single_line_symbols: list[str] = ["#", "//"]
     multi_line_symbols: list[tuple[str, str]] = [("/*", "*/"), ("<!--", "-->")]
 
-    def tag(self, source: Doc, **kwargs) -> TagResult:
-        escaped_single = [re.escape(symbol) for symbol in self.single_line_symbols]
-        escaped_multi = [
-            (re.escape(start), re.escape(end)) for start, end in self.multi_line_symbols
-        ]
-
-        # Identify strings to avoid matching comment chars within them
-        string_pattern = r"(?:(?<!\\)\"(?:\\.|[^\"\\])*\"|(?<!\\)'(?:\\.|[^'\\])*')"
-
-        # Comment patterns
-        single_pattern = r"|".join(
-            [
-                symbol + r"[^\n]*(?:\n" + symbol + r"[^\n]*)*"
-                for symbol in escaped_single
-            ]
-        )
-        multi_pattern = r"|".join(
-            [start + r"(.*?)" + end for start, end in escaped_multi]
-        )
-
-        comment_pattern = rf"(?:{string_pattern})|({single_pattern})|({multi_pattern})"
+    _pattern: re.Pattern
+
+    @classmethod
+    def get_pattern(cls) -> re.Pattern:
+        """
+        Returns the compiled comment pattern of the class, compiled on first use.
+        Each subclass compiles its own pattern, so overridden symbols are respected.
+        """
+        if "_pattern" not in cls.__dict__:
+            cls._pattern = compile_comment_pattern(
+                cls.single_line_symbols, cls.multi_line_symbols
+            )
+        return cls._pattern
 
+    def tag(self, source: Doc, **kwargs) -> TagResult:
         comments = [
             (match.start(match.lastindex), match.end(match.lastindex))
-            for match in re.finditer(
-                comment_pattern, source.content, re.MULTILINE | re.DOTALL
-            )
+            for match in self.get_pattern().finditer(source.content)
             if match.lastindex
         ]
 
@@ -69,23 +90,21 @@ class CodeComments(DocTagger):
 class CodeLicenses(DocTagger):
     """
     Tag comment blocks that contain license information.
-    `code_comments` tagger must be run before this tagger.
+    Depends on the `code_comments` tagger, either in the same run or from an imported experiment.
     """
 
     name = "code_licenses"
     dependencies = ["code_comments"]
 
     def tag(self, source: Doc, **kwargs) -> TagResult:
-        license_pattern = re.compile(
-            r"\b(copyright|license|licensed|all rights reserved)", re.IGNORECASE
+        # Tagged comment blocks from the `code_comments` tagger, run in the same pass or imported
+        comments = self.get_dependency_tags(
+            source, "code_comments/comments", kwargs.get("imports")
         )
-
-        # Import tagged comment blocks from the `code_comments` tagger
-        comments = self.imports.get("code_comments/comments", {}).get(source.id, [])
         tags: list[Tag] = [
             FloatTag("notice", start, end, 1)
             for start, end, _ in comments
-            if license_pattern.search(source.content[start:end])
+            if LICENSE_PATTERN.search(source.content[start:end])
         ]
 
         return TagResult(source, tags)
@@ -1,7 +1,9 @@
 from postit.registry import tagger
 from postit.tagging import DocTagger, TagResult
-from postit.types import Doc, FloatTag, Tag
-from postit.utils.bloom import BloomFilter
+from postit.types import Doc, FloatTag, StrTag, Tag
+from postit.utils.bloom import BloomFilter, ScalableBloomFilter
+from postit.utils.text import normalize, normalize_paragraphs
+from typing import Optional, Union
 
 
 @tagger
@@ -9,18 +11,24 @@ class DocDedupe(DocTagger):
     name = "doc_dedupe"
 
     def tag(self, source: Doc, **kwargs) -> TagResult:
-        bloom: BloomFilter = kwargs.get("bloom", None)
+        bloom: Union[BloomFilter, ScalableBloomFilter] = kwargs.get("bloom", None)
         if not bloom:
             raise ValueError("Bloom filter not provided.")
 
         tags: list[Tag] = []
-        clean_doc = source.content.strip().lower()
-        if clean_doc in bloom:
+        clean_doc = normalize(source.content)
+        duplicates: Optional[set] = kwargs.get("doc_duplicates", None)
+        if duplicates is None:
+            duplicate = bloom.test_and_add(clean_doc)
+        else:
+            # Duplicates were resolved in order, the bloom filter only records the document
+            bloom.add(clean_doc)
+            duplicate = source.id in duplicates
+
+        if duplicate:
             tags.append(
                 FloatTag(name="duplicate", start=0, end=len(source.content), value=1)
             )
-        else:
-            bloom.add(clean_doc)
 
         return TagResult(source, tags)
 
@@ -30,25 +38,73 @@ class ParagraphDedupe(DocTagger):
     name = "paragraph_dedupe"
 
     def tag(self, source: Doc, **kwargs) -> TagResult:
-        bloom: BloomFilter = kwargs.get("bloom", None)
+        bloom: Union[BloomFilter, ScalableBloomFilter] = kwargs.get("bloom", None)
         if not bloom:
             raise ValueError("Bloom filter not provided.")
 
         tags: list[Tag] = []
-        start = 0
-        for paragraph in source.content.split("\n"):
-            clean_paragraph = paragraph.strip().lower()
-            if clean_paragraph in bloom:
-                tags.append(
-                    FloatTag(
-                        name="duplicate",
-                        start=start,
-                        end=start + len(paragraph),
-                        value=1,
-                    )
-                )
-            else:
-                bloom.add(clean_paragraph)
-            start += len(paragraph) + 1
+        spans = source.get_paragraphs()
+        clean_paragraphs = normalize_paragraphs(source)
+        offsets: Optional[dict] = kwargs.get("paragraph_duplicates", None)
+        if offsets is None:
+            duplicates = bloom.test_and_add_batch(clean_paragraphs)
+        else:
+            # Duplicates were resolved in order, the bloom filter only records the paragraphs
+            bloom.add_batch(clean_paragraphs)
+            doc_offsets = offsets.get(source.id, ())
+            duplicates = [start in doc_offsets for start, _ in spans]
+
+        for (start, end), duplicate in zip(spans, duplicates):
+            if duplicate:
+                tags.append(FloatTag(name="duplicate", start=start, end=end, value=1))
+
+        return TagResult(source, tags)
+
+
+@tagger
+class ExactDedupe(DocTagger):
+    """
+    Tags exact duplicates found by the hash index of the Deduper, with the `<path>:<id>` of the document they match.
+    NOTE: Duplicates are looked up by document id, which must be unique within a file.
+    """
+
+    name = "exact_dedupe"
+
+    def tag(self, source: Doc, **kwargs) -> TagResult:
+        matches: Optional[dict] = kwargs.get("exact_matches", None)
+        if matches is None:
+            raise ValueError("Exact matches not provided.")
+
+        tags: list[Tag] = []
+        match = matches.get(source.id)
+        if match is not None:
+            end = len(source.content)
+            tags.append(FloatTag(name="duplicate", start=0, end=end, value=1))
+            tags.append(StrTag(name="match", start=0, end=end, value=match))
+
+        return TagResult(source, tags)
+
+
+@tagger
+class NearDedupe(DocTagger):
+    """
+    Tags near-duplicates found by the MinHash LSH index of the Deduper.
+    The value of `duplicate` is the estimated Jaccard similarity to the kept document named by `match`.
+    NOTE: Duplicates are looked up by document id, which must be unique within a file.
+    """
+
+    name = "near_dedupe"
+
+    def tag(self, source: Doc, **kwargs) -> TagResult:
+        matches: Optional[dict] = kwargs.get("near_matches", None)
+        if matches is None:
+            raise ValueError("Near-duplicate matches not provided.")
+
+        tags: list[Tag] = []
+        if source.id in matches:
+            score, match = matches[source.id]
+            end = len(source.content)
+            tags.append(FloatTag(name="duplicate", start=0, end=end, value=score))
+            tags.append(StrTag(name="match", start=0, end=end, value=match))
 
         return TagResult(source, tags)
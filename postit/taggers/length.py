@@ -1,6 +1,37 @@
+import numpy as np
+
 from postit.registry import tagger
 from postit.tagging import DocTagger, FileTagger, TagResult
 from postit.types import Doc, File, FloatTag, Tag
+from postit.utils.text import code_points, word_starts
+
+
+def join_docs(sources: list[Doc]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the code points of the documents joined by newlines, and the offset of each document.
+    Newlines are whitespace, so words and paragraphs never span two documents.
+    """
+    lengths = np.array([len(source.content) for source in sources], dtype=np.int64)
+    offsets = np.zeros(len(sources), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=offsets[1:])
+    return code_points("\n".join(source.content for source in sources)), offsets
+
+
+def count_words(codes: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Returns the number of words between each start and end (exclusive) of a text.
+    """
+    words = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(word_starts(codes), out=words[1:])
+    return words[ends] - words[starts]
+
+
+def split_rows(rows: list, counts: list[int]) -> list[list]:
+    """
+    Splits rows into consecutive groups of the given sizes.
+    """
+    bounds = [0, *np.cumsum(counts).tolist()]
+    return [rows[start:end] for start, end in zip(bounds, bounds[1:])]
 
 
 @tagger
@@ -31,6 +62,36 @@ class DocLength(DocTagger):
         )
         return TagResult(source, tags)
 
+    def measure(self, sources: list[Doc]) -> tuple[list[int], list[int]]:
+        """
+        Returns the number of characters and words of each document of a batch.
+        """
+        # Whole documents are split in C as fast as words are counted with NumPy
+        lengths = [len(source.content) for source in sources]
+        return lengths, [len(source.content.split()) for source in sources]
+
+    def tag_batch(self, sources: list[Doc], **kwargs) -> list[TagResult]:
+        return [
+            TagResult(
+                source,
+                [
+                    FloatTag("num_chars", 0, length, length),
+                    FloatTag("num_words", 0, length, num_words),
+                ],
+            )
+            for source, length, num_words in zip(sources, *self.measure(sources))
+        ]
+
+    def run_batch(self, sources: list[Doc], **kwargs) -> list[dict]:
+        # Same output as tag_batch, without creating tags
+        return [
+            {
+                f"{self.name}/num_chars": [[0, length, length]],
+                f"{self.name}/num_words": [[0, length, num_words]],
+            }
+            for length, num_words in zip(*self.measure(sources))
+        ]
+
 
 @tagger
 class ParagraphLength(DocTagger):
@@ -42,20 +103,49 @@ class ParagraphLength(DocTagger):
 
     def tag(self, source: Doc, **kwargs) -> TagResult:
         tags: list[Tag] = []
-        start = 0
-        for paragraph in source.content.split("\n"):
-            end = start + len(paragraph)
+        content = source.content
+        for start, end in source.get_paragraphs():
+            tags.append(FloatTag("num_chars", start, end, end - start))
             tags.append(
-                FloatTag(name="num_chars", start=start, end=end, value=len(paragraph))
+                FloatTag("num_words", start, end, len(content[start:end].split()))
             )
-            tags.append(
-                FloatTag(
-                    name="num_words", start=start, end=end, value=len(paragraph.split())
-                )
-            )
-            start = end + 1
         return TagResult(source, tags)
 
+    def measure(self, sources: list[Doc]) -> tuple[list[list], list[list]]:
+        """
+        Returns the [start, end, num_chars] and [start, end, num_words] rows of the paragraphs of each document of a batch.
+        """
+        if not sources:
+            return [], []
+        codes, offsets = join_docs(sources)
+        doc_spans = [source.get_paragraphs() for source in sources]
+        counts = [len(spans) for spans in doc_spans]
+        spans = np.array(
+            [span for paragraphs in doc_spans for span in paragraphs], dtype=np.int64
+        ).reshape(-1, 2)
+        # Paragraph spans are relative to their document
+        starts, ends = (spans + np.repeat(offsets, counts)[:, None]).T
+        chars = np.column_stack([spans, spans[:, 1] - spans[:, 0]]).tolist()
+        words = np.column_stack([spans, count_words(codes, starts, ends)]).tolist()
+        return split_rows(chars, counts), split_rows(words, counts)
+
+    def tag_batch(self, sources: list[Doc], **kwargs) -> list[TagResult]:
+        results = []
+        for source, chars, words in zip(sources, *self.measure(sources)):
+            tags: list[Tag] = []
+            for (start, end, num_chars), (_, _, num_words) in zip(chars, words):
+                tags.append(FloatTag("num_chars", start, end, num_chars))
+                tags.append(FloatTag("num_words", start, end, num_words))
+            results.append(TagResult(source, tags))
+        return results
+
+    def run_batch(self, sources: list[Doc], **kwargs) -> list[dict]:
+        # Same output as tag_batch, without creating tags
+        return [
+            {f"{self.name}/num_chars": chars, f"{self.name}/num_words": words}
+            for chars, words in zip(*self.measure(sources))
+        ]
+
 
 @tagger
 class DocLines(DocTagger):
@@ -84,6 +174,44 @@ class DocLines(DocTagger):
         )
         return TagResult(source, tags)
 
+    def measure(self, sources: list[Doc]) -> tuple[list[int], list[int]]:
+        """
+        Returns the number of lines and the length of the longest line of each document of a batch.
+        """
+        # Counting and splitting in C is faster than segmenting lines with NumPy here
+        num_lines = [source.content.count("\n") + 1 for source in sources]
+        max_lines = [max(map(len, source.content.split("\n"))) for source in sources]
+        return num_lines, max_lines
+
+    def tag_batch(self, sources: list[Doc], **kwargs) -> list[TagResult]:
+        results = []
+        for source, lines, max_line in zip(sources, *self.measure(sources)):
+            length = len(source.content)
+            tags: list[Tag] = [
+                FloatTag("num_lines", 0, length, lines),
+                FloatTag("avg_chars_per_line", 0, length, length / lines),
+                FloatTag("max_lines", 0, length, max_line),
+            ]
+            results.append(TagResult(source, tags))
+        return results
+
+    def run_batch(self, sources: list[Doc], **kwargs) -> list[dict]:
+        # Same output as tag_batch, without creating tags
+        results = []
+        for source, lines, max_line in zip(sources, *self.measure(sources)):
+            length = len(source.content)
+            results.append(
+                {
+                    f"{self.name}/num_lines": [[0, length, lines]],
+                    # Rounded as FloatTag values are
+                    f"{self.name}/avg_chars_per_line": [
+                        [0, length, round(length / lines, 4)]
+                    ],
+                    f"{self.name}/max_lines": [[0, length, max_line]],
+                }
+            )
+        return results
+
 
 @tagger
 class NumDocs(FileTagger):
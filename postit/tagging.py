@@ -1,9 +1,7 @@
-import json
-
 from abc import ABC, abstractmethod
 from collections import defaultdict
 from postit.types import Doc, File, Source, TagResult
-from typing import Any, Generic, TypeVar
+from typing import Any, Generic, Mapping, Optional, Sequence, TypeVar
 
 T = TypeVar("T", bound=Source)
 
@@ -18,13 +16,11 @@ class BaseTagger(ABC, Generic[T]):
     Attributes:
         name (str): The name of the tagger.
         dependencies (list[str]): The list of tagger dependencies.
-        imports (dict[str, dict]): The imported tags from other experiments.
-            NOTE: This is generated automatically by the processor. You should not need to modify this.
+            Dependencies run in the same pass are tagged first, others are imported from other experiments.
     """
 
     name: str
     dependencies: list[str] = []
-    imports: dict[str, dict] = {}
 
     @abstractmethod
     def tag(self, source: T, **kwargs: Any) -> TagResult:
@@ -58,31 +54,26 @@ class BaseTagger(ABC, Generic[T]):
         source_tags = self.tag(source, **kwargs)
         return self.output(source_tags)
 
-    def import_tags(self, imported_tags: list[list[str]]) -> None:
+    def get_dependency_tags(
+        self, source: Doc, tag_name: str, imports: Optional[Mapping[str, list]] = None
+    ) -> list:
         """
-        Imports tags from other experiments.
+        Returns the tags of a dependency for a document.
+        Tags of dependencies run in the same pass are read from the document, others from the imported tags.
+
+        Args:
+            source (Doc): The document being tagged.
+            tag_name (str): The name of the tag. Format: `tagger_name/tag_name`.
+            imports (Mapping[str, list], optional): The imported tags of the document, passed to `tag` as `imports`.
+
+        Returns:
+            list: The tag spans, or an empty list if the dependency has no tags for the document.
         """
-        taggers = set()
-        for experiment in imported_tags:
-            for tag_json in experiment:
-                tag = json.loads(tag_json)
-                if "id" in tag:
-                    existing_tags = tag["tags"]
-                    for existing_tag in existing_tags:
-                        taggers.add(existing_tag.split("/")[0])
-                        if existing_tag not in self.imports:
-                            self.imports[existing_tag] = {}
-                        self.imports[existing_tag].update(
-                            {tag["id"]: existing_tags[existing_tag]}
-                        )
-                else:
-                    self.imports["file_tags"] = {tag["source"]: tag["tags"]}
-
-        for dep in self.dependencies:
-            if dep not in taggers:
-                raise ImportError(
-                    f"Missing dependency: {dep}. Imported taggers: {list(taggers)}"
-                )
+        if tag_name in source.tags:
+            return source.tags[tag_name]
+        if imports is None:
+            return []
+        return imports.get(tag_name, [])
 
 
 class DocTagger(BaseTagger[Doc]):
@@ -91,12 +82,40 @@ class DocTagger(BaseTagger[Doc]):
 
     This class provides an interface for implementing document tagging functionality.
     Custom document taggers should inherit from this class and implement the tag method.
+    Taggers that are faster on many documents at once can also implement the tag_batch method.
     """
 
     @abstractmethod
     def tag(self, source: Doc, **kwargs: Any) -> TagResult:
         raise NotImplementedError
 
+    def tag_batch(self, sources: list[Doc], **kwargs: Any) -> list[TagResult]:
+        """
+        Tags a batch of documents and returns one result per document, in order.
+        Defaults to calling tag on each document. Override this to tag documents together.
+        NOTE: Batches do not receive per-document keyword arguments, such as `imports`.
+
+        Args:
+            sources (list[Doc]): The documents to be tagged.
+
+        Returns:
+            list[TagResult]: The result of the tagging operation for each document.
+        """
+        return [self.tag(source, **kwargs) for source in sources]
+
+    def run_batch(self, sources: list[Doc], **kwargs: Any) -> list[dict]:
+        """
+        Runs a tagger on a batch of documents and returns the results of each document in a dict.
+        """
+        return [self.output(result) for result in self.tag_batch(sources, **kwargs)]
+
+    @property
+    def batched(self) -> bool:
+        """
+        Whether the tagger implements tag_batch.
+        """
+        return type(self).tag_batch is not DocTagger.tag_batch
+
 
 class FileTagger(BaseTagger[File]):
     """
@@ -109,3 +128,42 @@ class FileTagger(BaseTagger[File]):
     @abstractmethod
     def tag(self, source: File, **kwargs: Any) -> TagResult:
         raise NotImplementedError
+
+
+def schedule_taggers(taggers: Sequence[BaseTagger]) -> list[BaseTagger]:
+    """
+    Orders taggers so that each one runs after the taggers it depends on.
+    The order is stable: taggers without dependencies between them keep their given order.
+    Dependencies that are not in the list are expected to be imported from other experiments.
+
+    Args:
+        taggers (Sequence[BaseTagger]): The taggers to schedule.
+
+    Returns:
+        list[BaseTagger]: The taggers in topological order.
+    """
+    by_name = {tagger.name: tagger for tagger in taggers}
+    ordered: list[BaseTagger] = []
+    done: set[str] = set()
+    visiting: list[str] = []
+
+    def visit(tagger: BaseTagger):
+        if tagger.name in done:
+            return
+        if tagger.name in visiting:
+            cycle = " -> ".join(visiting[visiting.index(tagger.name) :] + [tagger.name])
+            raise ValueError(f"Circular tagger dependencies: {cycle}")
+
+        visiting.append(tagger.name)
+        for dep in tagger.dependencies:
+            if dep in by_name:
+                visit(by_name[dep])
+        visiting.pop()
+
+        done.add(tagger.name)
+        ordered.append(tagger)
+
+    for tagger in taggers:
+        visit(tagger)
+
+    return ordered
@@ -1,7 +1,8 @@
-import json
+import numpy as np
 
 from abc import ABC, abstractmethod
-from typing import Union
+from postit.utils import codec
+from typing import Optional, Union
 
 
 class Source(ABC):
@@ -22,15 +23,41 @@ class Source(ABC):
 
 
 class Doc(Source):
-    __slots__ = "id", "content"
+    __slots__ = "id", "content", "_paragraphs"
 
     def __init__(self, id: int, source: str, content: str):
         super().__init__(source)
         self.id = id
         self.content = content
+        self._paragraphs: Optional[tuple[str, list[tuple[int, int]]]] = None
+
+    def get_paragraphs(self) -> list[tuple[int, int]]:
+        """
+        Gets the spans of the paragraphs of the document, separated by newlines.
+        The spans are computed once and shared by every paragraph-level tagger.
+
+        Returns:
+            list[tuple[int, int]]: The start and end (exclusive) of each paragraph.
+        """
+        # The cache is tied to the content it was computed from
+        if self._paragraphs is None or self._paragraphs[0] is not self.content:
+            # Newlines are found on the code points, one per character
+            content = self.content
+            if content.isascii():
+                codes = np.frombuffer(content.encode("ascii"), dtype=np.uint8)
+            else:
+                codes = np.frombuffer(
+                    content.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+                )
+            ends = np.flatnonzero(codes == 10)
+            starts = [0, *(ends + 1).tolist()]
+            spans = list(zip(starts, [*ends.tolist(), len(content)]))
+            self._paragraphs = (content, spans)
+
+        return self._paragraphs[1]
 
     def get_tags(self) -> str:
-        return json.dumps(
+        return codec.dumps(
             {
                 "id": self.id,
                 "source": self.source,
@@ -38,6 +65,25 @@ class Doc(Source):
             }
         )
 
+    @staticmethod
+    def from_raw(raw: Union[str, bytes]) -> "Doc":
+        """
+        Creates a Doc object from a single line of a documents file.
+
+        Args:
+            raw (str | bytes): The raw JSON line representing the document.
+                Bytes are decoded directly, invalid UTF-8 is ignored.
+
+        Returns:
+            Doc: The created Doc object.
+        """
+        if isinstance(raw, bytes):
+            try:
+                return Doc(*codec.decode_doc(raw))
+            except ValueError:
+                raw = raw.decode(errors="ignore")
+        return Doc(*codec.decode_doc(raw))
+
 
 class File(Source):
     __slots__ = "content"
@@ -47,13 +93,25 @@ class File(Source):
         self.content = content
 
     def get_tags(self) -> str:
-        json_str = json.dumps(
+        return (
+            self.get_file_tags()
+            + "\n"
+            + "\n".join(doc.get_tags() for doc in self.content)
+        )
+
+    def get_file_tags(self) -> str:
+        """
+        Gets the file-level tags, without the tags of the documents in the file.
+
+        Returns:
+            str: The file-level tags. Stored as the first line of a tags file.
+        """
+        return codec.dumps(
             {
                 "source": self.source,
                 "tags": self.tags,
             }
         )
-        return json_str + "\n" + "\n".join(doc.get_tags() for doc in self.content)
 
     @staticmethod
     def from_raw(path: str, raw: str) -> "File":
@@ -68,11 +126,8 @@ class File(Source):
             File: The created File object.
         """
 
-        content = [
-            Doc(data["id"], data["source"], data["content"])
-            for line in raw.strip().splitlines()
-            for data in [json.loads(line)]
-        ]
+        # Only newlines separate documents, other line breaks may be in their content
+        content = [Doc.from_raw(line) for line in raw.split("\n") if line.strip()]
         return File(path, content)
 
 
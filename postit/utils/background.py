@@ -0,0 +1,154 @@
+import io
+import queue
+import threading
+
+from typing import IO, Any, Iterator, Optional, Union
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB
+DEFAULT_DEPTH = 4
+
+
+class ReadAhead:
+    """
+    Reads a binary file in chunks on a background thread, so reading overlaps with processing the lines already read.
+    Iterating yields the lines of the file, like iterating the file itself.
+    Up to `depth` chunks of `chunk_size` bytes are read ahead. Errors of the background thread are raised by the iteration.
+    The file is closed with the reader.
+    """
+
+    def __init__(
+        self,
+        file: IO,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        depth: int = DEFAULT_DEPTH,
+    ):
+        if chunk_size <= 0 or depth <= 0:
+            raise ValueError("The chunk size and depth must be positive.")
+
+        self.file = file
+        self.chunk_size = chunk_size
+        self.chunks: queue.Queue = queue.Queue(depth)
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.read_chunks, daemon=True)
+        self.thread.start()
+
+    def __enter__(self) -> "ReadAhead":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def read_chunks(self) -> None:
+        try:
+            while chunk := self.file.read(self.chunk_size):
+                if not self.put(chunk):
+                    return
+            self.put(b"")
+        except BaseException as e:
+            self.put(e)
+
+    def put(self, item: Union[bytes, BaseException]) -> bool:
+        """
+        Queues an item for the reader. Returns False if the reader was closed meanwhile.
+        """
+        while not self.closed.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self) -> Iterator[bytes]:
+        rest = b""
+        while True:
+            chunk = self.chunks.get()
+            if isinstance(chunk, BaseException):
+                raise chunk
+            if not chunk:
+                break
+            lines = io.BytesIO(rest + chunk).readlines()
+            rest = b"" if lines[-1].endswith(b"\n") else lines.pop()
+            yield from lines
+        if rest:
+            yield rest
+
+    def close(self) -> None:
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self.thread.join()
+        self.file.close()
+
+
+class WriteBehind:
+    """
+    Writes to a file on a background thread, so processing continues while earlier writes complete.
+    Writes are gathered into chunks of about `chunk_size` bytes or characters, and up to `depth` chunks wait to be written.
+    Errors of the background thread are raised by the next write or by close().
+    The file is closed with the writer, once every chunk is written.
+    """
+
+    def __init__(
+        self,
+        file: IO,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        depth: int = DEFAULT_DEPTH,
+    ):
+        if chunk_size <= 0 or depth <= 0:
+            raise ValueError("The chunk size and depth must be positive.")
+
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer: list[Any] = []
+        self.size = 0
+        self.error: Optional[BaseException] = None
+        self.chunks: queue.Queue = queue.Queue(depth)
+        self.closed = False
+        self.thread = threading.Thread(target=self.write_chunks, daemon=True)
+        self.thread.start()
+
+    def __enter__(self) -> "WriteBehind":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write_chunks(self) -> None:
+        # Chunks are still taken after an error, so writers never block on a full queue
+        while (chunk := self.chunks.get()) is not None:
+            if self.error is None:
+                try:
+                    self.file.write(chunk)
+                except BaseException as e:
+                    self.error = e
+
+    def write(self, data: Union[str, bytes]) -> None:
+        if self.error is not None:
+            raise self.error
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Queues the buffered writes as one chunk.
+        """
+        if self.buffer:
+            self.chunks.put(self.buffer[0][:0].join(self.buffer))
+            self.buffer = []
+            self.size = 0
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+        finally:
+            self.chunks.put(None)
+            self.thread.join()
+            self.file.close()
+        if self.error is not None:
+            raise self.error
@@ -1,12 +1,23 @@
 import math
+import mmap
 import mmh3
-import pickle
+import numpy as np
+import os
+import struct
 
 from bitarray import bitarray
-from multiprocessing import Array, Lock
+from bitarray.util import count_or
+from contextlib import contextmanager
+from multiprocessing import Lock
+from multiprocessing.shared_memory import SharedMemory
 from postit.files import FileClient
+from postit.utils.text import to_utf8
+from typing import Optional, Sequence, Union
 
-# TODO: Update class to save and load from a different file format
+MASK_64 = (1 << 64) - 1
+
+# Items are hashed as UTF-8, so a string and its encoded bytes are the same item
+Item = Union[str, bytes]
 
 
 class BloomFilter:
@@ -16,58 +27,321 @@ class BloomFilter:
     Each bit represents the presence or absence of an element.
     Due to the probabilistic nature of bloom filters, there is a small chance of false positives.
 
-    Implemented to be thread-safe.
+    The bits live in shared memory, so threads and worker processes add to and query one filter.
+    Forked workers inherit the filter. Pickled filters attach to the same memory by name.
+    The process that creates a filter owns its shared memory and releases it with close().
+
+    Filters loaded from a local file map the file read-only and keep added bits in a journal:
+    shared memory holding the bits set since loading, and which pages of the file they fall in.
+    A bit is set if it is set in the file or in the journal. Bits are never cleared, so saving to the
+    loaded file only merges the dirty pages into it, and the file is left untouched until then.
+
+    Bit indexes come from double hashing: one 128-bit mmh3 digest is split into two 64-bit bases,
+    and the i-th index is `(h1 + i * h2) mod size`.
+    Writes lock only the stripes (contiguous bit regions) they touch. Reads take no lock.
     """
 
-    def __init__(self, size: int, num_hashes: int):
+    # File format: a header padded to one page, then the raw bits (little-endian bit order)
+    MAGIC = b"PBLM"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHIQ")
+    PAYLOAD_OFFSET = 4096
+    # Bytes of bits in each journaled page of a loaded file
+    PAGE_SIZE = 4096
+
+    NUM_STRIPES = 64
+
+    def __init__(
+        self,
+        size: int,
+        num_hashes: int,
+        name: Optional[str] = None,
+        locks: Optional[list] = None,
+        path: Optional[str] = None,
+        create: bool = False,
+    ):
         self.size = size
         self.num_hashes = num_hashes
-        self.lock = Lock()
-        self.shared_array = Array("b", size)
-        self.bit_array = bitarray(size)
-        self.bit_array.setall(0)
-        self.bit_array.frombytes(self.shared_array.get_obj())
+        self.path = path
+        self.owner = create or name is None
+        num_bytes = max(1, math.ceil(size / 8))
+
+        # The bits of a loaded file, see load()
+        self.mmap: Optional[mmap.mmap] = None
+        self.base_bits: Optional[bitarray] = None
+        self.base: Optional[np.ndarray] = None
+        # The journal of a loaded file ends with one byte per page, set once the page has bits to save
+        num_pages = math.ceil(num_bytes / self.PAGE_SIZE) if path else 0
+        if path:
+            # Pages of the file are read lazily, and never written through the mapping
+            with open(path, "rb") as file:
+                self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            base = memoryview(self.mmap)[
+                self.PAYLOAD_OFFSET : self.PAYLOAD_OFFSET + num_bytes
+            ]
+            self.base_bits = bitarray(buffer=base, endian="little")
+            self.base = np.frombuffer(base, dtype=np.uint8)
+
+        if self.owner:
+            # New shared memory is zero-filled, and its pages are only allocated once written
+            self.shm = SharedMemory(name=name, create=True, size=num_bytes + num_pages)
+        else:
+            # Worker processes share the resource tracker of the owner, which tracks the memory once
+            self.shm = SharedMemory(name=name)
+        assert self.shm.buf is not None
+        buffer = self.shm.buf[:num_bytes]
+
+        self.bit_array = bitarray(buffer=buffer, endian="little")
+        self.bytes = np.frombuffer(buffer, dtype=np.uint8)
+        self.dirty: Optional[np.ndarray] = None
+        if path:
+            self.dirty = np.frombuffer(
+                self.shm.buf, dtype=np.uint8, count=num_pages, offset=num_bytes
+            )
+        self.closed = False
+
+        # Stripes are byte-aligned, so concurrent writes to different stripes never share a byte
+        self.stripe_size = 8 * math.ceil(num_bytes / self.NUM_STRIPES)
+        self.locks = locks or [Lock() for _ in range(self.NUM_STRIPES)]
+
+    def __getstate__(self) -> dict:
+        return {
+            "size": self.size,
+            "num_hashes": self.num_hashes,
+            "name": self.shm.name,
+            "locks": self.locks,
+            "path": self.path,
+        }
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)  # type: ignore[misc]
+
+    def get_indexes(self, item: Item) -> list[int]:
+        """
+        Returns the bit indexes of an item.
+        """
+        h1, h2 = mmh3.hash64(to_utf8(item), signed=False)
+        # An odd step never collapses every index onto the first
+        h2 |= 1
+        return [((h1 + i * h2) & MASK_64) % self.size for i in range(self.num_hashes)]
+
+    def get_batch_indexes(self, items: Sequence[Item]) -> np.ndarray:
+        """
+        Returns the bit indexes of each item, one row per item.
+        """
+        digests = np.array(
+            [mmh3.hash64(to_utf8(item), signed=False) for item in items],
+            dtype=np.uint64,
+        ).reshape(-1, 2)
+        h1, h2 = digests[:, :1], digests[:, 1:] | np.uint64(1)
+        # uint64 arithmetic wraps like the masked arithmetic of get_indexes()
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1 + steps * h2) % np.uint64(self.size)
 
-    def add(self, item: str):
+    @contextmanager
+    def lock_stripes(self, indexes: Union[list[int], np.ndarray]):
+        """
+        Holds the locks of the stripes covering the given bit indexes.
+        Locks are acquired in order, so concurrent writers cannot deadlock.
+        """
+        if isinstance(indexes, np.ndarray):
+            stripes = np.unique(indexes // np.uint64(self.stripe_size)).tolist()
+        else:
+            stripes = sorted({index // self.stripe_size for index in indexes})
+        for stripe in stripes:
+            self.locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self.locks[stripe].release()
+
+    def add(self, item: Item):
         """
         Hashes the item multiple times and sets the corresponding bits to True.
         """
-        with self.lock:
-            for i in range(self.num_hashes):
-                digest = mmh3.hash(item, i) % self.size
-                self.bit_array[digest] = True
+        indexes = self.get_indexes(item)
+        with self.lock_stripes(indexes):
+            self.set_indexes(indexes)
 
-    def __contains__(self, item: str) -> bool:
+    def __contains__(self, item: Item) -> bool:
         """
         Check for membership by hashing the item multiple times and checking the corresponding bits.
         """
-        with self.lock:
-            for i in range(self.num_hashes):
-                digest = mmh3.hash(item, i) % self.size
-                if not self.bit_array[digest]:
-                    return False
+        return all(self.has_index(index) for index in self.get_indexes(item))
+
+    def test_and_add(self, item: Item) -> bool:
+        """
+        Adds an item and returns whether it was already present, as one atomic operation.
+        """
+        indexes = self.get_indexes(item)
+        with self.lock_stripes(indexes):
+            present = all(self.has_index(index) for index in indexes)
+            self.set_indexes(indexes)
+        return present
+
+    def add_batch(self, items: Sequence[Item]):
+        """
+        Adds every item.
+        """
+        indexes = self.get_batch_indexes(items).ravel()
+        with self.lock_stripes(indexes):
+            self.set_bits(indexes)
+
+    def contains_batch(self, items: Sequence[Item]) -> list[bool]:
+        """
+        Returns whether each item is present.
+        """
+        bits = self.get_bits(self.get_batch_indexes(items))
+        return np.logical_and.reduce(bits, axis=1).tolist()
+
+    def test_and_add_batch(self, items: Sequence[Item]) -> list[bool]:
+        """
+        Adds every item and returns whether each one was already present, as one atomic operation.
+        Items are added in order, so an item repeated within the batch is present after its first occurrence.
+        """
+        indexes = self.get_batch_indexes(items)
+        flat = indexes.ravel()
+        with self.lock_stripes(flat):
+            present = self.get_bits(indexes)
+
+            # A bit is also set if an earlier item of the batch sets it
+            # Rows are in item order, so the first occurrence of a bit belongs to its earliest item
+            _, first, inverse = np.unique(flat, return_index=True, return_inverse=True)
+            first_item = (first // self.num_hashes)[inverse].reshape(indexes.shape)
+            items_order = np.arange(len(items))[:, None]
+            present |= first_item < items_order
+
+            self.set_bits(flat)
+
+        return np.logical_and.reduce(present, axis=1).tolist()
+
+    def has_index(self, index: int) -> bool:
+        if self.bit_array[index]:
             return True
+        return self.base_bits is not None and bool(self.base_bits[index])
+
+    def set_indexes(self, indexes: list[int]):
+        for index in indexes:
+            self.bit_array[index] = True
+        if self.dirty is not None:
+            for index in indexes:
+                self.dirty[index // (8 * self.PAGE_SIZE)] = 1
+
+    def get_bits(self, indexes: np.ndarray) -> np.ndarray:
+        positions = indexes >> np.uint64(3)
+        values = self.bytes[positions]
+        if self.base is not None:
+            values = values | self.base[positions]
+        return (values >> (indexes & np.uint64(7))) & 1 == 1
+
+    def set_bits(self, indexes: np.ndarray):
+        bits = np.left_shift(1, indexes & np.uint64(7)).astype(np.uint8)
+        np.bitwise_or.at(self.bytes, indexes >> np.uint64(3), bits)
+        if self.dirty is not None:
+            self.dirty[indexes // np.uint64(8 * self.PAGE_SIZE)] = 1
+
+    def get_payload(self, start: int = 0, stop: Optional[int] = None) -> bytes:
+        """
+        Returns the bytes of bits between two byte offsets, merging the journal into the loaded file.
+        """
+        payload = self.bytes[start:stop]
+        if self.base is not None:
+            payload = payload | self.base[start:stop]
+        return payload.tobytes()
+
+    def fill_ratio(self) -> float:
+        """
+        Returns the fraction of bits that are set.
+        """
+        if self.base_bits is not None:
+            return count_or(self.bit_array, self.base_bits) / self.size
+        return self.bit_array.count() / self.size
+
+    def estimated_fpr(self) -> float:
+        """
+        Returns the false positive rate estimated from the fill ratio.
+        """
+        return self.fill_ratio() ** self.num_hashes
+
+    def close(self, unlink: bool = False):
+        """
+        Detaches from the shared memory or file. The owner of shared memory also frees it.
+
+        Args:
+            unlink (bool, optional): Free the shared memory even if this filter does not own it. Defaults to False.
+        """
+        if self.closed:
+            return
+
+        # Release the exported buffers before closing the memory.
+        # Changes to a loaded file that were never saved are discarded with the journal
+        self.closed = True
+        del self.bit_array, self.bytes, self.dirty, self.base_bits, self.base
+        if self.mmap:
+            self.mmap.close()
+        self.shm.close()
+        if self.owner or unlink:
+            self.shm.unlink()
 
     def save(self, filename: str):
         """
-        Save the bloom filter to a pickle file.
+        Save the bloom filter to a binary file.
+        A filter loaded from the same file only writes back its dirty pages.
+        Saving only sets bits, so a save that is interrupted leaves a valid filter missing some of the new items.
         """
-        with self.lock:
+        with self.lock_stripes(list(range(0, self.size, self.stripe_size))):
+            if self.dirty is not None and os.path.realpath(
+                filename
+            ) == os.path.realpath(str(self.path)):
+                with open(filename, "r+b") as f:
+                    for page in np.flatnonzero(self.dirty).tolist():
+                        start = page * self.PAGE_SIZE
+                        f.seek(self.PAYLOAD_OFFSET + start)
+                        f.write(self.get_payload(start, start + self.PAGE_SIZE))
+                        self.dirty[page] = 0
+                return
+
             file_client = FileClient.get_for_target(filename)
             with file_client.open(filename, "wb") as f:
-                pickle.dump((self.size, self.num_hashes, self.bit_array), f)
+                header = self.HEADER.pack(
+                    self.MAGIC, self.VERSION, 0, self.num_hashes, self.size
+                )
+                f.write(header.ljust(self.PAYLOAD_OFFSET, b"\0"))
+                f.write(self.get_payload())
 
     @classmethod
     def load(cls, filename: str):
         """
-        Load a bloom filter from a pickle file.
+        Load a bloom filter from a binary file.
+        Local files are memory-mapped read-only, so loading does not read the bits, and added bits are journaled.
+        The file is left untouched until the filter is saved to it, and unsaved changes are discarded on close.
+        Remote files are read into shared memory.
         """
         file_client = FileClient.get_for_target(filename)
         with file_client.open(filename, "rb") as f:
-            size, num_hashes, bit_array = pickle.load(f)
-            bloom_filter = cls(size, num_hashes)
-            bloom_filter.bit_array = bit_array
-            return bloom_filter
+            header = f.read(cls.PAYLOAD_OFFSET)
+            payload = b"" if file_client.is_local else f.read()
+
+        if len(header) < cls.HEADER.size:
+            raise ValueError(f"Invalid bloom filter file: {filename}")
+        magic, version, _, num_hashes, size = cls.HEADER.unpack_from(header)
+        if magic != cls.MAGIC:
+            raise ValueError(f"Invalid bloom filter file: {filename}")
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported bloom filter version {version}: {filename}")
+
+        num_bytes = max(1, math.ceil(size / 8))
+        if file_client.is_local:
+            if os.path.getsize(filename) < cls.PAYLOAD_OFFSET + num_bytes:
+                raise ValueError(f"Truncated bloom filter file: {filename}")
+            return cls(size, num_hashes, path=filename)
+
+        if len(payload) < num_bytes:
+            raise ValueError(f"Truncated bloom filter file: {filename}")
+        bloom_filter = cls(size, num_hashes)
+        bloom_filter.bytes[:] = np.frombuffer(payload, dtype=np.uint8, count=num_bytes)
+        return bloom_filter
 
     @classmethod
     def new(cls, num_elements: int, false_pos: float) -> "BloomFilter":
@@ -75,6 +349,315 @@ class BloomFilter:
         return cls(size, num_hashes)
 
 
+class ScalableBloomFilter:
+    """
+    A bloom filter that grows with the number of items, for sets of unknown size.
+
+    Items are added to the newest of a chain of bloom filters. Once it holds its capacity, a new filter
+    is added with `growth` times the capacity and `ratio` times the error rate. The error rates form a
+    geometric series, so the false positive rate of the chain stays below `error`.
+
+    Sub-filters and item counts live in shared memory, so worker processes grow one chain together.
+    Sub-filters are named after the chain, and workers attach to filters added by others before each operation.
+    Membership is checked in older filters first. Only the check in the newest filter is atomic with the add.
+    """
+
+    MAGIC = b"PBLS"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHIQddd")
+    MAX_FILTERS = 32
+
+    def __init__(
+        self,
+        capacity: int,
+        error: float = 0.01,
+        growth: int = 2,
+        ratio: float = 0.5,
+        name: Optional[str] = None,
+        lock=None,
+        locks: Optional[list] = None,
+    ):
+        self.capacity = capacity
+        self.error = error
+        self.growth = growth
+        self.ratio = ratio
+        self.owner = name is None
+
+        # Number of sub-filters, followed by the number of items in each
+        num_bytes = 8 * (1 + self.MAX_FILTERS)
+        if self.owner:
+            self.control_shm = SharedMemory(create=True, size=num_bytes)
+        else:
+            self.control_shm = SharedMemory(name=name)
+        assert self.control_shm.buf is not None
+        self.control = np.frombuffer(
+            self.control_shm.buf, dtype=np.int64, count=1 + self.MAX_FILTERS
+        )
+
+        # Every sub-filter shares the same stripe locks, created before any worker starts
+        self.lock = lock or Lock()
+        self.locks = locks or [Lock() for _ in range(BloomFilter.NUM_STRIPES)]
+        self.filters: list[BloomFilter] = []
+        self.closed = False
+        if self.owner:
+            with self.lock:
+                self.add_filter()
+        self.sync()
+
+    def __getstate__(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "error": self.error,
+            "growth": self.growth,
+            "ratio": self.ratio,
+            "name": self.control_shm.name,
+            "lock": self.lock,
+            "locks": self.locks,
+        }
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)  # type: ignore[misc]
+
+    def get_filter_capacity(self, index: int) -> int:
+        return self.capacity * self.growth**index
+
+    def get_filter_name(self, index: int) -> str:
+        return f"{self.control_shm.name}_{index}"
+
+    def get_filter_size(self, index: int) -> tuple[int, int]:
+        """
+        Returns the size and number of hashes of a sub-filter.
+        """
+        error = self.error * (1 - self.ratio) * self.ratio**index
+        size, num_hashes = optimal_size(self.get_filter_capacity(index), error)
+        return size, max(1, num_hashes)
+
+    def sync(self):
+        """
+        Attaches to sub-filters added by other processes.
+        """
+        while len(self.filters) < self.control[0]:
+            index = len(self.filters)
+            size, num_hashes = self.get_filter_size(index)
+            self.filters.append(
+                BloomFilter(
+                    size, num_hashes, name=self.get_filter_name(index), locks=self.locks
+                )
+            )
+
+    def add_filter(self):
+        """
+        Adds a sub-filter to the chain. Must be called while holding the lock.
+        """
+        index = int(self.control[0])
+        if index == self.MAX_FILTERS:
+            return
+
+        size, num_hashes = self.get_filter_size(index)
+        self.filters.append(
+            BloomFilter(
+                size,
+                num_hashes,
+                name=self.get_filter_name(index),
+                locks=self.locks,
+                create=True,
+            )
+        )
+        self.control[0] = index + 1
+
+    def record(self, index: int, count: int):
+        """
+        Counts items added to a sub-filter and grows the chain once the newest filter is full.
+        """
+        if not count:
+            return
+
+        with self.lock:
+            self.control[1 + index] += count
+            full = self.control[1 + index] >= self.get_filter_capacity(index)
+            if full and self.control[0] == index + 1:
+                self.sync()
+                self.add_filter()
+
+    def add(self, item: Item):
+        self.test_and_add(item)
+
+    def __contains__(self, item: Item) -> bool:
+        self.sync()
+        return any(item in bloom for bloom in reversed(self.filters))
+
+    def test_and_add(self, item: Item) -> bool:
+        """
+        Adds an item and returns whether it was already present.
+        """
+        self.sync()
+        if any(item in bloom for bloom in self.filters[:-1]):
+            return True
+
+        index = len(self.filters) - 1
+        if self.filters[index].test_and_add(item):
+            return True
+        self.record(index, 1)
+        return False
+
+    def add_batch(self, items: Sequence[Item]):
+        self.test_and_add_batch(items)
+
+    def contains_batch(self, items: Sequence[Item]) -> list[bool]:
+        self.sync()
+        present = np.zeros(len(items), dtype=bool)
+        for bloom in self.filters:
+            present |= bloom.contains_batch(items)
+        return present.tolist()
+
+    def test_and_add_batch(self, items: Sequence[Item]) -> list[bool]:
+        """
+        Adds every item and returns whether each one was already present.
+        Batches larger than the room left in the newest sub-filter are split across sub-filters.
+        """
+        self.sync()
+        present = np.zeros(len(items), dtype=bool)
+        for bloom in self.filters[:-1]:
+            present |= bloom.contains_batch(items)
+
+        pending = np.flatnonzero(~present).tolist()
+        while pending:
+            index = len(self.filters) - 1
+            room = self.get_filter_capacity(index) - int(self.control[1 + index])
+            if room <= 0 or len(self.filters) == self.MAX_FILTERS:
+                room = len(pending)
+            chunk, pending = pending[:room], pending[room:]
+
+            added = self.filters[index].test_and_add_batch([items[i] for i in chunk])
+            present[chunk] = added
+            self.record(index, added.count(False))
+            self.sync()
+
+            # Items left for newer sub-filters may have been added to the ones just filled
+            if pending and len(self.filters) - 1 > index:
+                found = np.zeros(len(pending), dtype=bool)
+                for bloom in self.filters[index:-1]:
+                    found |= bloom.contains_batch([items[i] for i in pending])
+                present[[i for i, f in zip(pending, found) if f]] = True
+                pending = [i for i, f in zip(pending, found) if not f]
+
+        return present.tolist()
+
+    def fill_ratio(self) -> float:
+        """
+        Returns the fraction of bits that are set across all sub-filters.
+        """
+        self.sync()
+        set_bits = sum(bloom.fill_ratio() * bloom.size for bloom in self.filters)
+        return set_bits / sum(bloom.size for bloom in self.filters)
+
+    def estimated_fpr(self) -> float:
+        """
+        Returns the false positive rate of the chain estimated from the fill ratio of each sub-filter.
+        """
+        self.sync()
+        return 1 - math.prod(1 - bloom.estimated_fpr() for bloom in self.filters)
+
+    def close(self):
+        """
+        Detaches from the shared memory. The owner also frees every sub-filter, including those added by workers.
+        """
+        if self.closed:
+            return
+
+        if self.owner:
+            self.sync()
+        for bloom in self.filters:
+            bloom.close(unlink=self.owner)
+        self.filters = []
+
+        self.closed = True
+        del self.control
+        self.control_shm.close()
+        if self.owner:
+            self.control_shm.unlink()
+
+    def save(self, filename: str):
+        """
+        Save the filter chain to a binary file.
+        The header page holds the parameters and item counts, followed by the bits of each sub-filter.
+        """
+        with self.lock:
+            self.sync()
+            file_client = FileClient.get_for_target(filename)
+            with file_client.open(filename, "wb") as f:
+                header = self.HEADER.pack(
+                    self.MAGIC,
+                    self.VERSION,
+                    0,
+                    len(self.filters),
+                    self.capacity,
+                    self.error,
+                    self.growth,
+                    self.ratio,
+                )
+                counts = self.control[1 : 1 + len(self.filters)].tobytes()
+                f.write((header + counts).ljust(BloomFilter.PAYLOAD_OFFSET, b"\0"))
+                for bloom in self.filters:
+                    with bloom.lock_stripes(
+                        list(range(0, bloom.size, bloom.stripe_size))
+                    ):
+                        payload = bloom.bytes.tobytes()
+                    padding = -len(payload) % BloomFilter.PAYLOAD_OFFSET
+                    f.write(payload + b"\0" * padding)
+
+    @classmethod
+    def load(cls, filename: str) -> "ScalableBloomFilter":
+        """
+        Load a filter chain from a binary file into shared memory.
+        """
+        file_client = FileClient.get_for_target(filename)
+        data = file_client.read_bytes(filename)
+        if len(data) < cls.HEADER.size:
+            raise ValueError(f"Invalid bloom filter file: {filename}")
+        magic, version, _, num_filters, capacity, error, growth, ratio = (
+            cls.HEADER.unpack_from(data)
+        )
+        if magic != cls.MAGIC:
+            raise ValueError(f"Invalid bloom filter file: {filename}")
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported bloom filter version {version}: {filename}")
+
+        bloom_filter = cls(capacity, error, int(growth), ratio)
+        counts = np.frombuffer(
+            data, dtype=np.int64, count=num_filters, offset=cls.HEADER.size
+        )
+        offset = BloomFilter.PAYLOAD_OFFSET
+        with bloom_filter.lock:
+            for index in range(num_filters):
+                if index > 0:
+                    bloom_filter.add_filter()
+                bloom = bloom_filter.filters[index]
+                num_bytes = len(bloom.bytes)
+                if len(data) < offset + num_bytes:
+                    bloom_filter.close()
+                    raise ValueError(f"Truncated bloom filter file: {filename}")
+                bloom.bytes[:] = np.frombuffer(
+                    data, dtype=np.uint8, count=num_bytes, offset=offset
+                )
+                bloom_filter.control[1 + index] = counts[index]
+                offset += num_bytes + (-num_bytes % BloomFilter.PAYLOAD_OFFSET)
+
+        return bloom_filter
+
+
+def load_bloom_filter(filename: str) -> Union[BloomFilter, ScalableBloomFilter]:
+    """
+    Load a fixed-size or scalable bloom filter from a binary file, depending on its header.
+    """
+    file_client = FileClient.get_for_target(filename)
+    with file_client.open(filename, "rb") as f:
+        magic = f.read(4)
+    if magic == ScalableBloomFilter.MAGIC:
+        return ScalableBloomFilter.load(filename)
+    return BloomFilter.load(filename)
+
+
 def optimal_size(n: int, p: float) -> tuple[int, int]:
     """
     Utility to calculate BloomFilter parameters.
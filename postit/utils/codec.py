@@ -0,0 +1,265 @@
+import json
+import math
+
+from enum import Enum
+from typing import Any, Optional, Union
+
+try:
+    import msgspec
+
+    HAS_MSGSPEC = True
+except ImportError:
+    HAS_MSGSPEC = False
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+Raw = Union[str, bytes]
+
+if HAS_MSGSPEC:
+    # Typed records skip building a dict for each line, unknown fields are ignored
+    class DocRecord(msgspec.Struct, gc=False):
+        id: Any
+        source: str
+        content: str
+
+    class TagsRecord(msgspec.Struct, gc=False):
+        id: Any
+        tags: dict[str, list]
+
+
+class JsonBackend(Enum):
+    """
+    Libraries used to encode and decode JSON. The fastest installed library is used by default.
+
+    MSGSPEC: Decodes document and tag lines into typed structs. Install with `pip install msgspec`.
+    ORJSON: Install with `pip install orjson`.
+    STDLIB: The standard library `json` module. Always available.
+    """
+
+    MSGSPEC = "msgspec"
+    ORJSON = "orjson"
+    STDLIB = "stdlib"
+
+    @staticmethod
+    def available() -> list["JsonBackend"]:
+        """
+        Returns the installed backends, fastest first.
+        """
+        backends = []
+        if HAS_MSGSPEC:
+            backends.append(JsonBackend.MSGSPEC)
+        if HAS_ORJSON:
+            backends.append(JsonBackend.ORJSON)
+        backends.append(JsonBackend.STDLIB)
+        return backends
+
+
+def has_non_finite(obj: Any) -> bool:
+    """
+    Returns whether a value holds NaN or infinite floats, including in NumPy scalars and arrays.
+    """
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(has_non_finite(value) for value in obj)
+    if hasattr(obj, "tolist"):
+        return has_non_finite(obj.tolist())
+    return False
+
+
+def reject_constant(name: str) -> Any:
+    raise ValueError(f"Out of range float values are not JSON compliant: {name}")
+
+
+def to_builtin(obj: Any) -> Any:
+    """
+    Converts NumPy scalars, which fast encoders do not support, to Python values.
+    """
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class Codec:
+    """
+    Encodes and decodes the JSON lines of documents and tags files.
+    This implementation uses the standard library. Encoded JSON may differ in whitespace between backends.
+
+    Every backend accepts and rejects the same input, raising ValueError:
+    NaN and infinite floats are neither encoded nor decoded,
+    and document and tags lines must have the fields of DocRecord and TagsRecord.
+    Faster backends fall back to this implementation for input they reject but the standard library accepts,
+    such as strings with lone surrogates, so their results match.
+    """
+
+    backend = JsonBackend.STDLIB
+
+    def loads(self, raw: Raw) -> Any:
+        """
+        Decodes a JSON value.
+        """
+        return json.loads(raw, parse_constant=reject_constant)
+
+    def dumps(self, obj: Any) -> str:
+        """
+        Encodes a value as JSON.
+        """
+        return json.dumps(obj, default=to_builtin, allow_nan=False)
+
+    def decode_doc(self, raw: Raw) -> tuple[Any, str, str]:
+        """
+        Decodes a line of a documents file into its id, source and content.
+        """
+        data = self.loads(raw)
+        if not (
+            isinstance(data, dict)
+            and "id" in data
+            and isinstance(data.get("source"), str)
+            and isinstance(data.get("content"), str)
+        ):
+            raise ValueError("Documents must have an id, a string source and content.")
+        return data["id"], data["source"], data["content"]
+
+    def decode_tags(self, raw: Raw) -> tuple[Any, dict[str, list]]:
+        """
+        Decodes a document line of a tags file into its id and tags.
+        """
+        data = self.loads(raw)
+        tags = data.get("tags") if isinstance(data, dict) and "id" in data else None
+        if not isinstance(tags, dict) or not all(
+            isinstance(spans, list) for spans in tags.values()
+        ):
+            raise ValueError("Tags lines must have an id and lists of tags.")
+        return data["id"], tags
+
+
+class OrjsonCodec(Codec):
+    backend = JsonBackend.ORJSON
+
+    def loads(self, raw: Raw) -> Any:
+        try:
+            return orjson.loads(raw)
+        except ValueError:
+            return super().loads(raw)
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            encoded = orjson.dumps(
+                obj, default=to_builtin, option=orjson.OPT_SERIALIZE_NUMPY
+            )
+        except TypeError:
+            # Lone surrogates and integers above 64 bits
+            return super().dumps(obj)
+        # Non-finite floats are encoded as null, values are only checked when null appears
+        if b"null" in encoded and has_non_finite(obj):
+            raise ValueError("Out of range float values are not JSON compliant")
+        return encoded.decode()
+
+
+class MsgspecCodec(Codec):
+    backend = JsonBackend.MSGSPEC
+
+    def __init__(self):
+        self.decoder = msgspec.json.Decoder()
+        self.encoder = msgspec.json.Encoder(enc_hook=to_builtin)
+        self.doc_decoder = msgspec.json.Decoder(DocRecord)
+        self.tags_decoder = msgspec.json.Decoder(TagsRecord)
+
+    def loads(self, raw: Raw) -> Any:
+        try:
+            return self.decoder.decode(raw)
+        except ValueError:
+            return super().loads(raw)
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            encoded = self.encoder.encode(obj)
+        except (TypeError, ValueError):
+            # Lone surrogates
+            return super().dumps(obj)
+        # Non-finite floats are encoded as null, values are only checked when null appears
+        if b"null" in encoded and has_non_finite(obj):
+            raise ValueError("Out of range float values are not JSON compliant")
+        return encoded.decode()
+
+    def decode_doc(self, raw: Raw) -> tuple[Any, str, str]:
+        try:
+            record = self.doc_decoder.decode(raw)
+        except ValueError:
+            return super().decode_doc(raw)
+        return record.id, record.source, record.content
+
+    def decode_tags(self, raw: Raw) -> tuple[Any, dict[str, list]]:
+        try:
+            record = self.tags_decoder.decode(raw)
+        except ValueError:
+            return super().decode_tags(raw)
+        return record.id, record.tags
+
+
+CODECS: dict[JsonBackend, type[Codec]] = {
+    JsonBackend.MSGSPEC: MsgspecCodec,
+    JsonBackend.ORJSON: OrjsonCodec,
+    JsonBackend.STDLIB: Codec,
+}
+
+# The codec in use, see set_backend()
+codec: Codec = Codec()
+
+
+def set_backend(backend: Optional[Union[JsonBackend, str]] = None) -> Codec:
+    """
+    Selects the JSON backend used to read and write documents and tags.
+    Defaults to the fastest installed backend.
+
+    Args:
+        backend (JsonBackend | str, optional): The backend to use. Defaults to None.
+
+    Returns:
+        Codec: The codec in use.
+    """
+    global codec
+    backend = JsonBackend(backend) if backend else JsonBackend.available()[0]
+    if backend not in JsonBackend.available():
+        raise ImportError(f"JSON backend {backend.value} is not installed.")
+
+    codec = CODECS[backend]()
+    return codec
+
+
+set_backend()
+
+
+def loads(raw: Raw) -> Any:
+    """
+    Decodes a JSON value with the selected backend.
+    """
+    return codec.loads(raw)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Encodes a value as JSON with the selected backend.
+    """
+    return codec.dumps(obj)
+
+
+def decode_doc(raw: Raw) -> tuple[Any, str, str]:
+    """
+    Decodes a line of a documents file into its id, source and content.
+    """
+    return codec.decode_doc(raw)
+
+
+def decode_tags(raw: Raw) -> tuple[Any, dict[str, list]]:
+    """
+    Decodes a document line of a tags file into its id and tags.
+    """
+    return codec.decode_tags(raw)
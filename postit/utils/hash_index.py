@@ -0,0 +1,214 @@
+import mmh3
+import numpy as np
+import os
+import shutil
+import tempfile
+
+from postit.utils.text import normalize, to_utf8
+from typing import Iterator, Optional, Union
+
+# 128-bit content digests, stored as two 64-bit halves
+DIGEST = np.dtype([("hi", "<u8"), ("lo", "<u8")])
+# Index entries: a digest and a reference to the document it was computed from
+ENTRY = np.dtype([("hi", "<u8"), ("lo", "<u8"), ("ref", "<i8")])
+
+DEFAULT_PARTITIONS = 256
+DEFAULT_MAX_ROWS = 1 << 24  # 16M entries, 384 MiB
+
+
+def hash_content(content: str) -> tuple[int, int]:
+    """
+    Returns the 128-bit digest of a text, normalized the same way as bloom filter deduplication.
+    """
+    return hash_normalized(normalize(content))
+
+
+def hash_normalized(item: Union[str, bytes]) -> tuple[int, int]:
+    """
+    Returns the 128-bit digest of a normalized text, or of its UTF-8 bytes.
+    """
+    return mmh3.hash64(to_utf8(item), signed=False)
+
+
+def make_entries(digests: np.ndarray, refs: np.ndarray) -> np.ndarray:
+    """
+    Creates index entries from digests and the references of their documents.
+    """
+    entries = np.empty(len(digests), dtype=ENTRY)
+    entries["hi"] = digests["hi"]
+    entries["lo"] = digests["lo"]
+    entries["ref"] = refs
+    return entries
+
+
+class HashIndex:
+    """
+    An exact index of content digests, used to find duplicate documents without false positives.
+
+    Entries are split into partitions by the leading bits of their digest and kept in sorted runs.
+    Once more than `max_rows` entries are buffered, runs are spilled to `.npy` files in `spill_dir`.
+    Each partition is sorted by digest, then by reference, so the first entry of a digest is its earliest document.
+
+    Attributes:
+        num_partitions (int): The number of partitions. Must be a power of 2.
+        max_rows (int): The number of entries buffered in memory before spilling.
+        spill_dir (str): The directory holding spilled runs.
+    """
+
+    def __init__(
+        self,
+        num_partitions: int = DEFAULT_PARTITIONS,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        spill_dir: Optional[str] = None,
+    ):
+        if num_partitions <= 0 or num_partitions & (num_partitions - 1):
+            raise ValueError("The number of partitions must be a power of 2.")
+
+        self.num_partitions = num_partitions
+        self.shift = np.uint64(64 - (num_partitions.bit_length() - 1))
+        self.max_rows = max_rows
+        self.owns_spill_dir = spill_dir is None
+        self.spill_dir = spill_dir or ""
+        self.buffers: list[list[np.ndarray]] = [[] for _ in range(num_partitions)]
+        self.runs: list[list[str]] = [[] for _ in range(num_partitions)]
+        self.buffered = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __enter__(self) -> "HashIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def get_partitions(self, digests: np.ndarray) -> np.ndarray:
+        """
+        Returns the partition of each digest.
+        """
+        if self.num_partitions == 1:
+            return np.zeros(len(digests), dtype=np.int64)
+        return (digests["hi"] >> self.shift).astype(np.int64)
+
+    def add(self, entries: np.ndarray):
+        """
+        Adds a batch of entries, such as the digests of one shard, spilling runs to disk once the buffer is full.
+        """
+        if not len(entries):
+            return
+
+        partitions = self.get_partitions(entries)
+        order = np.argsort(partitions, kind="stable")
+        bounds = np.searchsorted(partitions[order], np.arange(self.num_partitions + 1))
+        for partition in np.flatnonzero(np.diff(bounds)).tolist():
+            rows = order[bounds[partition] : bounds[partition + 1]]
+            self.buffers[partition].append(entries[rows])
+
+        self.buffered += len(entries)
+        self.size += len(entries)
+        if self.buffered > self.max_rows:
+            self.spill()
+
+    def spill(self):
+        """
+        Writes the buffered entries of each partition to disk as a sorted run.
+        """
+        if not self.spill_dir:
+            self.spill_dir = tempfile.mkdtemp(prefix="postit-index-")
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        for partition, buffer in enumerate(self.buffers):
+            if not buffer:
+                continue
+            path = os.path.join(
+                self.spill_dir,
+                f"part-{partition:05d}-{len(self.runs[partition]):05d}.npy",
+            )
+            np.save(path, sort_entries(np.concatenate(buffer)))
+            self.runs[partition].append(path)
+            self.buffers[partition] = []
+
+        self.buffered = 0
+
+    def get_partition(self, partition: int) -> np.ndarray:
+        """
+        Returns the sorted entries of a partition, merging its spilled runs.
+        """
+        chunks = [np.load(path) for path in self.runs[partition]]
+        chunks.extend(self.buffers[partition])
+        if not chunks:
+            return np.empty(0, dtype=ENTRY)
+        return sort_entries(np.concatenate(chunks))
+
+    def duplicates(self) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Yields the references of duplicate entries and the reference of the earliest entry with the same digest.
+        Partitions are loaded one at a time.
+
+        Yields:
+            tuple[np.ndarray, np.ndarray]: The duplicate references and their matching first references.
+        """
+        for partition in range(self.num_partitions):
+            entries = self.get_partition(partition)
+            if len(entries) < 2:
+                continue
+
+            same = (entries["hi"][1:] == entries["hi"][:-1]) & (
+                entries["lo"][1:] == entries["lo"][:-1]
+            )
+            duplicate = np.flatnonzero(same) + 1
+            if not len(duplicate):
+                continue
+
+            # The first entry of each run of equal digests
+            starts = np.where(
+                np.concatenate([[True], ~same]), np.arange(len(entries)), 0
+            )
+            first = np.maximum.accumulate(starts)[duplicate]
+            yield entries["ref"][duplicate], entries["ref"][first]
+
+    def lookup(self, digests: np.ndarray) -> np.ndarray:
+        """
+        Returns the earliest reference of each digest, or -1 for digests that are not indexed.
+        """
+        result = np.full(len(digests), -1, dtype=np.int64)
+        partitions = self.get_partitions(digests)
+        for partition in np.unique(partitions).tolist():
+            rows = np.flatnonzero(partitions == partition)
+            entries = self.get_partition(partition)
+            if not len(entries):
+                continue
+
+            keys = entries[["hi", "lo"]].astype(DIGEST)
+            queries = digests[rows][["hi", "lo"]].astype(DIGEST)
+            found = np.searchsorted(keys, queries)
+            valid = found < len(entries)
+            hits = np.zeros(len(rows), dtype=bool)
+            hits[valid] = keys[found[valid]] == queries[valid]
+            result[rows[hits]] = entries["ref"][found[hits]]
+
+        return result
+
+    def close(self):
+        """
+        Removes the spilled runs. The spill directory is removed if it was created by the index.
+        """
+        for runs in self.runs:
+            for path in runs:
+                if os.path.exists(path):
+                    os.remove(path)
+        if self.owns_spill_dir and self.spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+        self.buffers = [[] for _ in range(self.num_partitions)]
+        self.runs = [[] for _ in range(self.num_partitions)]
+        self.buffered = 0
+        self.size = 0
+
+
+def sort_entries(entries: np.ndarray) -> np.ndarray:
+    """
+    Sorts entries by digest, then by reference.
+    """
+    return entries[np.lexsort((entries["ref"], entries["lo"], entries["hi"]))]
@@ -0,0 +1,77 @@
+from itertools import chain
+from operator import itemgetter
+from typing import Iterable, Sequence
+
+# Spans are `[start, end, ...]` sequences with inclusive ends, as produced by taggers.
+# Any values after the end are ignored.
+Span = Sequence
+
+
+def union(*span_sets: Iterable[Span]) -> list[list[int]]:
+    """
+    Merges spans into sorted, disjoint ranges. Overlapping and adjacent spans are combined.
+
+    Args:
+        *span_sets (Iterable[Span]): The sets of spans to merge.
+
+    Returns:
+        list[list[int]]: The sorted `[start, end]` ranges covered by any span.
+    """
+    result: list[list[int]] = []
+    for span in sorted(chain.from_iterable(span_sets), key=itemgetter(0)):
+        start, end = span[0], span[1]
+        if end < start:
+            continue
+        if result and start <= result[-1][1] + 1:
+            result[-1][1] = max(result[-1][1], end)
+        else:
+            result.append([start, end])
+
+    return result
+
+
+def intersection(a: Iterable[Span], b: Iterable[Span]) -> list[list[int]]:
+    """
+    Returns the sorted, disjoint ranges covered by both sets of spans.
+    """
+    a_ranges, b_ranges = union(a), union(b)
+    result: list[list[int]] = []
+    i = j = 0
+    while i < len(a_ranges) and j < len(b_ranges):
+        start = max(a_ranges[i][0], b_ranges[j][0])
+        end = min(a_ranges[i][1], b_ranges[j][1])
+        if start <= end:
+            result.append([start, end])
+
+        # Advance the range that ends first
+        if a_ranges[i][1] < b_ranges[j][1]:
+            i += 1
+        else:
+            j += 1
+
+    return result
+
+
+def difference(a: Iterable[Span], b: Iterable[Span]) -> list[list[int]]:
+    """
+    Returns the sorted, disjoint ranges covered by the first set of spans but not the second.
+    """
+    b_ranges = union(b)
+    result: list[list[int]] = []
+    j = 0
+    for start, end in union(a):
+        # Skip excluded ranges that end before this range
+        while j < len(b_ranges) and b_ranges[j][1] < start:
+            j += 1
+
+        k = j
+        while k < len(b_ranges) and b_ranges[k][0] <= end:
+            if b_ranges[k][0] > start:
+                result.append([start, b_ranges[k][0] - 1])
+            start = b_ranges[k][1] + 1
+            k += 1
+
+        if start <= end:
+            result.append([start, end])
+
+    return result
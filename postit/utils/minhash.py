@@ -0,0 +1,172 @@
+import mmh3
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+from postit.utils.text import to_utf8
+from typing import Any, Optional
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_NUM_BANDS = 16
+DEFAULT_SHINGLE_SIZE = 5
+
+# Signature value of documents without shingles
+EMPTY = np.iinfo(np.uint32).max
+# Number of shingles hashed at a time, bounds memory to num_perm * CHUNK_SIZE * 8 bytes
+CHUNK_SIZE = 4096
+
+
+def odd_multipliers(size: int, seed: int) -> np.ndarray:
+    """
+    Returns random odd 64-bit multipliers, used to combine and permute hashes.
+    """
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 2**64, size=size, dtype=np.uint64) | np.uint64(1)
+
+
+def shingle_hashes(text: str, size: int = DEFAULT_SHINGLE_SIZE) -> np.ndarray:
+    """
+    Returns the 64-bit hashes of the word n-grams of a text.
+    Texts shorter than `size` words have a single shingle.
+    """
+    tokens = text.lower().split()
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+
+    hashes = np.array(
+        [mmh3.hash64(to_utf8(token), signed=False)[0] for token in tokens],
+        dtype=np.uint64,
+    )
+    size = min(size, len(hashes))
+    # Each position has its own multiplier, so shingles are order-sensitive
+    windows = sliding_window_view(hashes, size)
+    return (windows * odd_multipliers(size, seed=0)).sum(axis=1, dtype=np.uint64)
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of texts over their word shingles.
+    The matching fraction of two signatures estimates the Jaccard similarity of their shingle sets.
+
+    Permutations are multiply-shift hashes on 64 bits, applied to all shingles at once with NumPy.
+
+    Attributes:
+        num_perm (int): The number of permutations, the length of a signature.
+        shingle_size (int): The number of words in a shingle.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = DEFAULT_NUM_PERM,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        seed: int = 1,
+    ):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = odd_multipliers(num_perm, seed)[:, None]
+        self.b = np.random.default_rng(seed + 1).integers(
+            0, 2**64, size=(num_perm, 1), dtype=np.uint64
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Returns the signature of a text. Texts without words have an EMPTY signature.
+        """
+        signature = np.full(self.num_perm, EMPTY, dtype=np.uint64)
+        shingles = shingle_hashes(text, self.shingle_size)
+        for start in range(0, len(shingles), CHUNK_SIZE):
+            chunk = shingles[start : start + CHUNK_SIZE]
+            permuted = (self.a * chunk + self.b) >> np.uint64(32)
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+
+        return signature.astype(np.uint32)
+
+    def signatures(self, texts: list[str]) -> np.ndarray:
+        """
+        Returns the signatures of a list of texts, one row per text.
+        """
+        if not texts:
+            return np.empty((0, self.num_perm), dtype=np.uint32)
+        return np.stack([self.signature(text) for text in texts])
+
+
+def jaccard(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """
+    Returns the Jaccard similarity estimated between a signature and each row of others.
+    """
+    return (others == signature).mean(axis=-1)
+
+
+class LSHIndex:
+    """
+    A banded locality-sensitive hashing index of MinHash signatures.
+
+    Signatures are split into `num_bands` bands of `num_perm / num_bands` rows.
+    Signatures that share any band are candidates, and are compared by their estimated Jaccard similarity.
+    Pairs with similarity s are candidates with probability 1 - (1 - s^rows)^bands.
+
+    Attributes:
+        num_perm (int): The length of the signatures.
+        num_bands (int): The number of bands. Must divide num_perm.
+    """
+
+    def __init__(
+        self, num_perm: int = DEFAULT_NUM_PERM, num_bands: int = DEFAULT_NUM_BANDS
+    ):
+        if num_bands <= 0 or num_perm % num_bands:
+            raise ValueError(
+                "The number of bands must divide the number of permutations."
+            )
+
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        self.rows = num_perm // num_bands
+        self.multipliers = odd_multipliers(self.rows, seed=2)
+        self.buckets: list[dict[int, list[int]]] = [{} for _ in range(num_bands)]
+        self.keys: list[Any] = []
+        self.signatures: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        Returns the bucket key of each band of each signature. (n, num_bands)
+        """
+        bands = signatures.reshape(-1, self.num_bands, self.rows).astype(np.uint64)
+        return (bands * self.multipliers).sum(axis=2, dtype=np.uint64)
+
+    def add(
+        self, key: Any, signature: np.ndarray, band_keys: Optional[np.ndarray] = None
+    ):
+        """
+        Adds a signature to the index under a key.
+        """
+        if band_keys is None:
+            band_keys = self.band_keys(signature)[0]
+
+        position = len(self.keys)
+        self.keys.append(key)
+        self.signatures.append(signature)
+        for buckets, band_key in zip(self.buckets, band_keys.tolist()):
+            buckets.setdefault(band_key, []).append(position)
+
+    def query(
+        self, signature: np.ndarray, band_keys: Optional[np.ndarray] = None
+    ) -> tuple[Any, float]:
+        """
+        Returns the key of the most similar candidate and its estimated Jaccard similarity.
+        Returns (None, 0.0) when no indexed signature shares a band.
+        """
+        if band_keys is None:
+            band_keys = self.band_keys(signature)[0]
+
+        candidates: set[int] = set()
+        for buckets, band_key in zip(self.buckets, band_keys.tolist()):
+            candidates.update(buckets.get(band_key, ()))
+        if not candidates:
+            return None, 0.0
+
+        positions = sorted(candidates)
+        scores = jaccard(signature, np.stack([self.signatures[i] for i in positions]))
+        best = int(np.argmax(scores))
+        return self.keys[positions[best]], float(scores[best])
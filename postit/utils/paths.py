@@ -1,5 +1,7 @@
 import os
 
+from postit.files import Compression
+
 
 def get_documents_path(path: str) -> str:
     segments = path.split(os.sep)
@@ -12,6 +14,32 @@ def get_documents_path(path: str) -> str:
     return os.sep.join(segments[: seg_idx + 1])
 
 
+def get_tags_path(path: str, experiment: str) -> str:
+    """
+    Returns the path of the tags of an experiment for a documents file.
+    Tags are stored in a `tags/<experiment>` directory adjacent to the `documents` directory.
+    """
+    return path.replace("documents", f"tags/{experiment}")
+
+
+def split_compression(path: str) -> tuple[str, str]:
+    """
+    Splits a path into the path of the uncompressed file and its compression extension, e.g. `.zst`.
+    The extension is empty for uncompressed files.
+    """
+    ext = Compression.from_path(path).value
+    if not ext:
+        return path, ""
+    return path[: -len(ext)], ext
+
+
+def strip_ext(path: str) -> str:
+    """
+    Returns a path without its extension, including the compression extension of compressed files.
+    """
+    return os.path.splitext(split_compression(path)[0])[0]
+
+
 def get_ext(path: str) -> str:
     return os.path.splitext(path)[1]
 
@@ -0,0 +1,118 @@
+import threading
+
+from postit.files import FileClient
+from typing import IO, Optional
+
+DEFAULT_SHARD_SIZE = 1 << 28  # 256 MiB
+
+
+class ShardWriter:
+    """
+    Writes lines to a sequence of shard files, starting a new shard when the current one is full.
+    Shards are named `<prefix>-00000<ext>`, `<prefix>-00001<ext>`, etc.
+
+    Attributes:
+        file_client (FileClient): The file client used to open shards.
+        prefix (str): The path prefix of the shards.
+        max_size (int): The maximum size of a shard in bytes, before compression. A single line larger than this gets its own shard.
+        ext (str): The extension of the shards.
+        paths (list[str]): The paths of the shards written so far.
+    """
+
+    def __init__(
+        self,
+        file_client: FileClient,
+        prefix: str,
+        max_size: int = DEFAULT_SHARD_SIZE,
+        ext: str = ".jsonl",
+    ):
+        if max_size <= 0:
+            raise ValueError("The maximum shard size must be positive.")
+
+        self.file_client = file_client
+        self.prefix = prefix
+        self.max_size = max_size
+        self.ext = ext
+        self.paths: list[str] = []
+        self.file: Optional[IO] = None
+        self.size = 0
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, line: str) -> None:
+        """
+        Writes a line, including its trailing newline, to the current shard.
+        """
+        size = len(line.encode("utf-8"))
+        if self.file is None or (self.size and self.size + size > self.max_size):
+            self.open_next()
+
+        assert self.file is not None
+        self.file.write(line)
+        self.size += size
+
+    def open_next(self) -> None:
+        self.close()
+        path = f"{self.prefix}-{len(self.paths):05d}{self.ext}"
+        self.file = self.file_client.open(path, "w")
+        self.paths.append(path)
+        self.size = 0
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class OrderedWriter:
+    """
+    Writes the outputs of several inputs to one file, in the order of the inputs, as the outputs complete.
+    Outputs that complete before the outputs of earlier inputs wait in memory. Safe to call from several threads.
+    The file is created with the first output, and closed once every input is written.
+
+    Attributes:
+        file_client (FileClient): The file client used to open the file.
+        path (str): The path of the file.
+        keys (list[str]): The inputs, in the order their outputs are written.
+    """
+
+    def __init__(self, file_client: FileClient, path: str, keys: list[str]):
+        self.file_client = file_client
+        self.path = path
+        self.keys = keys
+        self.file: Optional[IO] = None
+        self.position = 0
+        self.pending: dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "OrderedWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, key: str, output: str) -> None:
+        """
+        Writes the output of an input, after the outputs of the inputs before it.
+        """
+        with self.lock:
+            self.pending[key] = output
+            while (
+                self.position < len(self.keys)
+                and self.keys[self.position] in self.pending
+            ):
+                if self.file is None:
+                    self.file = self.file_client.open(self.path, "w")
+                self.file.write(self.pending.pop(self.keys[self.position]))
+                self.position += 1
+            if self.position == len(self.keys):
+                self.close()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,66 @@
+import numpy as np
+
+from postit.types import Doc
+from typing import Union
+
+# Characters removed by str.strip() from ASCII text
+ASCII_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+# Whether each code point is whitespace for str.split(). No code point above U+3000 is.
+WHITESPACE = np.array([chr(code).isspace() for code in range(0x3001)])
+
+
+def to_utf8(text: Union[str, bytes]) -> bytes:
+    """
+    Returns the UTF-8 bytes of a text, keeping lone surrogates, which JSON strings can hold.
+    NOTE: mmh3 crashes on strings with lone surrogates, so strings are encoded before hashing.
+    """
+    if isinstance(text, str):
+        return text.encode("utf-8", "surrogatepass")
+    return text
+
+
+def normalize(text: str) -> str:
+    """
+    Normalizes a text for deduplication. Surrounding whitespace is removed and the text is lowercased.
+    """
+    return text.strip().lower()
+
+
+def normalize_paragraphs(doc: Doc) -> list[Union[str, bytes]]:
+    """
+    Returns the normalized text of each paragraph of a document, as with normalize().
+
+    ASCII documents are lowercased and encoded once, then split into bytes paragraphs.
+    No intermediate strings are created, and hashing the bytes gives the same digest as hashing the string.
+    Other documents fall back to normalizing each paragraph as a string.
+    """
+    content = doc.content
+    if not content.isascii():
+        return [normalize(paragraph) for paragraph in content.split("\n")]
+
+    buffer = content.lower().encode("ascii")
+    return [paragraph.strip(ASCII_WHITESPACE) for paragraph in buffer.split(b"\n")]
+
+
+def code_points(text: str) -> np.ndarray:
+    """
+    Returns the code point of each character of a text, as uint8 for ASCII text and uint32 otherwise.
+    """
+    if text.isascii():
+        return np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+
+
+def word_starts(codes: np.ndarray) -> np.ndarray:
+    """
+    Returns whether each character starts a word, with words delimited as in str.split().
+    """
+    if codes.dtype == np.uint8:
+        space = WHITESPACE[codes]
+    else:
+        space = WHITESPACE[np.minimum(codes, len(WHITESPACE) - 1)]
+        space &= codes < len(WHITESPACE)
+
+    starts = ~space
+    starts[1:] &= space[:-1]
+    return starts
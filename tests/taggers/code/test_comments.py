@@ -3,7 +3,6 @@ import pytest
 from postit.taggers.code.comments import CodeComments, CodeLicenses
 from postit.tagging import TagResult
 from postit.types import Doc
-from unittest.mock import patch
 
 
 @pytest.fixture
@@ -139,8 +138,7 @@ def test_mixed_content(code_comments):
 ######################
 
 
-@patch.object(CodeLicenses, "imports", new_callable=dict)
-def test_license_in_comments(mock_imports, code_licenses):
+def test_license_in_comments(code_licenses):
     content = """
 // Just a regular comment
 /* Copyright 2024 Brennen. All rights reserved. */
@@ -148,9 +146,9 @@ def test_license_in_comments(mock_imports, code_licenses):
     doc = Doc(id=1, source="test_license.py", content=content)
 
     # Mock the result of code_comments
-    mock_imports["code_comments/comments"] = {doc.id: [[0, 25, 1], [26, 77, 1]]}
+    imports = {"code_comments/comments": [[0, 25, 1], [26, 77, 1]]}
 
-    result = code_licenses.tag(doc)
+    result = code_licenses.tag(doc, imports=imports)
 
     assert isinstance(result, TagResult)
     assert len(result.tags) == 1
@@ -164,8 +162,7 @@ def test_license_in_comments(mock_imports, code_licenses):
     )
 
 
-@patch.object(CodeLicenses, "imports", new_callable=dict)
-def test_no_license_comments(mock_imports, code_licenses):
+def test_no_license_comments(code_licenses):
     content = """
     # Just a regular comment
     // Another comment without legal terms
@@ -173,18 +170,17 @@ def test_no_license_comments(mock_imports, code_licenses):
     doc = Doc(id=2, source="test_no_license.py", content=content)
 
     # Mock the result of code_comments
-    mock_imports["code_comments/comments"] = {
-        doc.id: [(0, 24, 1), (25, 61, 1)]  # Indexes of the comments
+    imports = {
+        "code_comments/comments": [(0, 24, 1), (25, 61, 1)]  # Indexes of the comments
     }
 
-    result = code_licenses.tag(doc)
+    result = code_licenses.tag(doc, imports=imports)
 
     assert isinstance(result, TagResult)
     assert len(result.tags) == 0
 
 
-@patch.object(CodeLicenses, "imports", new_callable=dict)
-def test_mixed_license_comments(mock_imports, code_licenses):
+def test_mixed_license_comments(code_licenses):
     content = """
 // General comment
 /* This software is licensed under the MIT License. */
@@ -194,11 +190,15 @@ var x = 10;
     doc = Doc(id=3, source="test_mixed_license.py", content=content)
 
     # Mock the result of code_comments
-    mock_imports["code_comments/comments"] = {
-        doc.id: [[0, 18, 1], [19, 74, 1], [86, 112, 1]]  # Indexes of the comments
+    imports = {
+        "code_comments/comments": [
+            [0, 18, 1],
+            [19, 74, 1],
+            [86, 112, 1],
+        ]  # Indexes of the comments
     }
 
-    result = code_licenses.tag(doc)
+    result = code_licenses.tag(doc, imports=imports)
 
     assert isinstance(result, TagResult)
     assert len(result.tags) == 2
@@ -215,3 +215,28 @@ var x = 10;
         doc.content[result.tags[1].start : result.tags[1].end].strip()
         == "// Copyright 2024 Brennen"
     )
+
+
+def test_license_in_same_pass(code_licenses):
+    content = "// Copyright 2024 Brennen\nx = 1"
+    doc = Doc(id=4, source="test_same_pass.py", content=content)
+
+    # Tags of code_comments from the same run are read from the document
+    doc.tags["code_comments/comments"] = [[0, 25, 1]]
+    result = code_licenses.tag(doc, imports={"code_comments/comments": []})
+
+    assert len(result.tags) == 1
+    assert doc.content[result.tags[0].start : result.tags[0].end] == content[:25]
+
+
+def test_pattern_cached_per_class(code_comments):
+    class SqlComments(CodeComments):
+        name = "sql_comments"
+        single_line_symbols = ["--"]
+
+    assert CodeComments.get_pattern() is code_comments.get_pattern()
+    assert SqlComments.get_pattern() is not CodeComments.get_pattern()
+
+    doc = Doc(id=0, source="test.sql", content="SELECT 1; -- comment\n# not a comment")
+    result = SqlComments().tag(doc)
+    assert [doc.content[tag.start : tag.end] for tag in result.tags] == ["-- comment"]
@@ -1,3 +1,6 @@
+import json
+import pytest
+
 from postit.registry import TaggerRegistry
 from postit.tagging import TagResult
 from postit.types import Doc, File, FloatTag
@@ -67,3 +70,23 @@ def test_num_docs():
     assert len(result.tags) == 1
     assert isinstance(result.tags[0], FloatTag)
     assert result.tags[0].value == len(file.content)
+
+
+@pytest.mark.parametrize("name", ["doc_length", "paragraph_length", "doc_lines"])
+def test_tag_batch_matches_tag(name):
+    contents = [
+        "Paragraph one.\nParagraph two.",
+        "",
+        "\n\n  spaced\twords \x1cand\xa0more\n",
+        "Héllo wörld\u3000again\nlast line",
+    ]
+    docs = [
+        Doc(id=i, source="/test/path.py", content=c) for i, c in enumerate(contents)
+    ]
+    tagger = TaggerRegistry.get(name)()
+
+    assert tagger.batched
+    assert tagger.tag_batch([]) == []
+    # Values keep their types, so the JSON output is the same
+    expected = [tagger.run_tagger(doc) for doc in docs]
+    assert json.dumps(tagger.run_batch(docs)) == json.dumps(expected)
@@ -0,0 +1,263 @@
+import json
+import pytest
+
+from postit.deduper import Deduper
+from postit.utils.bloom import ScalableBloomFilter, load_bloom_filter
+
+
+@pytest.fixture
+def documents(tmp_path):
+    documents_path = tmp_path / "documents"
+    documents_path.mkdir()
+    for name in ["a", "b", "c", "d"]:
+        with open(documents_path / f"{name}.jsonl", "w") as file:
+            for i in range(3):
+                doc = {"id": i, "source": f"{name}{i}", "content": f"doc {i}"}
+                file.write(json.dumps(doc) + "\n")
+    return tmp_path
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_dedupe_backends(documents, backend):
+    Deduper.dedupe(
+        glob_paths=[f"{documents}/documents/*"],
+        experiment=backend,
+        dedupe_docs=True,
+        num_processes=4,
+        backend=backend,
+    )
+
+    duplicates = 0
+    for name in ["a", "b", "c", "d"]:
+        with open(f"{documents}/tags/{backend}/{name}.jsonl") as file:
+            for line in file.read().splitlines()[1:]:
+                duplicates += "doc_dedupe/duplicate" in json.loads(line)["tags"]
+
+    # Every document appears in each file, only the first occurrence is kept
+    assert duplicates == 9
+
+
+def test_dedupe_paragraphs(tmp_path):
+    documents_path = tmp_path / "documents"
+    documents_path.mkdir()
+    with open(documents_path / "a.jsonl", "w") as file:
+        for i, content in enumerate(["one\ntwo\none", "two\nthree"]):
+            file.write(json.dumps({"id": i, "source": "a", "content": content}) + "\n")
+
+    Deduper.dedupe(glob_paths=[f"{documents_path}/*"], dedupe_paragraphs=True)
+
+    with open(f"{tmp_path}/tags/dedupe/a.jsonl") as file:
+        tags = [json.loads(line)["tags"] for line in file.read().splitlines()[1:]]
+    assert tags[0] == {"paragraph_dedupe/duplicate": [[8, 11, 1]]}
+    assert tags[1] == {"paragraph_dedupe/duplicate": [[0, 3, 1]]}
+
+
+def test_dedupe_lone_surrogates(tmp_path):
+    documents_path = tmp_path / "documents"
+    documents_path.mkdir()
+    # Truncated emojis leave lone surrogates in the decoded content
+    content = "emoji \ud83d\nsecond \udc00\nsecond \udc00"
+    with open(documents_path / "a.jsonl", "w") as file:
+        file.write(json.dumps({"id": 0, "source": "a", "content": content}) + "\n")
+
+    Deduper.dedupe(
+        glob_paths=[f"{documents_path}/*"], dedupe_paragraphs=True, dedupe_near=True
+    )
+
+    with open(f"{tmp_path}/tags/dedupe/a.jsonl") as file:
+        tags = [json.loads(line)["tags"] for line in file.read().splitlines()[1:]]
+    assert tags[0]["paragraph_dedupe/duplicate"] == [[17, 25, 1]]
+
+
+def test_dedupe_bloom_file(documents):
+    bloom_file = f"{documents}/filter.bloom"
+    for experiment in ["first", "second"]:
+        Deduper.dedupe(
+            glob_paths=[f"{documents}/documents/a.jsonl"],
+            experiment=experiment,
+            dedupe_docs=True,
+            bloom_file=bloom_file,
+            num_processes=2,
+            backend="process",
+        )
+
+    # The second run loads the saved filter, so every document is a duplicate
+    with open(f"{documents}/tags/second/a.jsonl") as file:
+        tags = [json.loads(line)["tags"] for line in file.read().splitlines()[1:]]
+    assert all("doc_dedupe/duplicate" in doc_tags for doc_tags in tags)
+
+
+def test_dedupe_bloom_file_failed_run(documents):
+    bloom_file = f"{documents}/filter.bloom"
+    Deduper.dedupe(
+        glob_paths=[f"{documents}/documents/a.jsonl"],
+        dedupe_docs=True,
+        bloom_file=bloom_file,
+    )
+
+    new_documents = documents / "new"
+    new_documents.mkdir()
+    with open(new_documents / "e.jsonl", "w") as file:
+        file.write(json.dumps({"id": 0, "source": "e0", "content": "new doc"}) + "\n")
+    with open(new_documents / "f.jsonl", "w") as file:
+        file.write("not json\n")
+
+    with pytest.raises(ValueError):
+        Deduper.dedupe(
+            glob_paths=[f"{new_documents}/*"],
+            experiment="failed",
+            dedupe_docs=True,
+            bloom_file=bloom_file,
+        )
+
+    # The failed run did not save the documents it saw
+    bloom = load_bloom_filter(bloom_file)
+    assert "new doc" not in bloom
+    assert "doc 0" in bloom
+    bloom.close()
+
+
+def test_dedupe_bloom_file_extension(documents):
+    with pytest.raises(ValueError):
+        Deduper.dedupe(
+            glob_paths=[f"{documents}/documents/*"],
+            dedupe_docs=True,
+            bloom_file=f"{documents}/filter.pkl",
+        )
+
+
+def test_dedupe_scalable_bloom(documents):
+    Deduper.dedupe(
+        glob_paths=[f"{documents}/documents/*"],
+        dedupe_docs=True,
+        bloom_size=2,
+        bloom_file=f"{documents}/filter.bloom",
+        scalable_bloom=True,
+    )
+
+    duplicates = 0
+    for name in ["a", "b", "c", "d"]:
+        with open(f"{documents}/tags/dedupe/{name}.jsonl") as file:
+            for line in file.read().splitlines()[1:]:
+                duplicates += "doc_dedupe/duplicate" in json.loads(line)["tags"]
+    assert duplicates == 9
+
+    bloom = load_bloom_filter(f"{documents}/filter.bloom")
+    assert isinstance(bloom, ScalableBloomFilter)
+    bloom.close()
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_dedupe_exact(documents, backend):
+    Deduper.dedupe(
+        glob_paths=[f"{documents}/documents/*"],
+        dedupe_exact=True,
+        num_processes=2,
+        backend=backend,
+    )
+
+    tags = {}
+    for name in ["a", "b", "c", "d"]:
+        with open(f"{documents}/tags/dedupe/{name}.jsonl") as file:
+            lines = file.read().splitlines()[1:]
+            tags[name] = [json.loads(line)["tags"] for line in lines]
+
+    # Documents of the first file are kept, every other copy matches them
+    kept = [name for name in tags if tags[name] == [{}, {}, {}]]
+    assert len(kept) == 1
+    for name in tags.keys() - kept:
+        for i, doc_tags in enumerate(tags[name]):
+            assert doc_tags["exact_dedupe/duplicate"] == [[0, 5, 1]]
+            assert doc_tags["exact_dedupe/match"] == [
+                [0, 5, f"{documents}/documents/{kept[0]}.jsonl:{i}"]
+            ]
+
+
+def test_dedupe_near(tmp_path):
+    base = " ".join(f"word{i}" for i in range(100))
+    contents = [base, "something else", base.replace("word50", "other"), base + "!"]
+    documents_path = tmp_path / "documents"
+    documents_path.mkdir()
+    with open(documents_path / "a.jsonl", "w") as file:
+        for i, content in enumerate(contents):
+            file.write(json.dumps({"id": i, "source": "a", "content": content}) + "\n")
+
+    Deduper.dedupe(
+        glob_paths=[f"{documents_path}/*"],
+        dedupe_near=True,
+        dedupe_exact=True,
+        backend="process",
+    )
+
+    with open(f"{tmp_path}/tags/dedupe/a.jsonl") as file:
+        tags = [json.loads(line)["tags"] for line in file.read().splitlines()[1:]]
+    assert tags[0] == tags[1] == {}
+
+    # Near-duplicates are tagged with their estimated similarity
+    (start, end, score), *_ = tags[2]["near_dedupe/duplicate"]
+    assert (start, end) == (0, len(contents[2]))
+    assert 0.8 < score < 1
+    assert tags[2]["near_dedupe/match"] == [[0, end, f"{documents_path}/a.jsonl:0"]]
+    assert "exact_dedupe/duplicate" not in tags[2]
+    assert tags[3]["near_dedupe/duplicate"][0][2] > 0.8
+
+
+def read_tags(path) -> list[dict]:
+    with open(path) as file:
+        return [json.loads(line)["tags"] for line in file.read().splitlines()[1:]]
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_dedupe_deterministic(tmp_path, backend):
+    documents_path = tmp_path / "documents"
+    documents_path.mkdir()
+    # Within a file, the document with the lowest id is kept, whatever its position
+    files = {
+        "b": [(2, "x\nshared"), (1, "x"), (0, "y")],
+        "a": [(5, "y"), (3, "z\nshared")],
+    }
+    for name, docs in files.items():
+        with open(documents_path / f"{name}.jsonl", "w") as file:
+            for doc_id, content in docs:
+                doc = {"id": doc_id, "source": name, "content": content}
+                file.write(json.dumps(doc) + "\n")
+
+    for _ in range(2):
+        Deduper.dedupe(
+            glob_paths=[f"{documents_path}/*"],
+            dedupe_docs=True,
+            dedupe_paragraphs=True,
+            deterministic=True,
+            num_processes=4,
+            backend=backend,
+            bloom_file=f"{tmp_path}/filter.bloom",
+            experiment="first",
+        )
+        assert read_tags(f"{tmp_path}/tags/first/a.jsonl") == [{}, {}]
+        assert read_tags(f"{tmp_path}/tags/first/b.jsonl") == [
+            {"paragraph_dedupe/duplicate": [[0, 1, 1], [2, 8, 1]]},
+            {},
+            {
+                "doc_dedupe/duplicate": [[0, 1, 1]],
+                "paragraph_dedupe/duplicate": [[0, 1, 1]],
+            },
+        ]
+        # Start the second run from a new bloom filter
+        (tmp_path / "filter.bloom").unlink()
+
+    # Documents held by an existing bloom filter are duplicates
+    Deduper.dedupe(
+        glob_paths=[f"{documents_path}/a.jsonl"],
+        dedupe_docs=True,
+        bloom_file=f"{tmp_path}/filter.bloom",
+        experiment="first",
+    )
+    Deduper.dedupe(
+        glob_paths=[f"{documents_path}/*"],
+        dedupe_docs=True,
+        deterministic=True,
+        bloom_file=f"{tmp_path}/filter.bloom",
+        experiment="second",
+    )
+    a_tags = read_tags(f"{tmp_path}/tags/second/a.jsonl")
+    assert all("doc_dedupe/duplicate" in tags for tags in a_tags)
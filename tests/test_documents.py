@@ -1,3 +1,5 @@
+import json
+import os
 import pytest
 
 from postit.documents import DocumentGenerator, get_top_folder
@@ -42,7 +44,11 @@ def test_documents_generator(mock_file_client_cls):
 
     mock_file_client_root.glob.return_value = ["subfolder"]
     mock_file_client_subfolder.glob.return_value = ["file1", "file2"]
-    mock_file_client_subfolder.read.side_effect = ["content1", "content2"]
+    mock_file_client_subfolder.info.return_value = [{"type": "file", "size": 8}] * 2
+    mock_file_client_subfolder.cat.return_value = {
+        "file1": b"content1",
+        "file2": b"content2",
+    }
     mock_file_client_subfolder.get_file_count.return_value = 2
 
     DocumentGenerator.generate(["root"], "output", keep_raw=False)
@@ -50,11 +56,111 @@ def test_documents_generator(mock_file_client_cls):
     mock_file_client_cls.get_for_target.assert_any_call("root")
     mock_file_client_cls.get_for_target.assert_any_call("output")
 
-    expected_output = (
-        '{"id": 0, "source": "file1", "content": "content1"}\n'
-        '{"id": 1, "source": "file2", "content": "content2"}\n'
-    )
-    mock_file_client_output.write.assert_called_with(
-        "output/subfolder.jsonl", expected_output
+    mock_file_client_output.open.assert_called_once_with(
+        "output/subfolder-00000.jsonl", "w"
     )
+    out_file = mock_file_client_output.open.return_value.__enter__.return_value
+    lines = [call.args[0] for call in out_file.write.call_args_list]
+    assert all(line.endswith("\n") for line in lines)
+    assert [json.loads(line) for line in lines] == [
+        {"id": 0, "source": "file1", "content": "content1"},
+        {"id": 1, "source": "file2", "content": "content2"},
+    ]
     mock_file_client_subfolder.remove.assert_called_with("subfolder")
+    mock_file_client_subfolder.cat.assert_called_once_with(["file1", "file2"])
+
+
+def read_shard(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_documents_generator_shards(tmp_path, backend):
+    raw = tmp_path / "raw"
+    (raw / "big" / "nested").mkdir(parents=True)
+    (raw / "small").mkdir()
+    for i in range(5):
+        (raw / "big" / f"file{i}.txt").write_text(f"document {i}")
+    (raw / "big" / "nested" / "file5.txt").write_text("x" * 100)
+    (raw / "small" / "file.txt").write_text("small")
+
+    output = tmp_path / "documents"
+    DocumentGenerator.generate(
+        [f"{raw}/*"],
+        str(output),
+        num_processes=2,
+        backend=backend,
+        max_shard_size=20,
+    )
+
+    assert sorted(os.listdir(output)) == [
+        "big-00000.jsonl",
+        "big-00001.jsonl",
+        "big-00002.jsonl",
+        "big-00003.jsonl",
+        "small-00000.jsonl",
+    ]
+    docs = [
+        doc
+        for name in sorted(os.listdir(output))
+        if name.startswith("big")
+        for doc in read_shard(output / name)
+    ]
+    # Ids follow the folder listing, the larger file gets its own shard
+    assert [doc["id"] for doc in docs] == sorted(doc["id"] for doc in docs)
+    assert len(docs) == 6
+    assert len(read_shard(output / "big-00003.jsonl")) == 1
+    assert read_shard(output / "small-00000.jsonl")[0]["content"] == "small"
+    assert (raw / "big").exists()
+
+
+def test_documents_generator_duplicate_names(tmp_path):
+    for parent in ["first", "second"]:
+        (tmp_path / parent / "raw").mkdir(parents=True)
+        (tmp_path / parent / "raw" / "file.txt").write_text(parent)
+
+    # Folders with the same name would be written to the same shards
+    with pytest.raises(ValueError, match="same shards"):
+        DocumentGenerator.generate(
+            [f"{tmp_path}/first/raw", f"{tmp_path}/second/raw"],
+            f"{tmp_path}/documents",
+        )
+
+    # A folder matched by several patterns is generated once
+    DocumentGenerator.generate(
+        [f"{tmp_path}/first/raw", f"{tmp_path}/first/*"], f"{tmp_path}/documents"
+    )
+    assert os.listdir(tmp_path / "documents") == ["raw-00000.jsonl"]
+
+
+def test_documents_generator_rejected_folder(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for name in ["a.txt", "b.txt"]:
+        (raw / name).write_text(name)
+
+    processor = DocumentGenerator(f"{tmp_path}/documents", max_shard_size=1)
+    processor.shards[f"{tmp_path}/documents/raw-00001.jsonl"] = ("other/raw", [])
+
+    # A folder is rejected as a whole, none of its shards are added
+    with pytest.raises(ValueError, match="same shards"):
+        processor.add_folder(str(raw))
+    assert list(processor.shards) == [f"{tmp_path}/documents/raw-00001.jsonl"]
+
+
+def test_documents_generator_broken_symlink(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "file.txt").write_text("content")
+    (raw / "link.txt").symlink_to(raw / "missing.txt")
+
+    DocumentGenerator.generate([str(raw)], f"{tmp_path}/documents")
+
+    docs = read_shard(tmp_path / "documents" / "raw-00000.jsonl")
+    assert [doc["content"] for doc in docs] == ["content"]
+
+
+def test_documents_generator_invalid_shard_size():
+    with pytest.raises(ValueError):
+        DocumentGenerator(max_shard_size=0)
@@ -1,4 +1,12 @@
-from postit.files import FileClient, GSFileClient, S3FileClient
+import asyncio
+import gzip
+import io
+import os
+import pytest
+
+from fsspec.asyn import AsyncFileSystem, get_loop
+from postit.files import Compression, FileClient, GSFileClient, S3FileClient
+from postit.processor import BaseProcessor
 from unittest import mock
 
 
@@ -29,6 +37,98 @@ def test_local_write(mock_makedirs, mock_open):
     mock_open().write.assert_called_once_with("file content")
 
 
+@mock.patch("builtins.open", new_callable=mock.mock_open)
+@mock.patch("os.makedirs")
+def test_local_open(mock_makedirs, mock_open):
+    client = FileClient()
+    client.open("/local/path", "rb")
+    mock_makedirs.assert_not_called()
+
+    client.open("/local/path", "w")
+    mock_makedirs.assert_called_once_with("/local", exist_ok=True)
+    mock_open.assert_called_with("/local/path", "w")
+
+
+def test_local_count_lines(tmp_path):
+    client = FileClient()
+    path = tmp_path / "lines.jsonl"
+
+    path.write_bytes(b"a\nb\nc\n")
+    assert client.count_lines(str(path)) == 3
+    assert client.count_lines(str(path), chunk_size=1) == 3
+
+    path.write_bytes(b"a\nb\nc")
+    assert client.count_lines(str(path)) == 3
+
+    path.write_bytes(b"")
+    assert client.count_lines(str(path)) == 0
+
+
+def test_compression_from_path():
+    assert Compression.from_path("documents/file.jsonl") == Compression.NONE
+    assert Compression.from_path("documents/file.jsonl.gz") == Compression.GZIP
+    assert Compression.from_path("documents/file.jsonl.zst") == Compression.ZSTD
+
+
+@pytest.mark.parametrize("ext", [".gz", ".zst"])
+def test_local_compressed(tmp_path, ext):
+    if ext == ".zst":
+        pytest.importorskip("zstandard")
+    client = FileClient()
+    path = f"{tmp_path}/sub/file.jsonl{ext}"
+    content = "".join(f'{{"id": {i}, "content": "é {i}"}}\n' for i in range(100))
+
+    client.write(path, content)
+    assert client.read(path) == content
+    with open(path, "rb") as file:
+        assert file.read() != content.encode()
+    with client.open(path, "rb") as file:
+        lines = list(file)
+    assert lines == [line.encode() + b"\n" for line in content.splitlines()]
+    assert client.count_lines(path) == 100
+
+    with client.open(path, "a") as file:
+        file.write("last\n")
+    with client.open(path, "r") as file:
+        assert file.read().splitlines()[-1] == "last"
+
+    client.write_bytes(path, b"\0" * 1000)
+    assert client.read_bytes(path) == b"\0" * 1000
+
+
+def test_local_gzip_interop(tmp_path):
+    client = FileClient()
+    path = f"{tmp_path}/file.jsonl.gz"
+    with gzip.open(path, "wt") as file:
+        file.write("a\nb\n")
+    assert client.read(path) == "a\nb\n"
+
+
+@mock.patch("postit.files.HAS_ZSTANDARD", False)
+def test_local_zstd_missing(tmp_path):
+    with pytest.raises(ImportError):
+        FileClient().write(f"{tmp_path}/file.jsonl.zst", "content")
+
+
+def test_local_batched(tmp_path):
+    client = FileClient()
+    contents = {
+        f"{tmp_path}/dir/file{i}.jsonl{ext}": b"a\n" * i
+        for i, ext in enumerate(["", ".gz"])
+    }
+    client.pipe(contents)
+
+    assert client.cat(list(contents)) == contents
+    missing = f"{tmp_path}/missing.jsonl"
+    with pytest.raises(FileNotFoundError):
+        client.cat([missing])
+    assert client.cat([*contents, missing], missing_ok=True) == contents
+
+    infos = client.info([f"{tmp_path}/dir", *contents])
+    assert [info["type"] for info in infos] == ["directory", "file", "file"]
+    assert infos[1]["size"] == 0
+
+
 @mock.patch("os.remove")
 def test_local_remove_file(mock_remove):
     client = FileClient()
@@ -87,3 +187,145 @@ def test_glob_gs(mock_gcs):
     result = client.glob("gs://bucket/*")
     mock_gcs.glob.assert_called_once_with("gs://bucket/*")
     assert result == ["gs://bucket/file1", "gs://bucket/file2"]
+
+
+@mock.patch.object(GSFileClient, "gcs")
+def test_gs_compressed(mock_gcs):
+    mock_gcs.open.return_value = io.BytesIO(gzip.compress(b"gs file content"))
+    client = GSFileClient()
+    assert client.read("gs://bucket/file.gz") == "gs file content"
+    mock_gcs.open.assert_called_once_with("gs://bucket/file.gz", "rb")
+
+    mock_gcs.open.return_value = mock.MagicMock()
+    client.write("gs://bucket/file.gz", "gs file content")
+    mock_gcs.open.assert_called_with("gs://bucket/file.gz", "wb")
+    mock_gcs.open.return_value.close.assert_called_once()
+
+
+@pytest.fixture
+def mock_gcs():
+    with mock.patch.object(GSFileClient, "gcs") as mock_gcs:
+        mock_gcs.loop = get_loop()
+        yield mock_gcs
+
+
+def test_gs_cat(mock_gcs):
+    async def cat_file(path):
+        if path.endswith("missing"):
+            raise FileNotFoundError(path)
+        return gzip.compress(b"content") if path.endswith(".gz") else b"content"
+
+    mock_gcs._cat_file = mock.AsyncMock(side_effect=cat_file)
+    client = GSFileClient()
+    paths = ["gs://bucket/file", "gs://bucket/file.gz"]
+    assert client.cat(paths) == {path: b"content" for path in paths}
+    assert client.cat([]) == {}
+
+    with pytest.raises(FileNotFoundError):
+        client.cat([*paths, "gs://bucket/missing"])
+    assert len(client.cat([*paths, "gs://bucket/missing"], missing_ok=True)) == 2
+
+
+def test_gs_pipe_and_info(mock_gcs):
+    mock_gcs._pipe_file = mock.AsyncMock()
+    mock_gcs._info = mock.AsyncMock(side_effect=lambda path: {"name": path, "size": 1})
+    client = GSFileClient()
+
+    client.pipe({"gs://bucket/file": b"content", "gs://bucket/file.gz": b"content"})
+    calls = mock_gcs._pipe_file.await_args_list
+    assert calls[0].args == ("gs://bucket/file", b"content")
+    assert gzip.decompress(calls[1].args[1]) == b"content"
+
+    infos = client.info(["gs://bucket/a", "gs://bucket/b"])
+    assert [info["name"] for info in infos] == ["gs://bucket/a", "gs://bucket/b"]
+
+
+def test_gs_max_concurrency(mock_gcs):
+    in_flight = []
+    peak = []
+
+    async def cat_file(path):
+        in_flight.append(path)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(path)
+        return b""
+
+    mock_gcs._cat_file = mock.AsyncMock(side_effect=cat_file)
+    client = GSFileClient(max_concurrency=3)
+    assert len(client.cat([f"gs://bucket/file{i}" for i in range(10)])) == 10
+    assert max(peak) == 3
+
+    with pytest.raises(ValueError):
+        GSFileClient(max_concurrency=0)
+
+
+def test_gs_get_file_count(mock_gcs):
+    mock_gcs.glob.return_value = {
+        "bucket/dir": {"type": "directory"},
+        "bucket/dir/file1": {"type": "file"},
+        "bucket/dir/file2": {"type": "file"},
+    }
+    assert GSFileClient().get_file_count("gs://bucket/**/*") == 2
+    mock_gcs.glob.assert_called_once_with("gs://bucket/**/*", detail=True)
+    mock_gcs.isfile.assert_not_called()
+
+
+@pytest.mark.skipif(
+    "STORAGE_EMULATOR_HOST" not in os.environ,
+    reason="Requires a fake GCS server, such as fake-gcs-server, at STORAGE_EMULATOR_HOST",
+)
+def test_gs_emulator():
+    client = GSFileClient(max_concurrency=4)
+    bucket = "postit-test"
+    if not client.gcs.exists(bucket):
+        client.gcs.mkdir(bucket)
+
+    contents = {
+        f"gs://{bucket}/dir/file{i}.jsonl{'.gz' if i % 2 else ''}": f"{i}\n".encode()
+        for i in range(10)
+    }
+    client.pipe(contents)
+
+    assert client.cat(list(contents)) == contents
+    assert client.cat([f"gs://{bucket}/missing"], missing_ok=True) == {}
+    assert all(info["type"] == "file" for info in client.info(list(contents)))
+    assert client.get_file_count(f"gs://{bucket}/dir/*") == 10
+    client.remove(f"gs://{bucket}/dir")
+
+
+class FakeGCSFileSystem(AsyncFileSystem):
+    cachable = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.pid = os.getpid()
+
+    async def _cat_file(self, path, **kwargs):
+        return f"{path} {self.pid}".encode()
+
+
+class CatProcessor(BaseProcessor):
+    def process(self, path: str) -> bytes:
+        return GSFileClient().cat([path])[path]
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_gs_worker_processes(monkeypatch, backend):
+    monkeypatch.setattr("gcsfs.GCSFileSystem", FakeGCSFileSystem)
+    monkeypatch.setattr(GSFileClient, "_gcs", None)
+
+    # The filesystem of the parent process is created first, and its event loop is not fork-safe
+    client = GSFileClient()
+    assert (
+        client.cat(["gs://bucket/a"])["gs://bucket/a"]
+        == f"gs://bucket/a {os.getpid()}".encode()
+    )
+
+    paths = [f"gs://bucket/file{i}" for i in range(4)]
+    outputs = CatProcessor(num_processes=2, backend=backend).run(paths)
+    for path, output in zip(paths, outputs):
+        content, pid = output.decode().split(" ")
+        assert content == path
+        assert (int(pid) == os.getpid()) == (backend == "thread")
+    assert client.gcs.pid == os.getpid()
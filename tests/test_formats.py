@@ -0,0 +1,225 @@
+import json
+import numpy as np
+import pytest
+
+from postit.files import FileClient
+from postit.formats import (
+    DocImports,
+    TagFormat,
+    TagReader,
+    TagTable,
+    compact_dtype,
+    read_tags,
+    read_tags_batch,
+    write_tags,
+)
+from postit.types import Doc, File
+from unittest.mock import patch
+
+
+@pytest.fixture
+def tagged_file():
+    doc1 = Doc(0, "source0", "content0")
+    doc1.tags = {
+        "tagger/int": [[0, 8, 8]],
+        "tagger/float": [[0, 4, 0.5], [5, 8, 1.25]],
+    }
+    doc2 = Doc(1, "source1", "content1")
+    doc2.tags = {"tagger/str": [[0, 8, "value"]], "tagger/int": [[1, 2, 3]]}
+    doc3 = Doc(2, "source2", "content2")
+    file = File("documents/file.jsonl", [doc1, doc2, doc3])
+    file.tags = {"file_tagger/total": [[0, 3, 3]]}
+    return file
+
+
+def assert_matches_file(table: TagTable, file: File):
+    assert table.source == file.source
+    assert table.file_tags == file.tags
+    assert len(table) == len(file.content)
+    assert list(table.iter_docs()) == [(doc.id, doc.tags) for doc in file.content]
+
+
+def test_tag_table_from_file(tagged_file):
+    table = TagTable.from_file(tagged_file)
+    assert table.names == ["tagger/int", "tagger/float", "tagger/str"]
+    assert table.strings == ["value"]
+    assert table.offsets.tolist() == [0, 3, 5, 5]
+    assert_matches_file(table, tagged_file)
+
+
+def test_tag_table_value_types(tagged_file):
+    table = TagTable.from_file(tagged_file)
+    tags = table.get_doc_tags(0)
+    assert isinstance(tags["tagger/int"][0][2], int)
+    assert isinstance(tags["tagger/float"][0][2], float)
+    assert isinstance(table.get_doc_tags(1)["tagger/str"][0][2], str)
+
+
+def test_tag_table_bytes_round_trip(tagged_file):
+    data = TagTable.from_file(tagged_file).to_bytes()
+    assert_matches_file(TagTable.from_bytes(data), tagged_file)
+
+
+def test_tag_table_bytes_large_values():
+    docs = [(2**40, {"tagger/value": [[-1, 2**33, -(2**40)], [0, 1, 1e300]]})]
+    table = TagTable.from_docs("source", {}, docs)
+    assert list(TagTable.from_bytes(table.to_bytes()).iter_docs()) == docs
+
+
+def test_tag_table_exact_integers():
+    docs = [(0, {"tagger/value": [[0, 1, 2**60 + 1], [1, 2, -(2**63)], [2, 3, 0.5]]})]
+    table = TagTable.from_docs("source", {}, docs)
+    assert table.get_value(0) == 2**60 + 1
+    assert list(TagTable.from_bytes(table.to_bytes()).iter_docs()) == docs
+
+    with pytest.raises(ValueError):
+        TagTable.from_docs("source", {}, [(0, {"tagger/value": [[0, 1, 2**64]]})])
+
+
+def test_tag_table_version_1(tagged_file, monkeypatch):
+    # Version 1 tables were written without the ints column
+    monkeypatch.setattr(TagTable, "VERSION", 1)
+    monkeypatch.setattr(TagTable, "COLUMNS", TagTable.COLUMNS[:-1])
+    data = TagTable.from_file(tagged_file).to_bytes()
+    monkeypatch.undo()
+
+    assert_matches_file(TagTable.from_bytes(data), tagged_file)
+
+
+@pytest.mark.parametrize(
+    "values, dtype",
+    [
+        ([], "u1"),
+        ([0, 255], "u1"),
+        ([0, 256], "<u2"),
+        ([-1, 127], "i1"),
+        ([-1, 2**31], "<i8"),
+        ([0.0, 3.0], "u1"),
+        ([0.5, 3.0], "<f8"),
+    ],
+)
+def test_compact_dtype(values, dtype):
+    assert compact_dtype(np.array(values, dtype=np.float64)) == np.dtype(dtype)
+
+
+def test_tag_table_from_jsonl(tagged_file):
+    assert_matches_file(TagTable.from_jsonl(tagged_file.get_tags()), tagged_file)
+
+
+def test_tag_table_invalid_bytes():
+    with pytest.raises(ValueError):
+        TagTable.from_bytes(b"\0" * 64)
+
+
+def test_tag_format_get_path():
+    path = "data/documents/file.jsonl"
+    assert TagFormat.JSONL.get_path(path, "exp") == "data/tags/exp/file.jsonl"
+    assert TagFormat.COLUMNAR.get_path(path, "exp") == "data/tags/exp/file.ptag"
+
+    # Compression extensions are kept
+    path = "data/documents/file.jsonl.zst"
+    assert TagFormat.JSONL.get_path(path, "exp") == "data/tags/exp/file.jsonl.zst"
+    assert TagFormat.COLUMNAR.get_path(path, "exp") == "data/tags/exp/file.ptag.zst"
+
+
+@pytest.mark.parametrize("tag_format", [TagFormat.JSONL, TagFormat.COLUMNAR])
+def test_write_and_read_tags(tmp_path, tagged_file, tag_format):
+    file_client = FileClient()
+    path = f"{tmp_path}/documents/file.jsonl"
+    tagged_file.source = path
+    write_tags(file_client, tag_format.get_path(path, "exp"), tagged_file, tag_format)
+
+    assert_matches_file(read_tags(file_client, path, "exp"), tagged_file)
+    if tag_format == TagFormat.JSONL:
+        with open(f"{tmp_path}/tags/exp/file.jsonl") as file:
+            assert json.loads(file.readline())["source"] == path
+
+
+def test_read_tags_batch(tmp_path, tagged_file):
+    file_client = FileClient()
+    path = f"{tmp_path}/documents/file.jsonl"
+    for experiment, tag_format in [("a", TagFormat.COLUMNAR), ("b", TagFormat.JSONL)]:
+        write_tags(
+            file_client,
+            tag_format.get_path(path, experiment),
+            tagged_file,
+            tag_format,
+        )
+
+    # Columnar tags of every experiment are fetched in one batch, then the missing ones as JSONL
+    with patch.object(file_client, "cat", wraps=file_client.cat) as cat:
+        tables = read_tags_batch(file_client, path, ["b", "a"])
+    assert cat.call_count == 2
+    for table in tables:
+        assert_matches_file(table, tagged_file)
+
+    with pytest.raises(FileNotFoundError):
+        read_tags_batch(file_client, path, ["a", "missing"])
+
+
+def test_read_tags_format(tmp_path, tagged_file):
+    file_client = FileClient()
+    path = f"{tmp_path}/documents/file.jsonl"
+    write_tags(file_client, TagFormat.JSONL.get_path(path, "exp"), tagged_file)
+    stale = File(tagged_file.source, tagged_file.content[:1])
+    write_tags(
+        file_client, TagFormat.COLUMNAR.get_path(path, "exp"), stale, TagFormat.COLUMNAR
+    )
+
+    # Columnar tags are preferred unless a format is given
+    assert len(read_tags(file_client, path, "exp")) == 1
+    assert_matches_file(
+        read_tags(file_client, path, "exp", TagFormat.JSONL), tagged_file
+    )
+    with pytest.raises(FileNotFoundError):
+        read_tags(file_client, path, "other", TagFormat.COLUMNAR)
+
+
+@pytest.mark.parametrize("tag_format", [TagFormat.JSONL, TagFormat.COLUMNAR])
+def test_tag_reader(tmp_path, tagged_file, tag_format):
+    file_client = FileClient()
+    path = f"{tmp_path}/documents/file.jsonl"
+    tagged_file.source = path
+    write_tags(file_client, tag_format.get_path(path, "exp"), tagged_file, tag_format)
+
+    with TagReader(file_client, path, "exp") as reader:
+        assert reader.source == path
+        assert reader.file_tags == tagged_file.tags
+        assert reader.get(0) == tagged_file.content[0].tags
+        reader.skip()
+        assert reader.get(2) == {}
+        assert reader.get(3) == {}
+
+
+@pytest.mark.parametrize("tag_format", [TagFormat.JSONL, TagFormat.COLUMNAR])
+def test_tag_reader_out_of_order(tmp_path, tagged_file, tag_format):
+    file_client = FileClient()
+    path = f"{tmp_path}/documents/file.jsonl"
+    write_tags(file_client, tag_format.get_path(path, "exp"), tagged_file, tag_format)
+
+    # Documents that are not on the expected line are looked up by id
+    with TagReader(file_client, path, "exp") as reader:
+        assert reader.get(1) == tagged_file.content[1].tags
+        assert reader.get(0) == tagged_file.content[0].tags
+        assert reader.get(5) == {}
+
+
+def test_doc_imports(tmp_path, tagged_file):
+    file_client = FileClient()
+    path = f"{tmp_path}/documents/file.jsonl"
+    write_tags(file_client, TagFormat.JSONL.get_path(path, "first"), tagged_file)
+    tagged_file.content[1].tags = {"tagger/int": [[0, 1, 10]]}
+    write_tags(file_client, TagFormat.JSONL.get_path(path, "second"), tagged_file)
+
+    readers = [TagReader(file_client, path, name) for name in ["first", "second"]]
+    first = DocImports(0, readers)
+    first.release()
+    assert dict(first) == {}
+
+    # Later experiments override earlier ones
+    second = DocImports(1, readers)
+    assert second["tagger/int"] == [[0, 1, 10]]
+    assert second["tagger/str"] == [[0, 8, "value"]]
+    assert second.file_tags == {tagged_file.source: tagged_file.tags}
+    second.release()
+    assert DocImports(2, readers).get("tagger/int") is None
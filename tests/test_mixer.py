@@ -1 +1,344 @@
-# TODO: implement
+import gzip
+import json
+import os
+import pytest
+
+from postit.files import FileClient
+from postit.formats import TagTable
+from postit.mixer import Condition, Mixer, MixerConfig
+from postit.types import Doc, File
+from unittest.mock import MagicMock
+
+
+@pytest.fixture
+def tables():
+    docs = []
+    for i in range(4):
+        doc = Doc(i, f"source{i}", "content")
+        doc.tags = {
+            "tagger/int": [[0, 3, i], [4, 6, i * 2]],
+            "tagger/float": [[0, 6, i / 2]],
+            "tagger/str": [[0, 6, "odd" if i % 2 else "even"]],
+        }
+        docs.append(doc)
+    first = TagTable.from_file(File("documents/file.jsonl", docs))
+
+    # The second experiment overrides tagger/int for the first document only
+    override = Doc(0, "source0", "content")
+    override.tags = {"tagger/int": [[1, 2, 10]]}
+    rest = [Doc(i, f"source{i}", "content") for i in range(1, 4)]
+    second = TagTable.from_file(File("documents/file.jsonl", [override, *rest]))
+    return [first, second]
+
+
+def merged_docs(tables: list[TagTable], doc_ids: list[int]) -> list[dict]:
+    mixer = Mixer(MagicMock(), [], {})
+    return [
+        {"id": doc_id, **mixer.merge_tags(doc_id, [(table, i) for table in tables])}
+        for i, doc_id in enumerate(doc_ids)
+    ]
+
+
+def test_condition_invalid_operator():
+    with pytest.raises(ValueError):
+        Condition(tag="tagger/int", operator="~", value=1)
+
+
+@pytest.mark.parametrize(
+    "tag, operator, value",
+    [
+        ("tagger/int", ">", 1),
+        ("tagger/int", "<=", 2.5),
+        ("tagger/int", "==", 10),
+        ("tagger/int", "in", [0, 2, 10]),
+        ("tagger/int", "not in", [0, 2, 10]),
+        ("tagger/float", ">=", 0.5),
+        ("tagger/float", "!=", 1.0),
+        ("tagger/str", "==", "odd"),
+        ("tagger/str", "!=", "missing"),
+        ("tagger/str", "in", ["even", 1]),
+        ("tagger/str", "not in", "oddity"),
+        ("tagger/missing", ">", 0),
+    ],
+)
+def test_condition_eval_batch(tables, tag, operator, value):
+    condition = Condition(tag=tag, operator=operator, value=value)
+    docs = merged_docs(tables, [0, 1, 2, 3])
+    assert condition.eval_batch(docs, tables) == [condition.eval(doc) for doc in docs]
+
+
+@pytest.mark.parametrize("operator", ["==", ">", "in"])
+def test_condition_eval_batch_large_integers(operator):
+    docs = []
+    for i in range(2):
+        doc = Doc(i, f"source{i}", "content")
+        doc.tags = {"tagger/hash": [[0, 1, 2**60 + i]]}
+        docs.append(doc)
+    tables = [TagTable.from_file(File("documents/file.jsonl", docs))]
+
+    # 2**60 and 2**60 + 1 are the same float
+    value = [2**60 + 1] if operator == "in" else 2**60
+    condition = Condition(tag="tagger/hash", operator=operator, value=value)
+    merged = merged_docs(tables, [0, 1])
+    results = condition.eval_batch(merged, tables)
+    assert results == [condition.eval(doc) for doc in merged]
+    assert [bool(result) for result in results] == [
+        operator == "==",
+        operator != "==",
+    ]
+
+
+def test_condition_eval_batch_mismatched_ids(tables):
+    condition = Condition(tag="tagger/int", operator=">=", value=0)
+    docs = merged_docs(tables, [0, 5, 2, 3, 4])
+    docs[1]["tagger/int"] = [[0, 1, 1]]
+    results = condition.eval_batch(docs, tables)
+    assert results[0] == [[1, 2, 10]]
+    assert results[1] == [[0, 1, 1]]
+    assert results[2] == [[0, 3, 2], [4, 6, 4]]
+    assert results[4] == []
+
+
+def test_mixer_process(tmp_path):
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    with open(documents / "file.jsonl", "w") as file:
+        for i in range(3):
+            doc = {"id": i, "source": f"source{i}", "content": "abcdefgh"}
+            file.write(json.dumps(doc) + "\n")
+
+    tags = tmp_path / "tags" / "exp"
+    tags.mkdir(parents=True)
+    with open(tags / "file.jsonl", "w") as file:
+        file.write(json.dumps({"source": "file", "tags": {}}) + "\n")
+        for i in range(3):
+            doc_tags = {"t/keep": [[0, 3, i]], "t/drop": [[2, 2, 1]]}
+            file.write(json.dumps({"id": i, "tags": doc_tags}) + "\n")
+
+    config = MixerConfig(
+        name="mix",
+        experiments=["exp"],
+        input_paths=[f"{documents}/*"],
+        output_path=f"{tmp_path}/mix/results.jsonl",
+        conditions={
+            "include": [Condition(tag="t/keep", operator=">", value=0)],
+            "exclude": [Condition(tag="t/drop", operator="==", value=1)],
+        },
+    )
+    Mixer.mix(config)
+
+    with open(config.output_path) as file:
+        results = [json.loads(line) for line in file.read().splitlines()]
+    assert [doc["id"] for doc in results] == [1, 2]
+    assert [doc["content"] for doc in results] == ["abd", "abd"]
+    assert results[0]["t/keep"] == [[0, 3, 1]]
+
+
+def test_mixer_config_save(tmp_path):
+    config = MixerConfig(
+        name="mix",
+        experiments=["exp"],
+        input_paths=["documents/*"],
+        conditions={"include": [Condition(tag="t", operator="in", value=[1])]},
+    )
+    config.save(f"{tmp_path}/config.json")
+
+    loaded = MixerConfig.load(f"{tmp_path}/config.json")
+    assert loaded.conditions["include"][0].to_dict() == {
+        "tag": "t",
+        "operator": "in",
+        "value": [1],
+    }
+
+
+def test_mixer_merge_ranges():
+    mixer = Mixer(MagicMock(), [], {})
+    include = [[[0, 5, 1], [10, 15, 1]], [[3, 8, 0.5]]]
+    exclude = [[[4, 4, 1]], [[12, 20, 1]]]
+    assert mixer.merge_ranges(include, exclude) == [[0, 3], [5, 8], [10, 11]]
+    assert mixer.merge_ranges(include, []) == [[0, 8], [10, 15]]
+    assert mixer.merge_ranges([], exclude) == []
+
+
+def test_mixer_apply_conditions():
+    mixer = Mixer(MagicMock(), [], {})
+    doc = {"content": "abcdefgh", "t/a": [[0, 3, 1], [2, 5, 1]], "t/b": [[1, 1, 1]]}
+    conditions = {
+        "include": [Condition(tag="t/a", operator=">", value=0)],
+        "exclude": [Condition(tag="t/b", operator="==", value=1)],
+    }
+    # Overlapping include spans do not duplicate content
+    assert mixer.apply_conditions(doc, conditions)["content"] == "acdef"
+
+
+def test_mixer_stream(tmp_path):
+    documents = tmp_path / "documents" / "sub"
+    documents.mkdir(parents=True)
+    tags = tmp_path / "tags" / "exp" / "sub"
+    tags.mkdir(parents=True)
+    with (
+        open(documents / "file.jsonl", "w") as file,
+        open(tags / "file.jsonl", "w") as tags_file,
+    ):
+        tags_file.write(json.dumps({"source": "file", "tags": {}}) + "\n")
+        for i in range(4):
+            doc = {"id": i, "source": f"source{i}", "content": "abcdefgh"}
+            file.write(json.dumps(doc) + "\n")
+            tags_file.write(
+                json.dumps({"id": i, "tags": {"t/keep": [[0, 7, 1]]}}) + "\n"
+            )
+
+    config = MixerConfig(
+        name="mix",
+        experiments=["exp"],
+        input_paths=[f"{tmp_path}/documents/**/*.jsonl"],
+        conditions={"include": [Condition(tag="t/keep", operator="==", value=1)]},
+        stream=True,
+        max_shard_size=200,
+    )
+    Mixer.mix(config)
+
+    shards = sorted((tmp_path / "mix" / "sub").iterdir())
+    assert [shard.name for shard in shards] == ["file-00000.jsonl", "file-00001.jsonl"]
+    results = [
+        json.loads(line) for shard in shards for line in shard.read_text().splitlines()
+    ]
+    assert [doc["id"] for doc in results] == [0, 1, 2, 3]
+
+
+def test_mixer_stream_pipelined(tmp_path):
+    path = f"{tmp_path}/documents/a.jsonl"
+    mixer = Mixer(
+        FileClient(),
+        [],
+        {},
+        stream=True,
+        output_paths={path: f"{tmp_path}/mix"},
+        max_shard_size=10,
+    )
+    # Files are read ahead and their shards written behind, on the I/O workers
+    assert mixer.pipelined
+
+    paths = mixer.store(path, ["a" * 8 + "\n", "b" * 8 + "\n"])
+    assert paths == [f"{tmp_path}/mix/a-00000.jsonl", f"{tmp_path}/mix/a-00001.jsonl"]
+
+
+def test_mixer_store_in_input_order(tmp_path):
+    paths = [f"{tmp_path}/documents/{name}.jsonl" for name in ["a", "b", "c"]]
+    output_path = f"{tmp_path}/mix/results.jsonl"
+    mixer = Mixer(FileClient(), [], {}, output_paths=dict.fromkeys(paths, output_path))
+
+    # Outputs are appended once the outputs of earlier files are written
+    assert mixer.store(paths[2], "c\n") == output_path
+    assert not os.path.exists(output_path)
+    mixer.store(paths[0], "a\n")
+    mixer.store(paths[1], "b\n")
+    with open(output_path) as file:
+        assert file.read() == "a\nb\nc\n"
+
+
+def write_input(path, name: str, num_docs: int):
+    documents = path / "documents"
+    tags = path / "tags" / "exp"
+    documents.mkdir(parents=True, exist_ok=True)
+    tags.mkdir(parents=True, exist_ok=True)
+    with (
+        open(documents / f"{name}.jsonl", "w") as file,
+        open(tags / f"{name}.jsonl", "w") as tags_file,
+    ):
+        tags_file.write(json.dumps({"source": name, "tags": {}}) + "\n")
+        for i in range(num_docs):
+            file.write(json.dumps({"id": i, "source": name, "content": "abc"}) + "\n")
+            tags_file.write(
+                json.dumps({"id": i, "tags": {"t/keep": [[0, 2, 1]]}}) + "\n"
+            )
+
+
+def test_mixer_multiple_inputs(tmp_path):
+    for name in ["b", "a"]:
+        write_input(tmp_path / "first", name, 2)
+    write_input(tmp_path / "second", "c", 1)
+
+    config = MixerConfig(
+        name="mix",
+        experiments=["exp"],
+        input_paths=[
+            f"{tmp_path}/first/documents/b.jsonl",
+            f"{tmp_path}/first/documents/*.jsonl",
+            f"{tmp_path}/second/documents/*",
+        ],
+        conditions={"include": [Condition(tag="t/keep", operator="==", value=1)]},
+    )
+    Mixer.mix(config, num_processes=2)
+
+    # Each input is routed to its own output, files are not mixed twice
+    with open(tmp_path / "first" / "mix" / "results.jsonl") as file:
+        first = [json.loads(line)["source"] for line in file.read().splitlines()]
+    assert first == ["b", "b", "a", "a"]
+    with open(tmp_path / "second" / "mix" / "results.jsonl") as file:
+        assert len(file.read().splitlines()) == 1
+
+    config.output_path = f"{tmp_path}/all.jsonl"
+    Mixer.mix(config, num_processes=2)
+    with open(config.output_path) as file:
+        assert len(file.read().splitlines()) == 5
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_mixer_stream_duplicate_shards(tmp_path, compressed):
+    write_input(tmp_path / "first", "a", 2)
+    write_input(tmp_path / "second", "a", 2)
+    input_paths = [f"{tmp_path}/first/documents/a.jsonl"]
+    if compressed:
+        # The same name with another compression in the same folder
+        file_client = FileClient()
+        path = f"{tmp_path}/first/documents/a.jsonl"
+        file_client.write(f"{path}.gz", file_client.read(path))
+        input_paths.append(f"{path}.gz")
+    else:
+        input_paths.append(f"{tmp_path}/second/documents/a.jsonl")
+
+    config = MixerConfig(
+        name="mix",
+        experiments=["exp"],
+        input_paths=input_paths,
+        output_path=f"{tmp_path}/out",
+        conditions={"include": [Condition(tag="t/keep", operator="==", value=1)]},
+        stream=True,
+    )
+    with pytest.raises(ValueError, match="same shards"):
+        Mixer.mix(config, num_processes=2)
+    assert not (tmp_path / "out").exists()
+
+    # Inputs with their own output directories are written separately
+    config.output_path = ""
+    if not compressed:
+        Mixer.mix(config, num_processes=2)
+        for folder in ["first", "second"]:
+            assert (tmp_path / folder / "mix" / "a-00000.jsonl").exists()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_mixer_compressed(tmp_path, stream):
+    write_input(tmp_path, "a", 3)
+    file_client = FileClient()
+    for folder in ["documents", "tags/exp"]:
+        path = f"{tmp_path}/{folder}/a.jsonl"
+        file_client.write(f"{path}.gz", file_client.read(path))
+
+    config = MixerConfig(
+        name="mix",
+        experiments=["exp"],
+        input_paths=[f"{tmp_path}/documents/*.jsonl.gz"],
+        conditions={"include": [Condition(tag="t/keep", operator="==", value=1)]},
+        stream=stream,
+    )
+    Mixer.mix(config)
+
+    # Outputs are compressed like the inputs
+    output_path = (
+        tmp_path / "mix" / ("a-00000.jsonl.gz" if stream else "results.jsonl.gz")
+    )
+    with gzip.open(output_path, "rt") as file:
+        results = [json.loads(line) for line in file.read().splitlines()]
+    assert [doc["id"] for doc in results] == [0, 1, 2]
@@ -0,0 +1,456 @@
+import contextlib
+import json
+import os
+import pickle
+import pytest
+import time
+
+from postit.files import FileClient
+from postit.formats import TagFormat, read_tags, write_tags
+from postit.processor import (
+    BaseProcessor,
+    ProcessorBackend,
+    ProgressReporter,
+    TaggerProcessor,
+    TotalStrategy,
+)
+from postit.types import Doc, File
+from unittest.mock import MagicMock
+
+
+@pytest.fixture
+def documents(tmp_path):
+    documents_path = tmp_path / "documents"
+    documents_path.mkdir()
+    for name in ["a", "b"]:
+        with open(documents_path / f"{name}.jsonl", "w") as file:
+            for i in range(3):
+                doc = {"id": i, "source": f"{name}{i}", "content": f"doc {i}\nline"}
+                file.write(json.dumps(doc) + "\n")
+    return tmp_path
+
+
+def read_jsonl(path: str) -> list[dict]:
+    with open(path) as file:
+        return [json.loads(line) for line in file.read().splitlines()]
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_tagger_processor_backends(documents, backend):
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/documents/*"],
+        tagger_names=["doc_length", "num_docs"],
+        experiment=backend,
+        num_processes=2,
+        backend=backend,
+    )
+
+    tags = read_jsonl(f"{documents}/tags/{backend}/a.jsonl")
+    assert tags[0]["tags"] == {"num_docs/total_docs": [[0, 3, 3]]}
+    assert len(tags) == 4
+    for i, doc_tags in enumerate(tags[1:]):
+        assert doc_tags["id"] == i
+        assert doc_tags["tags"]["doc_length/num_words"] == [[0, 10, 3]]
+
+
+def test_tagger_processor_stream(documents):
+    for experiment, stream in [("whole", False), ("stream", True)]:
+        TaggerProcessor.tag(
+            glob_paths=[f"{documents}/documents/*"],
+            tagger_names=["doc_length", "paragraph_length"],
+            experiment=experiment,
+            stream=stream,
+        )
+
+    for name in ["a", "b"]:
+        assert read_jsonl(f"{documents}/tags/stream/{name}.jsonl") == read_jsonl(
+            f"{documents}/tags/whole/{name}.jsonl"
+        )
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_tagger_processor_columnar(documents, stream):
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/documents/*"],
+        tagger_names=["doc_length", "paragraph_length"],
+        experiment="jsonl",
+    )
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/documents/*"],
+        tagger_names=["doc_length", "paragraph_length"],
+        experiment="columnar",
+        stream=stream,
+        tag_format="columnar",
+    )
+
+    file_client = FileClient()
+    path = f"{documents}/documents/a.jsonl"
+    expected = read_tags(file_client, path, "jsonl")
+    table = read_tags(file_client, path, "columnar")
+    assert os.path.isfile(f"{documents}/tags/columnar/a.ptag")
+    assert list(table.iter_docs()) == list(expected.iter_docs())
+
+    # Tagging again in the other format replaces the tags
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/documents/*"],
+        tagger_names=["doc_length"],
+        experiment="columnar",
+        stream=stream,
+    )
+    assert not os.path.exists(f"{documents}/tags/columnar/a.ptag")
+    names = read_tags(file_client, path, "columnar").names
+    assert names and all(name.startswith("doc_length/") for name in names)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_tagger_processor_batch_size(documents, stream):
+    tagger_names = ["doc_length", "code_licenses", "paragraph_length", "code_comments"]
+    for batch_size in [1, 2, 64]:
+        TaggerProcessor.tag(
+            glob_paths=[f"{documents}/documents/*"],
+            tagger_names=tagger_names,
+            experiment=f"batch{batch_size}",
+            stream=stream,
+            batch_size=batch_size,
+        )
+
+    for name in ["a", "b"]:
+        expected = read_jsonl(f"{documents}/tags/batch1/{name}.jsonl")
+        assert len(expected) == 4
+        for batch_size in [2, 64]:
+            path = f"{documents}/tags/batch{batch_size}/{name}.jsonl"
+            assert read_jsonl(path) == expected
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("tag_format", ["jsonl", "columnar"])
+def test_tagger_processor_compressed(documents, stream, tag_format):
+    file_client = FileClient()
+    for name in ["a", "b"]:
+        path = f"{documents}/documents/{name}.jsonl"
+        file_client.write(f"{path}.gz", file_client.read(path))
+
+    for experiment, pattern in [("plain", "*.jsonl"), ("compressed", "*.jsonl.gz")]:
+        TaggerProcessor.tag(
+            glob_paths=[f"{documents}/documents/{pattern}"],
+            tagger_names=["doc_length", "paragraph_length"],
+            experiment=experiment,
+            stream=stream,
+            tag_format=tag_format,
+        )
+
+    # Tags keep the compression of their documents
+    ext = ".jsonl.gz" if tag_format == "jsonl" else ".ptag.gz"
+    assert os.path.isfile(f"{documents}/tags/compressed/a{ext}")
+    for name in ["a", "b"]:
+        path = f"{documents}/documents/{name}.jsonl"
+        expected = read_tags(file_client, path, "plain")
+        table = read_tags(file_client, f"{path}.gz", "compressed")
+        assert list(table.iter_docs()) == list(expected.iter_docs())
+
+
+def test_tagger_processor_stages():
+    processor = TaggerProcessor(
+        tagger_names=["doc_length", "code_licenses", "paragraph_length", "doc_lines"],
+        experiment="test",
+        file_client=FileClient(),
+        imported_experiments=["comments"],
+    )
+    # code_licenses imports its dependency, so it runs on each document
+    assert [
+        (batched, [doc_tagger.name for doc_tagger in doc_taggers])
+        for batched, doc_taggers in processor.stages
+    ] == [
+        (True, ["doc_length"]),
+        (False, ["code_licenses"]),
+        (True, ["paragraph_length", "doc_lines"]),
+    ]
+    with pytest.raises(ValueError):
+        TaggerProcessor(
+            tagger_names=["doc_length"],
+            experiment="test",
+            file_client=FileClient(),
+            batch_size=0,
+        )
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_tagger_processor_in_run_dependencies(tmp_path, stream):
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    with open(documents / "code.jsonl", "w") as file:
+        contents = ["// Copyright 2024\nx = 1", "# a comment\ny = 2"]
+        for i, content in enumerate(contents):
+            doc = {"id": i, "source": "code", "content": content}
+            file.write(json.dumps(doc) + "\n")
+
+    # code_licenses is listed first, but runs after code_comments
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/*"],
+        tagger_names=["code_licenses", "code_comments"],
+        experiment="code",
+        stream=stream,
+    )
+
+    tags = read_jsonl(f"{tmp_path}/tags/code/code.jsonl")
+    assert tags[1]["tags"] == {
+        "code_comments/comments": [[0, 17, 1]],
+        "code_licenses/notice": [[0, 17, 1]],
+    }
+    assert tags[2]["tags"] == {"code_comments/comments": [[0, 11, 1]]}
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_tagger_processor_imported_dependencies(tmp_path, stream):
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    with open(documents / "code.jsonl", "w") as file:
+        doc = {"id": 0, "source": "code", "content": "// Licensed under MIT\nx = 1"}
+        file.write(json.dumps(doc) + "\n")
+
+    with pytest.raises(ImportError):
+        TaggerProcessor.tag(
+            glob_paths=[f"{documents}/*"],
+            tagger_names=["code_licenses"],
+            experiment="licenses",
+        )
+
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/*"],
+        tagger_names=["code_comments"],
+        experiment="comments",
+    )
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/*"],
+        tagger_names=["code_licenses"],
+        experiment="licenses",
+        imported_experiments=["comments"],
+        stream=stream,
+    )
+
+    tags = read_jsonl(f"{tmp_path}/tags/licenses/code.jsonl")
+    assert tags[1]["tags"] == {"code_licenses/notice": [[0, 21, 1]]}
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("tag_format", ["jsonl", "columnar"])
+def test_tagger_processor_missing_imported_dependencies(tmp_path, stream, tag_format):
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    with open(documents / "code.jsonl", "w") as file:
+        for i in range(3):
+            doc = {"id": i, "source": "code", "content": f"// Licensed under MIT\n{i}"}
+            file.write(json.dumps(doc) + "\n")
+
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/*"],
+        tagger_names=["doc_length"],
+        experiment="lengths",
+        tag_format=tag_format,
+    )
+    with pytest.raises(ImportError, match="code_comments"):
+        TaggerProcessor.tag(
+            glob_paths=[f"{documents}/*"],
+            tagger_names=["code_licenses"],
+            experiment="licenses",
+            imported_experiments=["lengths"],
+            stream=stream,
+        )
+
+    # The dependency is found in any of the imported experiments
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/*"],
+        tagger_names=["code_comments"],
+        experiment="comments",
+        tag_format=tag_format,
+    )
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/*"],
+        tagger_names=["code_licenses"],
+        experiment="licenses",
+        imported_experiments=["lengths", "comments"],
+        stream=stream,
+    )
+    tags = read_jsonl(f"{tmp_path}/tags/licenses/code.jsonl")
+    assert tags[1]["tags"] == {"code_licenses/notice": [[0, 21, 1]]}
+
+
+@pytest.mark.parametrize("batch_size", [2, 8])
+def test_tagger_processor_conditional_imports(tmp_path, batch_size):
+    file_client = FileClient()
+    path = f"{tmp_path}/documents/code.jsonl"
+    docs = [Doc(i, f"source{i}", "content") for i in range(6)]
+    for doc in docs:
+        doc.tags = {"code_comments/value": [[0, 1, doc.id]]}
+    write_tags(
+        file_client,
+        TagFormat.JSONL.get_path(path, "comments"),
+        File(path, docs),
+    )
+
+    processor = TaggerProcessor(
+        tagger_names=["code_licenses"],
+        experiment="licenses",
+        file_client=file_client,
+        imported_experiments=["comments"],
+        total_strategy=TotalStrategy.SIZE,
+        batch_size=batch_size,
+    )
+
+    # Odd documents read their imports in the first stage, every third one in the second
+    def read_imports(step):
+        def run_tagger(doc, imports):
+            if doc.id % step == 1:
+                return {f"seen/{step}": imports["code_comments/value"]}
+            return {}
+
+        tagger = MagicMock()
+        tagger.run_tagger.side_effect = run_tagger
+        return tagger
+
+    processor.stages = [(False, [read_imports(2)]), (False, [read_imports(3)])]
+    with contextlib.ExitStack() as stack:
+        readers = processor.open_imports(path, stack)
+        tagged = [Doc(i, f"source{i}", "content") for i in range(6)]
+        results = list(processor.tag_docs(tagged, readers))
+        # Imports were read in lockstep, the tags file was never indexed
+        assert readers[0].index is None
+
+    for doc in results:
+        if doc.id % 2 == 1:
+            assert doc.tags["seen/2"] == [[0, 1, doc.id]]
+        if doc.id % 3 == 1:
+            assert doc.tags["seen/3"] == [[0, 1, doc.id]]
+
+
+def test_tagger_processor_stream_with_file_taggers():
+    processor = TaggerProcessor(
+        tagger_names=["doc_length", "num_docs"],
+        experiment="test",
+        file_client=FileClient(),
+        stream=True,
+    )
+    assert not processor.stream
+
+
+def test_tagger_processor_get_total(documents):
+    processor = TaggerProcessor(
+        tagger_names=["doc_length", "paragraph_length", "num_docs"],
+        experiment="test",
+        file_client=FileClient(),
+    )
+    paths = [f"{documents}/documents/a.jsonl", f"{documents}/documents/b.jsonl"]
+
+    # 6 documents for 2 doc taggers, 2 files for 1 file tagger
+    assert processor.get_total(paths) == 14
+
+
+@pytest.mark.parametrize("total_strategy", ["size", "none"])
+def test_tagger_processor_total_strategies(documents, total_strategy):
+    TaggerProcessor.tag(
+        glob_paths=[f"{documents}/documents/*"],
+        tagger_names=["doc_length"],
+        experiment=total_strategy,
+        total_strategy=total_strategy,
+    )
+
+    assert len(read_jsonl(f"{documents}/tags/{total_strategy}/a.jsonl")) == 4
+
+
+def test_size_strategy_reports_bytes():
+    processor = TaggerProcessor(
+        tagger_names=["doc_length"],
+        experiment="test",
+        file_client=FileClient(),
+        total_strategy=TotalStrategy.SIZE,
+    )
+    assert processor.units == "bytes"
+
+
+def test_processor_pickle_drops_progress():
+    processor = TaggerProcessor(
+        tagger_names=["doc_length"],
+        experiment="test",
+        file_client=FileClient(),
+        backend=ProcessorBackend.PROCESS,
+    )
+    restored = pickle.loads(pickle.dumps(processor))
+
+    assert restored.progress is None
+    assert restored.backend == ProcessorBackend.PROCESS
+    assert [tagger.name for tagger in restored.doc_taggers] == ["doc_length"]
+
+
+def test_progress_reporter_buffers_updates():
+    queue = MagicMock()
+    reporter = ProgressReporter(queue, interval=60)
+    reporter.advance()
+    reporter.advance(2)
+    queue.put.assert_not_called()
+
+    reporter.flush()
+    queue.put.assert_called_once_with(3)
+
+
+class SleepProcessor(BaseProcessor):
+    def process(self, path: str) -> str:
+        # Later paths finish first
+        time.sleep(0.05 * (3 - int(path)))
+        self.advance()
+        return path
+
+
+def test_processor_run_keeps_order():
+    processor = SleepProcessor(num_processes=4)
+    assert processor.run(["0", "1", "2", "3"]) == ["0", "1", "2", "3"]
+
+
+class PipelineProcessor(BaseProcessor):
+    pipelined = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loaded: list[str] = []
+        self.stored: list[str] = []
+        self.peak = 0
+
+    def load(self, path: str) -> int:
+        self.loaded.append(path)
+        self.peak = max(self.peak, len(self.loaded) - len(self.stored))
+        return int(path)
+
+    def transform(self, path: str, loaded: int) -> int:
+        if loaded < 0:
+            raise ValueError(path)
+        time.sleep(0.01)
+        self.advance()
+        return loaded * 2
+
+    def store(self, path: str, output: int) -> int:
+        time.sleep(0.01)
+        self.stored.append(path)
+        return output
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_processor_pipeline(backend):
+    processor = PipelineProcessor(
+        num_processes=1, backend=backend, io_workers=1, prefetch=1
+    )
+    paths = [str(i) for i in range(20)]
+    assert processor.run(paths) == [i * 2 for i in range(20)]
+    assert sorted(processor.stored, key=int) == paths
+
+    # Files are read ahead while others are transformed and stored, within the bounds
+    assert 1 < processor.peak <= 4
+
+
+def test_processor_pipeline_errors():
+    processor = PipelineProcessor(num_processes=2)
+    with pytest.raises(ValueError):
+        processor.run(["1", "-1", "2"])
+
+    with pytest.raises(ValueError):
+        PipelineProcessor(io_workers=0)
+    with pytest.raises(ValueError):
+        PipelineProcessor(prefetch=-1)
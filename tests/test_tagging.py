@@ -0,0 +1,76 @@
+import pytest
+
+from postit.tagging import DocTagger, schedule_taggers
+from postit.types import Doc, TagResult
+
+
+def make_tagger(tagger_name: str, tagger_dependencies: list[str]) -> DocTagger:
+    class Tagger(DocTagger):
+        name = tagger_name
+        dependencies = tagger_dependencies
+
+        def tag(self, source: Doc, **kwargs) -> TagResult:
+            return TagResult(source, [])
+
+    return Tagger()
+
+
+def names(taggers) -> list[str]:
+    return [tagger.name for tagger in taggers]
+
+
+def test_schedule_taggers_orders_dependencies():
+    taggers = [
+        make_tagger("licenses", ["comments"]),
+        make_tagger("length", []),
+        make_tagger("comments", ["tokens"]),
+        make_tagger("tokens", []),
+    ]
+    assert names(schedule_taggers(taggers)) == [
+        "tokens",
+        "comments",
+        "licenses",
+        "length",
+    ]
+
+
+def test_schedule_taggers_is_stable():
+    taggers = [make_tagger(name, []) for name in ["c", "a", "b"]]
+    assert names(schedule_taggers(taggers)) == ["c", "a", "b"]
+
+
+def test_schedule_taggers_external_dependencies():
+    # Dependencies outside of the run are left to imported experiments
+    taggers = [make_tagger("licenses", ["comments"]), make_tagger("length", [])]
+    assert names(schedule_taggers(taggers)) == ["licenses", "length"]
+
+
+def test_schedule_taggers_cycle():
+    taggers = [
+        make_tagger("a", ["b"]),
+        make_tagger("b", ["c"]),
+        make_tagger("c", ["a"]),
+    ]
+    with pytest.raises(ValueError, match="a -> b -> c -> a"):
+        schedule_taggers(taggers)
+
+
+def test_get_dependency_tags():
+    tagger = make_tagger("licenses", ["comments"])
+    imports = {"comments/block": [[0, 1, 1]]}
+    doc = Doc(0, "source", "content")
+    assert tagger.get_dependency_tags(doc, "comments/block", imports) == [[0, 1, 1]]
+    assert tagger.get_dependency_tags(doc, "comments/block") == []
+
+    # Tags from the same run take precedence over imported tags
+    doc.tags["comments/block"] = [[4, 5, 1]]
+    assert tagger.get_dependency_tags(doc, "comments/block", imports) == [[4, 5, 1]]
+
+
+def test_tag_batch_fallback():
+    tagger = make_tagger("length", [])
+    docs = [Doc(i, "source", "content") for i in range(3)]
+    assert not tagger.batched
+    results = tagger.tag_batch(docs)
+    assert [result.source for result in results] == docs
+    assert tagger.run_batch(docs) == [{}, {}, {}]
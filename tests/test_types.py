@@ -13,8 +13,17 @@ def test_doc_initialization():
 
 def test_doc_get_tags():
     doc = Doc(1, "source1", "content1")
-    expected_tags = json.dumps({"id": 1, "source": "source1", "tags": {}})
-    assert doc.get_tags() == expected_tags
+    expected_tags = {"id": 1, "source": "source1", "tags": {}}
+    assert json.loads(doc.get_tags()) == expected_tags
+
+
+def test_doc_from_raw():
+    raw = json.dumps({"id": 1, "source": "source1", "content": "content1"})
+    doc = Doc.from_raw(raw)
+    assert doc.id == 1
+    assert doc.source == "source1"
+    assert doc.content == "content1"
+    assert doc.tags == {}
 
 
 def test_file_initialization():
@@ -30,15 +39,18 @@ def test_file_get_tags():
     doc1 = Doc(1, "source1", "content1")
     doc2 = Doc(2, "source2", "content2")
     file = File("source_file", [doc1, doc2])
-    expected_tags = (
-        json.dumps({"source": "source_file", "tags": {}})
-        + "\n"
-        + doc1.get_tags()
-        + "\n"
-        + doc2.get_tags()
-    )
+    expected_tags = "\n".join([file.get_file_tags(), doc1.get_tags(), doc2.get_tags()])
 
     assert file.get_tags() == expected_tags
+    assert json.loads(file.get_file_tags()) == {"source": "source_file", "tags": {}}
+
+
+def test_file_get_file_tags():
+    file = File("source_file", [Doc(1, "source1", "content1")])
+    file.tags = {"tagger/tag": [[0, 1, 1]]}
+    expected_tags = {"source": "source_file", "tags": {"tagger/tag": [[0, 1, 1]]}}
+
+    assert json.loads(file.get_file_tags()) == expected_tags
 
 
 def test_file_from_raw():
@@ -87,3 +99,17 @@ def test_tag_result():
     tag_result = TagResult(doc, [tag1, tag2])
     assert tag_result.source == doc
     assert tag_result.tags == [tag1, tag2]
+
+
+def test_doc_get_paragraphs():
+    doc = Doc(0, "source", "one\n\ntwo\n")
+    assert doc.get_paragraphs() == [(0, 3), (4, 4), (5, 8), (9, 9)]
+    assert doc.get_paragraphs() is doc.get_paragraphs()
+
+    # The spans follow changes to the content
+    doc.content = "one"
+    assert doc.get_paragraphs() == [(0, 3)]
+
+    # Lone surrogates are one character, like in str indexes
+    doc.content = "\ud83d\nx\u00e9"
+    assert doc.get_paragraphs() == [(0, 1), (2, 4)]
@@ -0,0 +1,54 @@
+import io
+import pytest
+
+from postit.utils.background import ReadAhead, WriteBehind
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 20])
+def test_read_ahead(chunk_size):
+    data = b"first line\n\nsecond\r\nlast"
+    with ReadAhead(io.BytesIO(data), chunk_size=chunk_size, depth=2) as reader:
+        assert list(reader) == list(io.BytesIO(data))
+
+
+def test_read_ahead_closed_early():
+    file = io.BytesIO(b"line\n" * 1000)
+    reader = ReadAhead(file, chunk_size=5, depth=1)
+    assert next(iter(reader)) == b"line\n"
+    reader.close()
+    assert file.closed
+
+
+def test_read_ahead_error():
+    class FailingFile(io.BytesIO):
+        def read(self, size=-1):
+            raise OSError("read failed")
+
+    with ReadAhead(FailingFile()) as reader:
+        with pytest.raises(OSError, match="read failed"):
+            list(reader)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1 << 20])
+def test_write_behind(chunk_size):
+    file = io.StringIO()
+    file.close = lambda: None
+    with WriteBehind(file, chunk_size=chunk_size, depth=1) as writer:
+        for i in range(100):
+            writer.write(f"{i}\n")
+    assert file.getvalue() == "".join(f"{i}\n" for i in range(100))
+
+
+def test_write_behind_error():
+    class FailingFile(io.BytesIO):
+        def write(self, data):
+            raise OSError("write failed")
+
+    with pytest.raises(OSError, match="write failed"):
+        with WriteBehind(FailingFile(), chunk_size=1) as writer:
+            for _ in range(100):
+                writer.write(b"data")
+    assert writer.file.closed
+
+    with pytest.raises(ValueError):
+        WriteBehind(io.BytesIO(), depth=0)
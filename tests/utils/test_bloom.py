@@ -0,0 +1,239 @@
+import multiprocessing
+import os
+import pytest
+
+from postit.files import FileClient
+from postit.utils.bloom import BloomFilter, ScalableBloomFilter, load_bloom_filter
+
+
+@pytest.fixture
+def bloom():
+    bloom = BloomFilter.new(1000, 0.01)
+    yield bloom
+    bloom.close()
+
+
+def add_items(bloom: BloomFilter, items: list[str]):
+    for item in items:
+        bloom.add(item)
+
+
+def test_bloom_filter(bloom):
+    bloom.add("hello")
+    assert "hello" in bloom
+    assert "world" not in bloom
+
+
+def test_bloom_filter_shared_with_processes(bloom):
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=add_items, args=(bloom, [f"{i}-{j}" for j in range(50)]))
+        for i in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert all(f"{i}-{j}" in bloom for i in range(4) for j in range(50))
+
+
+def test_bloom_filter_attach_by_name(bloom):
+    other = BloomFilter(bloom.size, bloom.num_hashes, name=bloom.shm.name)
+    other.add("shared")
+    other.close()
+
+    assert "shared" in bloom
+
+
+def test_bloom_filter_save_and_load(bloom, tmp_path):
+    bloom.add("saved")
+    bloom.save(f"{tmp_path}/filter.bloom")
+
+    loaded = BloomFilter.load(f"{tmp_path}/filter.bloom")
+    assert loaded.path == f"{tmp_path}/filter.bloom"
+    assert (loaded.size, loaded.num_hashes) == (bloom.size, bloom.num_hashes)
+    assert "saved" in loaded
+    assert "unsaved" not in loaded
+    assert loaded.fill_ratio() == bloom.fill_ratio()
+
+    # Only the dirty pages of a loaded filter are written back to its file
+    loaded.add("mapped")
+    assert loaded.dirty.sum() == len({i // 32768 for i in loaded.get_indexes("mapped")})
+    loaded.save(f"{tmp_path}/filter.bloom")
+    assert not loaded.dirty.any()
+    loaded.save(f"{tmp_path}/copy.bloom")
+    loaded.close()
+    for name in ["filter.bloom", "copy.bloom"]:
+        reloaded = BloomFilter.load(f"{tmp_path}/{name}")
+        assert "saved" in reloaded and "mapped" in reloaded
+        reloaded.close()
+    assert sorted(os.listdir(tmp_path)) == ["copy.bloom", "filter.bloom"]
+
+
+def test_bloom_filter_load_keeps_file_until_saved(bloom, tmp_path):
+    bloom.add("saved")
+    bloom.save(f"{tmp_path}/filter.bloom")
+    with open(tmp_path / "filter.bloom", "rb") as file:
+        data = file.read()
+
+    # Changes are journaled, shared with workers, and discarded if the filter is never saved
+    loaded = BloomFilter.load(f"{tmp_path}/filter.bloom")
+    context = multiprocessing.get_context("fork")
+    worker = context.Process(target=add_items, args=(loaded, ["worker"]))
+    worker.start()
+    worker.join()
+    loaded.add_batch(["unsaved"])
+    assert "worker" in loaded
+    assert loaded.contains_batch(["saved", "unsaved", "other"]) == [True, True, False]
+    with open(tmp_path / "filter.bloom", "rb") as file:
+        assert file.read() == data
+    loaded.close()
+
+    assert os.listdir(tmp_path) == ["filter.bloom"]
+    reloaded = BloomFilter.load(f"{tmp_path}/filter.bloom")
+    assert "saved" in reloaded
+    assert "unsaved" not in reloaded
+    reloaded.close()
+
+
+def test_bloom_filter_load_attach(bloom, tmp_path):
+    bloom.add("saved")
+    bloom.save(f"{tmp_path}/filter.bloom")
+
+    # Pickled filters attach to the same file and journal
+    loaded = BloomFilter.load(f"{tmp_path}/filter.bloom")
+    state = loaded.__getstate__()
+    assert state["path"] == f"{tmp_path}/filter.bloom"
+    other = BloomFilter(**state)
+    assert other.test_and_add_batch(["saved", "shared"]) == [True, False]
+    other.close()
+    assert "shared" in loaded
+    loaded.close()
+
+
+def test_bloom_filter_load_remote(bloom, tmp_path, monkeypatch):
+    bloom.add("remote")
+    bloom.save(f"{tmp_path}/filter.bloom")
+
+    monkeypatch.setattr(FileClient, "is_local", False)
+    loaded = BloomFilter.load(f"{tmp_path}/filter.bloom")
+    assert loaded.path is None
+    assert "remote" in loaded
+    loaded.close()
+
+
+def test_bloom_filter_file_layout(bloom, tmp_path):
+    bloom.save(f"{tmp_path}/filter.bloom")
+    with open(tmp_path / "filter.bloom", "rb") as file:
+        data = file.read()
+
+    assert data[:4] == b"PBLM"
+    assert len(data) == BloomFilter.PAYLOAD_OFFSET + len(bloom.bytes)
+
+
+def test_bloom_filter_test_and_add(bloom):
+    assert not bloom.test_and_add("item")
+    assert bloom.test_and_add("item")
+    assert "item" in bloom
+
+
+def test_bloom_filter_batch_indexes(bloom):
+    items = ["a", "b", "é", ""]
+    batch = bloom.get_batch_indexes(items)
+    assert batch.tolist() == [bloom.get_indexes(item) for item in items]
+
+
+def test_bloom_filter_batches(bloom):
+    bloom.add_batch(["a", "b"])
+    assert bloom.contains_batch(["a", "b", "c"]) == [True, True, False]
+    assert bloom.test_and_add_batch(["c", "a", "d", "c", "d"]) == [
+        False,
+        True,
+        False,
+        True,
+        True,
+    ]
+    assert bloom.contains_batch([]) == []
+
+
+def test_bloom_filter_stripes(bloom):
+    # Stripes are byte-aligned and cover every bit
+    assert bloom.stripe_size % 8 == 0
+    assert bloom.stripe_size * BloomFilter.NUM_STRIPES >= bloom.size
+
+
+@pytest.mark.parametrize("data", [b"", b"PBLM", b"\0" * 4096, b"PBLM\x63\0"])
+def test_bloom_filter_load_invalid(tmp_path, data):
+    with open(tmp_path / "invalid.bloom", "wb") as file:
+        file.write(data.ljust(24, b"\0") if data else data)
+    with pytest.raises(ValueError):
+        BloomFilter.load(f"{tmp_path}/invalid.bloom")
+
+
+@pytest.fixture
+def scalable():
+    bloom = ScalableBloomFilter(100, 0.01)
+    yield bloom
+    bloom.close()
+
+
+def test_bloom_filter_fill_ratio(bloom):
+    assert bloom.fill_ratio() == 0
+    assert bloom.estimated_fpr() == 0
+    bloom.add_batch([str(i) for i in range(100)])
+    assert 0 < bloom.fill_ratio() < 1
+    assert bloom.estimated_fpr() == bloom.fill_ratio() ** bloom.num_hashes
+
+
+def test_scalable_bloom_filter_grows(scalable):
+    items = [f"item-{i}" for i in range(1000)]
+    assert not any(scalable.test_and_add(item) for item in items[:50])
+    assert scalable.test_and_add_batch(items[:60]) == [True] * 50 + [False] * 10
+    scalable.add_batch(items[60:])
+
+    assert len(scalable.filters) > 1
+    assert all(scalable.contains_batch(items))
+    assert all(item in scalable for item in items)
+    assert scalable.estimated_fpr() < 0.01
+
+
+def test_scalable_bloom_filter_shared_with_processes(scalable):
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(
+            target=add_items, args=(scalable, [f"{i}-{j}" for j in range(200)])
+        )
+        for i in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # Sub-filters added by workers are attached, and freed by the owner
+    assert all(f"{i}-{j}" in scalable for i in range(4) for j in range(200))
+    names = [bloom.shm.name for bloom in scalable.filters]
+    assert len(names) > 1
+    scalable.close()
+    assert not any(os.path.exists(f"/dev/shm/{name}") for name in names)
+
+
+def test_scalable_bloom_filter_save_and_load(scalable, tmp_path):
+    items = [f"item-{i}" for i in range(500)]
+    scalable.add_batch(items)
+    scalable.save(f"{tmp_path}/filter.bloom")
+
+    loaded = load_bloom_filter(f"{tmp_path}/filter.bloom")
+    assert isinstance(loaded, ScalableBloomFilter)
+    assert len(loaded.filters) == len(scalable.filters)
+    assert loaded.control.tolist() == scalable.control.tolist()
+    assert all(loaded.contains_batch(items))
+    loaded.close()
+
+
+def test_load_bloom_filter(bloom, tmp_path):
+    bloom.save(f"{tmp_path}/filter.bloom")
+    loaded = load_bloom_filter(f"{tmp_path}/filter.bloom")
+    assert isinstance(loaded, BloomFilter)
+    loaded.close()
@@ -0,0 +1,136 @@
+import json
+import numpy as np
+import pytest
+
+from postit.types import Doc, File
+from postit.utils import codec
+from postit.utils.codec import JsonBackend
+
+
+@pytest.fixture(params=list(JsonBackend), ids=lambda backend: backend.value)
+def backend(request):
+    if request.param not in JsonBackend.available():
+        pytest.skip(f"JSON backend {request.param.value} is not installed.")
+    yield codec.set_backend(request.param)
+    codec.set_backend()
+
+
+def test_default_backend():
+    assert codec.set_backend().backend == JsonBackend.available()[0]
+    assert JsonBackend.available()[-1] == JsonBackend.STDLIB
+
+
+def test_set_unknown_backend():
+    with pytest.raises(ValueError):
+        codec.set_backend("unknown")
+
+
+def test_round_trip(backend):
+    value = {"id": 1, "tags": {"t/a": [[0, 3, 0.5], [4, 6, "é "]]}, "n": None}
+    encoded = codec.dumps(value)
+    assert json.loads(encoded) == value
+    assert codec.loads(encoded) == value
+    assert codec.loads(encoded.encode()) == value
+
+
+def test_numpy_scalars(backend):
+    encoded = codec.dumps({"a": np.float64(0.25), "b": np.int64(3)})
+    assert json.loads(encoded) == {"a": 0.25, "b": 3}
+
+
+def test_decode_doc(backend):
+    raw = json.dumps({"id": "a", "source": "s", "content": "c", "extra": 1})
+    assert codec.decode_doc(raw) == ("a", "s", "c")
+    assert codec.decode_doc(raw.encode()) == ("a", "s", "c")
+
+    with pytest.raises(ValueError):
+        codec.decode_doc("{not json")
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        '{"id": 0, "source": "s", "content": null}',
+        '{"id": 0, "source": "s", "content": 1}',
+        '{"source": "s", "content": "c"}',
+        '{"id": 0, "content": "c"}',
+        "[]",
+    ],
+)
+def test_decode_doc_invalid(backend, raw):
+    with pytest.raises(ValueError):
+        codec.decode_doc(raw)
+
+
+def test_decode_tags(backend):
+    raw = json.dumps({"id": 2, "source": "s", "tags": {"t/a": [[0, 1, 1]]}})
+    assert codec.decode_tags(raw) == (2, {"t/a": [[0, 1, 1]]})
+
+
+@pytest.mark.parametrize(
+    "raw",
+    ['{"id": 0, "tags": null}', '{"id": 0, "tags": {"t/a": 1}}', '{"tags": {}}'],
+)
+def test_decode_tags_invalid(backend, raw):
+    with pytest.raises(ValueError):
+        codec.decode_tags(raw)
+
+
+def test_lone_surrogates(backend):
+    # Accepted by the standard library, so every backend accepts them
+    raw = '{"id": 0, "source": "s", "content": "emoji \\ud83d trunc"}'
+    assert codec.decode_doc(raw) == (0, "s", "emoji \ud83d trunc")
+    assert codec.decode_doc(raw.encode()) == (0, "s", "emoji \ud83d trunc")
+    assert Doc.from_raw(raw.encode()).content == "emoji \ud83d trunc"
+
+    tags = '{"id": 0, "tags": {"t/\\udc00": [[0, 1, 1]]}}'
+    assert codec.decode_tags(tags) == (0, {"t/\udc00": [[0, 1, 1]]})
+    assert codec.loads(codec.dumps({"content": "\ud83d", "n": 2**70})) == {
+        "content": "\ud83d",
+        "n": 2**70,
+    }
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        float("nan"),
+        float("inf"),
+        [[0, 1, -float("inf")]],
+        {"t/a": [[0, 1, np.float32("nan")]]},
+        np.array([0.5, np.nan]),
+    ],
+)
+def test_non_finite_floats(backend, value):
+    with pytest.raises(ValueError):
+        codec.dumps({"id": 0, "tags": value})
+    # Strings and null are not mistaken for non-finite floats
+    assert codec.loads(codec.dumps({"a": "null", "b": None, "c": 1.5})) == {
+        "a": "null",
+        "b": None,
+        "c": 1.5,
+    }
+
+
+@pytest.mark.parametrize("raw", ["NaN", '{"a": Infinity}', "[-Infinity]"])
+def test_non_finite_floats_decode(backend, raw):
+    with pytest.raises(ValueError):
+        codec.loads(raw)
+
+
+def test_documents_round_trip(backend):
+    # Only newlines separate documents, other line breaks stay in the content
+    docs = [Doc(0, "a", "line break\x1c"), Doc(1, "b", "second\r")]
+    raw = "\n".join(
+        codec.dumps({"id": d.id, "source": d.source, "content": d.content})
+        for d in docs
+    )
+    file = File.from_raw("file", raw + "\n\n")
+    assert [(d.id, d.content) for d in file.content] == [
+        (0, docs[0].content),
+        (1, "second\r"),
+    ]
+
+    # Invalid UTF-8 in bytes lines is ignored
+    line = b'{"id": 2, "source": "c", "content": "ab\xffc"}'
+    assert Doc.from_raw(line).content == "abc"
@@ -0,0 +1,61 @@
+import numpy as np
+import os
+import pytest
+
+from postit.utils.hash_index import DIGEST, HashIndex, hash_content, make_entries
+
+
+def digests(texts: list[str]) -> np.ndarray:
+    return np.array([hash_content(text) for text in texts], dtype=DIGEST).reshape(-1)
+
+
+def test_hash_content_normalizes():
+    assert hash_content(" Hello\n") == hash_content("hello")
+    assert hash_content("hello") != hash_content("hello world")
+
+
+def test_hash_index_invalid_partitions():
+    with pytest.raises(ValueError):
+        HashIndex(num_partitions=3)
+
+
+@pytest.mark.parametrize("num_partitions", [1, 4, 256])
+def test_hash_index_duplicates(num_partitions):
+    texts = ["a", "b", "A ", "c", "b", "d", "a"]
+    with HashIndex(num_partitions=num_partitions) as index:
+        # Shards are added out of order, references decide which document is first
+        index.add(make_entries(digests(texts[4:]), np.arange(4, 7)))
+        index.add(make_entries(digests(texts[:4]), np.arange(4)))
+        assert len(index) == 7
+
+        found = {}
+        for refs, firsts in index.duplicates():
+            found.update(zip(refs.tolist(), firsts.tolist()))
+        assert found == {2: 0, 4: 1, 6: 0}
+
+
+def test_hash_index_spill(tmp_path):
+    texts = [f"doc {i % 50}" for i in range(200)]
+    index = HashIndex(num_partitions=4, max_rows=30, spill_dir=str(tmp_path))
+    for start in range(0, 200, 20):
+        index.add(
+            make_entries(
+                digests(texts[start : start + 20]), np.arange(start, start + 20)
+            )
+        )
+    assert any(index.runs)
+    assert os.listdir(tmp_path)
+
+    found = {}
+    for refs, firsts in index.duplicates():
+        found.update(zip(refs.tolist(), firsts.tolist()))
+    assert found == {i: i % 50 for i in range(50, 200)}
+
+    index.close()
+    assert not os.listdir(tmp_path)
+
+
+def test_hash_index_lookup():
+    with HashIndex(num_partitions=4, max_rows=2) as index:
+        index.add(make_entries(digests(["a", "b", "a", "c"]), np.array([5, 1, 3, 2])))
+        assert index.lookup(digests(["a", "missing", "c"])).tolist() == [3, -1, 2]
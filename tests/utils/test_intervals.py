@@ -0,0 +1,42 @@
+import random
+
+from postit.utils.intervals import difference, intersection, union
+
+
+def covered(ranges: list[list[int]]) -> set[int]:
+    return {i for start, end in ranges for i in range(start, end + 1)}
+
+
+def test_union():
+    spans = [[5, 7, 0.5], [0, 2, 1], [3, 4, 1], [10, 12, 1], [11, 11, 1], [9, 8, 1]]
+    assert union(spans) == [[0, 7], [10, 12]]
+    assert union([[0, 1]], [[1, 4]]) == [[0, 4]]
+    assert union([]) == []
+
+
+def test_intersection():
+    a = [[0, 5], [8, 12]]
+    b = [[3, 9], [11, 20]]
+    assert intersection(a, b) == [[3, 5], [8, 9], [11, 12]]
+    assert intersection(a, []) == []
+
+
+def test_difference():
+    a = [[0, 10], [20, 30]]
+    b = [[2, 3], [5, 5], [9, 21], [25, 40]]
+    assert difference(a, b) == [[0, 1], [4, 4], [6, 8], [22, 24]]
+    assert difference(a, []) == a
+    assert difference([], b) == []
+
+
+def test_random_spans():
+    rng = random.Random(0)
+    for _ in range(100):
+        a = [[s, s + rng.randint(-1, 10)] for s in rng.sample(range(100), 10)]
+        b = [[s, s + rng.randint(-1, 10)] for s in rng.sample(range(100), 10)]
+        assert covered(union(a, b)) == covered(a) | covered(b)
+        assert covered(intersection(a, b)) == covered(a) & covered(b)
+        assert covered(difference(a, b)) == covered(a) - covered(b)
+        for ranges in [union(a, b), intersection(a, b), difference(a, b)]:
+            # Sorted and disjoint, adjacent ranges are merged
+            assert all(x[1] + 1 < y[0] for x, y in zip(ranges, ranges[1:]))
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from postit.utils.minhash import EMPTY, LSHIndex, MinHasher, jaccard, shingle_hashes
+
+BASE = " ".join(f"word{i}" for i in range(200))
+
+
+def test_shingle_hashes():
+    assert len(shingle_hashes(BASE, 5)) == 196
+    assert len(shingle_hashes("two words", 5)) == 1
+    assert len(shingle_hashes("  ", 5)) == 0
+    # Shingles are case-insensitive and order-sensitive
+    assert shingle_hashes("A b", 2) == shingle_hashes("a B", 2)
+    assert shingle_hashes("a b", 2) != shingle_hashes("b a", 2)
+
+
+def test_minhash_estimates_jaccard():
+    minhasher = MinHasher(num_perm=256)
+    near = BASE.replace("word100", "changed")
+    base, near, other = minhasher.signatures([BASE, near, "unrelated text entirely"])
+
+    # 5 of the 196 shingles change: the true similarity is 191 / 201
+    assert jaccard(base, near) == pytest.approx(191 / 201, abs=0.05)
+    assert jaccard(base, other) < 0.1
+    assert (minhasher.signature("") == EMPTY).all()
+    assert minhasher.signatures([]).shape == (0, 256)
+
+
+def test_minhash_chunks():
+    text = " ".join(f"w{i}" for i in range(10000))
+    signature = MinHasher(num_perm=8).signature(text)
+    shingles = shingle_hashes(text)
+    minhasher = MinHasher(num_perm=8)
+    expected = ((minhasher.a * shingles + minhasher.b) >> np.uint64(32)).min(axis=1)
+    assert signature.tolist() == expected.tolist()
+
+
+def test_lsh_index():
+    with pytest.raises(ValueError):
+        LSHIndex(num_perm=128, num_bands=7)
+
+    minhasher = MinHasher()
+    lsh = LSHIndex()
+    lsh.add("base", minhasher.signature(BASE))
+    lsh.add("other", minhasher.signature("some other document with its own words"))
+
+    key, score = lsh.query(minhasher.signature(BASE.replace("word5", "changed")))
+    assert key == "base"
+    assert score > 0.8
+    assert lsh.query(minhasher.signature("nothing in common at all")) == (None, 0.0)
+    assert len(lsh) == 2
@@ -0,0 +1,39 @@
+import pytest
+
+from postit.files import FileClient
+from postit.utils.shards import OrderedWriter, ShardWriter
+
+
+def test_shard_writer(tmp_path):
+    with ShardWriter(FileClient(), f"{tmp_path}/out/part", max_size=10) as writer:
+        for line in ["aaaa\n", "bbbb\n", "cc\n", "dddddddddddddd\n", "é\n"]:
+            writer.write(line)
+
+    assert writer.paths == [f"{tmp_path}/out/part-{i:05d}.jsonl" for i in range(4)]
+    contents = [open(path).read() for path in writer.paths]
+    assert contents == ["aaaa\nbbbb\n", "cc\n", "dddddddddddddd\n", "é\n"]
+
+
+def test_shard_writer_empty(tmp_path):
+    with ShardWriter(FileClient(), f"{tmp_path}/part") as writer:
+        pass
+    assert writer.paths == []
+
+
+def test_shard_writer_invalid_size():
+    with pytest.raises(ValueError):
+        ShardWriter(FileClient(), "part", max_size=0)
+
+
+def test_ordered_writer(tmp_path):
+    path = f"{tmp_path}/out.jsonl"
+    writer = OrderedWriter(FileClient(), path, ["a", "b", "c"])
+    writer.write("b", "b\n")
+    assert writer.file is None
+    writer.write("a", "")
+    writer.write("c", "c\n")
+
+    # The file is closed once every output is written
+    assert writer.file is None
+    with open(path) as file:
+        assert file.read() == "b\nc\n"
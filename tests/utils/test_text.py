@@ -0,0 +1,58 @@
+import pytest
+
+from postit.types import Doc
+from postit.utils.bloom import BloomFilter
+from postit.utils.text import (
+    code_points,
+    normalize,
+    normalize_paragraphs,
+    word_starts,
+)
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["", "\n", "One\n\n  Two \t\nthree\x1c", " Héllo\nWORLD ", "a\r\nb"],
+)
+def test_normalize_paragraphs(content):
+    paragraphs = normalize_paragraphs(Doc(0, "source", content))
+    expected = [normalize(paragraph) for paragraph in content.split("\n")]
+    assert [p.decode() if isinstance(p, bytes) else p for p in paragraphs] == expected
+
+
+def test_normalized_bytes_match_strings():
+    bloom = BloomFilter.new(100, 0.01)
+    try:
+        bloom.add_batch(normalize_paragraphs(Doc(0, "source", "One\n Two ")))
+        assert bloom.contains_batch(["one", "two", "three"]) == [True, True, False]
+    finally:
+        bloom.close()
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        " ",
+        "one  two\tthree",
+        "\x1cA\xa0b\u3000c\u3001d",
+        "\U0001f600 x\n",
+        "emoji \ud83d trunc",
+    ],
+)
+def test_word_starts(text):
+    codes = code_points(text)
+    assert len(codes) == len(text)
+    assert int(word_starts(codes).sum()) == len(text.split())
+
+
+def test_lone_surrogates():
+    # Strings decoded from JSON can hold lone surrogates, they are hashed like other text
+    text = "emoji \ud83d trunc"
+    assert code_points(text).tolist() == [ord(char) for char in text]
+    bloom = BloomFilter.new(100, 0.01)
+    try:
+        assert not bloom.test_and_add(text)
+        assert bloom.contains_batch([text, "emoji"]) == [True, False]
+    finally:
+        bloom.close()